@@ -0,0 +1,127 @@
+"""锚文本汇总：把指向每个页面的锚文本写到该页面自己的文档上
+
+构建索引.py 把页面的出链保存在来源页面的 anchor_texts 中，但锚文本描述的是目标页面，
+放在来源页面上对检索目标页面没有帮助。导入完成后运行本脚本：从索引中滚动读出全部出链，
+按目标 URL 分组（去掉锚点 #...、自环与指向未索引页面的链接），每个目标的锚文本规范化
+空白后按忽略空格与大小写去重，去掉“更多”“下一页”之类的通用链接文字，按引用它的来源页面
+数从多到少最多保留 MAX_ANCHORS 条，写入目标文档的 incoming_anchors 字段（普通 text
+字段，不需要 nested 查询）。只对内容有变化的文档发送 bulk 局部更新。
+
+    python anchor_text.py                       # 汇总并写回
+    python anchor_text.py --dry-run --top 20    # 只汇总，打印锚文本最多的页面
+
+构建索引.py --rebuild 在切换别名之前对新版本运行一次（run(index=新版本)）。
+"""
+import argparse
+import time
+from collections import Counter, defaultdict
+
+from elasticsearch import helpers
+
+import 构建索引 as indexer
+from 构建索引 import INDEX_NAME
+
+# 配置参数
+MAX_ANCHORS = 20        # 每个页面最多保留的锚文本条数
+MAX_ANCHOR_CHARS = 50   # 单条锚文本的最大字数，超出部分截断
+MIN_ANCHOR_CHARS = 2    # 短于它的锚文本（如“>>”）不保留
+UPDATE_CHUNK = 1000     # 每个 bulk 请求包含的局部更新数
+SCAN_SIZE = 1000        # 滚动读取时每批的文档数
+# 不描述目标内容的通用链接文字
+GENERIC_ANCHORS = frozenset(["更多", "更多>>", "more", "首页", "返回首页", "上一页", "下一页", "尾页", "末页",
+                             "上一篇", "下一篇", "详细", "详情", "查看详情", "阅读全文", "点击查看", "这里", "此处"])
+
+
+def normalize(text):
+    """规范化空白并截断，返回 (显示用文本, 去重用的键)；不应保留时返回 None"""
+    text = ' '.join(text.split())[:MAX_ANCHOR_CHARS]
+    key = text.replace(' ', '').casefold()  # “南开 大学”与“南开大学”视为相同
+    if len(key) < MIN_ANCHOR_CHARS or key in GENERIC_ANCHORS:
+        return None
+    return text, key
+
+
+def aggregate(pages, max_anchors=MAX_ANCHORS):
+    """pages 为 [(url, [(锚文本, 目标 url)])]，返回 {目标 url: [锚文本]}
+
+    同一来源页面对同一目标的相同锚文本只计一次；按来源页面数从多到少、再按首次出现的
+    顺序保留前 max_anchors 条。
+    """
+    indexed = {url for url, _ in pages}
+    counts = defaultdict(Counter)   # 目标 -> Counter(键 -> 来源页面数)
+    display = defaultdict(dict)     # 目标 -> {键: 首次出现的显示文本}
+    for source, anchors in pages:
+        seen = set()
+        for text, target in anchors:
+            target = target.split('#', 1)[0]
+            if target == source or target not in indexed:
+                continue
+            normalized = normalize(text)
+            if normalized is None or (target, normalized[1]) in seen:
+                continue
+            seen.add((target, normalized[1]))
+            counts[target][normalized[1]] += 1
+            display[target].setdefault(normalized[1], normalized[0])
+    # Counter.most_common 在次数相同时保持插入（首次出现）的顺序
+    return {target: [display[target][key] for key, _ in counter.most_common(max_anchors)]
+            for target, counter in counts.items()}
+
+
+# 从索引中滚动读出每个页面的出链与当前的 incoming_anchors
+# 客户端在调用时取 indexer.es：构建索引.py --es-host 会替换它
+def load_pages(index=INDEX_NAME):
+    pages, current = [], {}
+    for hit in helpers.scan(indexer.es, index=index, size=SCAN_SIZE,
+                            query={"query": {"match_all": {}}},
+                            _source=["url", "anchor_texts", "incoming_anchors"]):
+        source = hit['_source']
+        url = source.get('url') or hit['_id']
+        pages.append((url, [(anchor.get('text') or '', anchor['url'])
+                            for anchor in source.get('anchor_texts') or [] if anchor.get('url')]))
+        current[url] = source.get('incoming_anchors') or []
+    return pages, current
+
+
+# 以 bulk 局部更新写回，跳过没有变化的文档；不再有入链锚文本的文档写回空列表
+def write_anchors(incoming, current, index=INDEX_NAME):
+    actions = ({"_op_type": "update", "_index": index, "_id": url,
+                "doc": {"incoming_anchors": incoming.get(url, [])}}
+               for url in current if incoming.get(url, []) != current[url])
+    success, errors = helpers.bulk(indexer.es, actions, chunk_size=UPDATE_CHUNK,
+                                   raise_on_error=False, raise_on_exception=False)
+    return success, errors
+
+
+# 汇总 index 中的入链锚文本并写回
+def run(index=INDEX_NAME, max_anchors=MAX_ANCHORS, top=10, dry_run=False):
+    start = time.perf_counter()
+    pages, current = load_pages(index)
+    loaded = time.perf_counter()
+    incoming = aggregate(pages, max_anchors)
+    aggregated = time.perf_counter()
+    total = sum(len(texts) for texts in incoming.values())
+    print(f"读取 {len(pages)} 个页面 {loaded - start:.1f}s，{len(incoming)} 个页面有入链锚文本，"
+          f"共 {total} 条（去重、截断后） {aggregated - loaded:.2f}s")
+    for url in sorted(incoming, key=lambda url: len(incoming[url]), reverse=True)[:top]:
+        print(f"  {len(incoming[url]):3d}  {url}  {' | '.join(incoming[url][:5])}")
+
+    if dry_run:
+        return
+    success, errors = write_anchors(incoming, current, index)
+    print(f"\n写回完成! 更新 {success} 个文档，失败 {len(errors)} 个，{time.perf_counter() - aggregated:.1f}s")
+    for error in errors[:5]:
+        print(f"  更新失败: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把入链锚文本汇总到目标页面并写回索引')
+    parser.add_argument('--max-anchors', type=int, default=MAX_ANCHORS, help='每个页面最多保留的锚文本条数')
+    parser.add_argument('--top', type=int, default=10, help='打印锚文本最多的页面数')
+    parser.add_argument('--dry-run', action='store_true', help='只汇总，不写回索引')
+    parser.add_argument('--index', default=INDEX_NAME, help='索引名或别名，默认为当前版本')
+    args = parser.parse_args()
+    run(args.index, args.max_anchors, args.top, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
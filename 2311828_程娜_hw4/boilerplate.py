@@ -0,0 +1,176 @@
+"""正文抽取：去掉导航、页脚、侧栏等在每个页面重复出现的模板文本
+
+构建索引.py 解析页面时按块级标签（div、p、li、td 等）把文本切成文本块，每块记下文字
+数与其中链接文字的字数，交给 main_text 判断保留哪些块：
+
+    1. 站点模板：同一站点超过 TEMPLATE_RATIO 的页面中都出现的块（导航栏、版权信息等），
+       由 learn 命令从已抓取的页面中学习，保存在 TEMPLATE_FILE 中
+    2. 链接密度：链接文字占比超过 MAX_LINK_DENSITY 的块是菜单或相关链接列表
+    3. 文本密度：不足 MIN_BLOCK_CHARS 字的短块单独看不出是否正文，紧邻长块（正文段落）
+       时保留，如文章标题、来源行
+
+一块正文也没有（如列表页）时保留模板以外的全部块。只有 content 字段受影响，锚文本
+仍从整个页面提取。
+
+    python boilerplate.py learn                                  # 学习各站点的模板块
+    python boilerplate.py show page.html --url http://news.nankai.edu.cn/...   # 逐块显示保留或去掉的原因
+"""
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter, defaultdict
+
+# 配置参数
+# 各站点的模板块，learn 命令生成；与本文件放在一起，从 worm/ 等其他目录运行时也能找到
+TEMPLATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "site_templates.json")
+MIN_BLOCK_CHARS = 10      # 文本块至少多少字才单独算作正文
+LONG_BLOCK_CHARS = 40     # 正文长块，前后紧邻的短块随之保留
+MAX_LINK_DENSITY = 0.33   # 链接文字占比超过它的块视为导航
+TEMPLATE_RATIO = 0.5      # 在同一站点超过该比例的页面中出现的块视为模板
+TEMPLATE_MIN_PAGES = 20   # 站点至少有多少页面才学习模板
+TEMPLATE_SAMPLE = 2000    # 每个站点最多用多少页面学习
+
+# 块级标签：遇到它们时开始一个新的文本块
+BLOCK_TAGS = frozenset([
+    "address", "article", "aside", "blockquote", "body", "br", "center", "dd", "div", "dl", "dt",
+    "fieldset", "figcaption", "figure", "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6",
+    "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section", "table", "td", "th", "tr", "ul",
+])
+
+_templates = None  # 站点 -> (模板块集合, 摘要)，首次使用时从 TEMPLATE_FILE 读取
+
+
+def block_key(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def load_templates(path=TEMPLATE_FILE):
+    """读取模板文件，文件不存在时没有模板"""
+    global _templates
+    if _templates is None:
+        _templates = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for host, keys in json.load(f).items():
+                    digest = hashlib.blake2b(''.join(sorted(keys)).encode(), digest_size=8).hexdigest()
+                    _templates[host] = (frozenset(keys), digest)
+    return _templates
+
+
+def template_digest(host):
+    """站点模板的摘要，并入内容指纹：重新学习模板后该站点的页面随之重新索引"""
+    return load_templates().get(host, (None, ""))[1]
+
+
+def classify(blocks, host=None):
+    """blocks 为 [(文本, 链接文字数)]，返回 [(文本, 是否保留, 原因)]"""
+    template = load_templates().get(host, (frozenset(),))[0]
+    sizes, reasons = [], []
+    for text, link_chars in blocks:
+        chars = len(text.replace(' ', ''))
+        density = link_chars / chars if chars else 1.0
+        sizes.append(chars)
+        if block_key(text) in template:
+            reasons.append("站点模板")
+        elif density > MAX_LINK_DENSITY:
+            reasons.append(f"链接密度 {density:.2f}")
+        elif chars < MIN_BLOCK_CHARS:
+            reasons.append("过短")
+        else:
+            reasons.append(None)
+
+    def long_content(j):
+        return 0 <= j < len(blocks) and reasons[j] is None and sizes[j] >= LONG_BLOCK_CHARS
+
+    result = []
+    for i, (text, _) in enumerate(blocks):
+        reason = reasons[i]
+        if reason == "过短" and (long_content(i - 1) or long_content(i + 1)):
+            reason = None  # 紧邻正文的标题、来源行等
+        result.append((text, reason is None, reason or ("正文" if sizes[i] >= MIN_BLOCK_CHARS else "紧邻正文")))
+    if not any(keep for _, keep, _ in result):
+        result = [(text, reason != "站点模板", reason if reason == "站点模板" else "无正文，保留")
+                  for text, _, reason in result]
+    return result
+
+
+def main_text(blocks, host=None):
+    """保留下来的文本块，以空格连接"""
+    return ' '.join(text for text, keep, _ in classify(blocks, host) if keep)
+
+
+class TemplateLearner:
+    """统计各站点每个文本块出现在多少页面中
+
+    Attributes
+    ----------
+    pages(Counter): 站点 -> 已统计的页面数
+    counts(dict): 站点 -> Counter(块的键 -> 出现的页面数)
+    """
+    def __init__(self):
+        self.pages = Counter()
+        self.counts = defaultdict(Counter)
+
+    def add(self, host, blocks):
+        """统计一个页面，同一页面中重复的块只计一次"""
+        self.pages[host] += 1
+        self.counts[host].update({block_key(text) for text, _ in blocks})
+
+    def templates(self):
+        """站点 -> 模板块的键（排序后的列表）"""
+        return {host: sorted(key for key, count in self.counts[host].items()
+                             if count > pages * TEMPLATE_RATIO)
+                for host, pages in self.pages.items() if pages >= TEMPLATE_MIN_PAGES}
+
+
+def main():
+    import 构建索引 as indexer  # 构建索引.py 导入本模块，在这里导入以免循环
+
+    parser = argparse.ArgumentParser(description='正文抽取的模板学习与调试')
+    parser.add_argument('--parser', choices=['html.parser', 'lexbor'], default=indexer.PARSER,
+                        help='HTML 解析后端')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_learn = sub.add_parser('learn', help='从全部页面学习各站点的模板块')
+    p_learn.add_argument('--output', default=TEMPLATE_FILE)
+    p_show = sub.add_parser('show', help='逐块显示保留或去掉的原因')
+    p_show.add_argument('file', help='HTML 文件')
+    p_show.add_argument('--url', default='', help='页面 URL，用于确定站点模板')
+    args = parser.parse_args()
+    indexer.set_parser(args.parser)
+
+    if args.command == 'learn':
+        learner = TemplateLearner()
+        for title, url, filename, html in indexer.iter_records():
+            host = indexer.extract_domain(url)
+            if learner.pages[host] >= TEMPLATE_SAMPLE:
+                continue
+            if html is None:
+                html = indexer.read_html(filename)
+                if html is None:
+                    continue
+            learner.add(host, indexer.parse_blocks(html, url)[0])
+        templates = learner.templates()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(templates, f, indent=1)
+        for host, keys in sorted(templates.items()):
+            print(f"{host}: {learner.pages[host]} 个页面，{len(keys)} 个模板块")
+        print(f"已写入 {args.output}")
+        return
+
+    with open(args.file, encoding='utf-8') as f:
+        blocks, _ = indexer.parse_blocks(f.read(), args.url, args.file)
+    kept = removed = 0
+    for text, keep, reason in classify(blocks, indexer.extract_domain(args.url)):
+        chars = len(text.replace(' ', ''))
+        if keep:
+            kept += chars
+        else:
+            removed += chars
+        preview = text if len(text) <= 60 else text[:60] + '…'
+        print(f"{'✅' if keep else '❌'} {reason}（{chars} 字）: {preview}")
+    print(f"保留 {kept} 字，去掉 {removed} 字")
+
+
+if __name__ == "__main__":
+    main()
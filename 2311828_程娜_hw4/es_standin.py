@@ -0,0 +1,209 @@
+"""本地 Elasticsearch 替身：只实现 构建索引.py 与 pagerank.py 用到的接口，文档保存在内存中
+
+没有可用的 Elasticsearch 节点时用于测试导入流程与基准测试（不做分词，也不支持查询）：
+
+    python es_standin.py --port 9201 --doc-latency 0.0002
+    python 构建索引.py --es-host http://127.0.0.1:9201 --benchmark
+
+支持：创建、删除、查看索引与别名（_aliases 原子切换），_settings、_mapping、_refresh、
+_forcemerge、_count，_bulk 的 index / create / update（含 doc_as_upsert）/ delete 与单条 _update，
+以及读出全部文档的滚动查询（helpers.scan）。--doc-latency 为 bulk 中每条动作的模拟处理时间。
+"""
+import argparse
+import asyncio
+import fnmatch
+import json
+from urllib.parse import unquote
+
+from aiohttp import web
+
+HEADERS = {'X-Elastic-Product': 'Elasticsearch'}  # 官方客户端据此确认服务端
+
+
+def reply(body, status=200):
+    return web.json_response(body, status=status, headers=HEADERS)
+
+
+def not_found(name):
+    return reply({'error': {'type': 'index_not_found_exception', 'reason': f'no such index [{name}]'},
+                  'status': 404}, 404)
+
+
+class Store:
+    """内存中的索引与别名
+
+    Attributes
+    ----------
+    indices(dict): 索引名 -> {'docs': {id: 文档}, 'settings': dict, 'mappings': dict}
+    aliases(dict): 别名 -> 索引名集合
+    """
+    def __init__(self):
+        self.indices = {}
+        self.aliases = {}
+
+    def resolve(self, expression):
+        """逗号分隔的索引名、别名或通配模式 -> 索引名列表"""
+        names = []
+        for part in expression.split(','):
+            if part in self.aliases:
+                names += sorted(self.aliases[part])
+            elif '*' in part:
+                names += sorted(fnmatch.filter(self.indices, part))
+            elif part in self.indices:
+                names.append(part)
+        return names
+
+    def bulk(self, lines, default_index=None):
+        items = []
+        lines = iter(lines)
+        for line in lines:
+            op, meta = next(iter(json.loads(line).items()))
+            source = None if op == 'delete' else json.loads(next(lines))
+            targets = self.resolve(meta.get('_index') or default_index or '')
+            if len(targets) != 1:
+                items.append({op: {'_id': meta.get('_id'), 'status': 404,
+                                   'error': {'type': 'index_not_found_exception'}}})
+                continue
+            docs, doc_id = self.indices[targets[0]]['docs'], meta.get('_id')
+            if op == 'delete':
+                status = 200 if docs.pop(doc_id, None) is not None else 404
+            elif op == 'update':
+                if doc_id in docs:
+                    docs[doc_id].update(source.get('doc', {}))
+                    status = 200
+                elif source.get('doc_as_upsert') or 'upsert' in source:
+                    docs[doc_id] = dict(source['doc'] if source.get('doc_as_upsert') else source['upsert'])
+                    status = 201
+                else:
+                    items.append({op: {'_index': targets[0], '_id': doc_id, 'status': 404,
+                                       'error': {'type': 'document_missing_exception'}}})
+                    continue
+            else:
+                status = 200 if doc_id in docs else 201
+                docs[doc_id] = source
+            items.append({op: {'_index': targets[0], '_id': doc_id, 'status': status}})
+        errors = any(next(iter(item.values()))['status'] >= 300 and 'delete' not in item for item in items)
+        return {'took': 0, 'errors': errors, 'items': items}
+
+
+def make_app(latency=0.0, doc_latency=0.0):
+    store = Store()
+    shards = {'_shards': {'total': 1, 'successful': 1, 'failed': 0}}
+
+    async def handle(request):
+        if latency:
+            await asyncio.sleep(latency)
+        parts = [part for part in request.path.split('/') if part]
+        method = request.method
+        if not parts:
+            return reply({'version': {'number': '8.11.0'}, 'tagline': 'You Know, for Search'})
+
+        if parts[0] == '_aliases' and method == 'POST':
+            for action in (await request.json())['actions']:
+                op, arg = next(iter(action.items()))
+                if op == 'add':
+                    store.aliases.setdefault(arg['alias'], set()).add(arg['index'])
+                elif op == 'remove':
+                    store.aliases.get(arg['alias'], set()).discard(arg['index'])
+                elif op == 'remove_index':
+                    store.indices.pop(arg['index'], None)
+            return reply({'acknowledged': True})
+        if parts[0] == '_alias':
+            targets = store.aliases.get(parts[1]) if len(parts) > 1 else None
+            if method == 'HEAD':
+                return web.Response(status=200 if targets else 404, headers=HEADERS)
+            if not targets:
+                return reply({'error': f'alias [{parts[1]}] missing', 'status': 404}, 404)
+            return reply({name: {'aliases': {parts[1]: {}}} for name in targets})
+        if parts[0] == '_bulk' or parts[-1] == '_bulk':
+            lines = [line for line in (await request.text()).splitlines() if line.strip()]
+            if doc_latency:
+                await asyncio.sleep(doc_latency * len(lines) / 2)
+            return reply(store.bulk(lines, parts[0] if len(parts) > 1 else None))
+        if parts[0] == '_search' and len(parts) > 1 and parts[1] == 'scroll':
+            # 第一次查询已返回全部文档，之后的滚动都为空
+            if method == 'DELETE':
+                return reply({'succeeded': True, 'num_freed': 1})
+            return reply({'_scroll_id': 'all', 'hits': {'hits': []}, **shards})
+
+        name, targets = parts[0], store.resolve(parts[0])
+        if len(parts) == 1:
+            if method == 'HEAD':
+                return web.Response(status=200 if targets else 404, headers=HEADERS)
+            if method == 'PUT':
+                body = await request.json() if request.can_read_body else {}
+                settings = dict(body.get('settings', {}))
+                store.indices[name] = {'docs': {}, 'settings': settings.get('index', settings),
+                                       'mappings': body.get('mappings', {})}
+                return reply({'acknowledged': True, 'index': name})
+            if not targets:
+                return reply({}) if '*' in name and method == 'GET' else not_found(name)
+            if method == 'DELETE':
+                for target in targets:
+                    del store.indices[target]
+                    for members in store.aliases.values():
+                        members.discard(target)
+                return reply({'acknowledged': True})
+            return reply({target: {'settings': {'index': store.indices[target]['settings']},
+                                   'mappings': store.indices[target]['mappings']} for target in targets})
+        if not targets:
+            return not_found(name)
+
+        op = parts[1]
+        if op == '_settings':
+            if method == 'PUT':
+                body = await request.json()
+                for target in targets:
+                    store.indices[target]['settings'].update(body.get('index', body))
+                return reply({'acknowledged': True})
+            return reply({target: {'settings': {'index': {key: value for key, value in
+                                                          store.indices[target]['settings'].items()
+                                                          if value is not None and not isinstance(value, dict)}}}
+                          for target in targets})
+        if op == '_mapping':
+            if method == 'PUT':
+                body = await request.json()
+                for target in targets:
+                    store.indices[target]['mappings'].setdefault('properties', {}).update(body.get('properties', {}))
+                return reply({'acknowledged': True})
+            return reply({target: {'mappings': store.indices[target]['mappings']} for target in targets})
+        if op in ('_refresh', '_forcemerge'):
+            return reply(shards)
+        if op == '_count':
+            return reply({'count': sum(len(store.indices[target]['docs']) for target in targets), **shards})
+        if op == '_search':
+            hits = [{'_index': target, '_id': doc_id, '_source': source}
+                    for target in targets for doc_id, source in store.indices[target]['docs'].items()]
+            return reply({'_scroll_id': 'all', 'took': 0, 'timed_out': False,
+                          'hits': {'total': {'value': len(hits), 'relation': 'eq'}, 'hits': hits}, **shards})
+        if op == '_update' and len(parts) > 2 and method == 'POST':
+            # 文档编号是 URL，其中编码过的 '/' 在 request.path 中已被解码，从原始路径取
+            doc_id = unquote(request.raw_path.split('?')[0].split('/')[3])
+            lines = [json.dumps({'update': {'_index': targets[0], '_id': doc_id}}), await request.text()]
+            item = store.bulk(lines)['items'][0]['update']
+            result = {201: 'created', 200: 'updated'}.get(item['status'])
+            return reply(dict(item, result=result, **shards), item['status'])
+        if op == '_doc' and len(parts) > 2:
+            source = store.indices[targets[0]]['docs'].get(parts[2])
+            return reply({'_index': targets[0], '_id': parts[2], 'found': source is not None,
+                          '_source': source}, 200 if source is not None else 404)
+        return reply({'error': {'type': 'unsupported', 'reason': f'{method} {request.path}'}, 'status': 400}, 400)
+
+    app = web.Application(client_max_size=1 << 30)
+    app['store'] = store
+    app.router.add_route('*', '/{tail:.*}', handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='导入测试用的本地 Elasticsearch 替身')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9201)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--doc-latency', type=float, default=0.0, help='bulk 中每条动作的模拟处理时间（秒）')
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.doc_latency), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""链接分析：由锚文本构建链接图，计算 PageRank 并写回索引
+
+构建索引.py 为每个页面保存了全部出链（anchor_texts 中的 url），但 pagerank 字段一直
+是固定的 1.0。这里从索引中滚动读出每个页面的 url 与出链，只保留指向已索引页面的链接
+（去掉锚点 #...、自环与重复边），建成 CSR 邻接结构：
+
+    indptr[i]:indptr[i + 1]   页面 i 的出链在 indices 中的区间
+    indices                   出链目标的页面编号（int32）
+
+再用 numpy 向量化的幂迭代计算 PageRank：每轮把各页面的分值按出度均分给出链目标
+（np.bincount 一次完成全部边的累加），没有出链的页面（悬挂节点）的分值均匀分给所有
+页面，相邻两轮分值的 L1 差小于 TOLERANCE 即收敛。10 万页面、数百万条边的图几秒内
+算完。结果乘以页面数后写回（平均值为 1.0，与原先的默认值同一量级），只对分值有变化
+的文档发送 bulk 局部更新（update + doc）。
+
+    python pagerank.py                      # 计算并写回
+    python pagerank.py --dry-run --top 20   # 只计算，打印分值最高的页面
+
+构建索引.py --rebuild 在切换别名之前对新版本运行一次（run(index=新版本)）。
+"""
+import argparse
+import time
+
+import numpy as np
+from elasticsearch import helpers
+
+import 构建索引 as indexer
+from 构建索引 import INDEX_NAME
+
+# 配置参数
+DAMPING = 0.85        # 阻尼系数
+TOLERANCE = 1e-6      # 收敛阈值：相邻两轮分值的 L1 差
+MAX_ITER = 100        # 最多迭代轮数
+UPDATE_CHUNK = 1000   # 每个 bulk 请求包含的局部更新数
+SCAN_SIZE = 1000      # 滚动读取时每批的文档数
+
+
+class LinkGraph:
+    """已索引页面之间的链接图（CSR）
+
+    Attributes
+    ----------
+    urls(List[str]): 页面编号 -> URL
+    indptr(np.ndarray): 长度 n + 1，页面 i 的出链为 indices[indptr[i]:indptr[i + 1]]
+    indices(np.ndarray): 出链目标的页面编号
+    """
+    def __init__(self, urls, indptr, indices):
+        self.urls = urls
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_links(cls, pages):
+        """pages 为 [(url, [出链 url])]，不在 pages 中的目标被丢弃"""
+        urls = [url for url, _ in pages]
+        ids = {url: i for i, url in enumerate(urls)}
+        counts = np.zeros(len(urls), dtype=np.int64)
+        targets = []
+        for i, (_, links) in enumerate(pages):
+            row = {ids[t] for t in (link.split('#', 1)[0] for link in links) if t in ids}
+            row.discard(i)
+            counts[i] = len(row)
+            targets.extend(sorted(row))
+        indptr = np.zeros(len(urls) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(urls, indptr, np.array(targets, dtype=np.int32))
+
+    def __len__(self):
+        return len(self.urls)
+
+    @property
+    def num_edges(self):
+        return len(self.indices)
+
+    def out_degree(self):
+        return np.diff(self.indptr)
+
+    def pagerank(self, damping=DAMPING, tolerance=TOLERANCE, max_iter=MAX_ITER):
+        """幂迭代，返回 (分值数组（和为 1）, 迭代轮数, 最后一轮的 L1 差)"""
+        n = len(self)
+        if n == 0:
+            return np.zeros(0), 0, 0.0
+        out_degree = self.out_degree()
+        dangling = out_degree == 0
+        inverse_degree = np.where(dangling, 0.0, 1.0 / np.maximum(out_degree, 1))
+        sources = np.repeat(np.arange(n, dtype=np.int32), out_degree)   # 每条边的起点
+        scores = np.full(n, 1.0 / n)
+        delta = 0.0
+        for iteration in range(1, max_iter + 1):
+            share = (scores * inverse_degree)[sources]
+            incoming = np.bincount(self.indices, weights=share, minlength=n)
+            dangling_mass = scores[dangling].sum()
+            updated = damping * (incoming + dangling_mass / n) + (1 - damping) / n
+            delta = np.abs(updated - scores).sum()
+            scores = updated
+            if delta < tolerance:
+                break
+        return scores, iteration, delta
+
+
+# 从索引中滚动读出每个页面的出链与当前的 pagerank
+# 客户端在调用时取 indexer.es：构建索引.py --es-host 会替换它
+def load_pages(index=INDEX_NAME):
+    pages, current = [], {}
+    for hit in helpers.scan(indexer.es, index=index, size=SCAN_SIZE,
+                            query={"query": {"match_all": {}}},
+                            _source=["url", "pagerank", "anchor_texts.url"]):
+        source = hit['_source']
+        url = source.get('url') or hit['_id']
+        pages.append((url, [anchor['url'] for anchor in source.get('anchor_texts') or []
+                            if anchor.get('url')]))
+        current[url] = source.get('pagerank')
+    return pages, current
+
+
+# 以 bulk 局部更新写回分值，跳过与当前值相同的文档；返回 (更新数, 失败条目列表)
+def write_scores(urls, scores, current, index=INDEX_NAME):
+    actions = ({"_op_type": "update", "_index": index, "_id": url,
+                "doc": {"pagerank": score}}
+               for url, score in zip(urls, scores)
+               if current.get(url) is None or abs(current[url] - score) > 1e-9)
+    success, errors = helpers.bulk(indexer.es, actions, chunk_size=UPDATE_CHUNK,
+                                   raise_on_error=False, raise_on_exception=False)
+    return success, errors
+
+
+# 计算 index 中页面的 PageRank 并写回
+def run(index=INDEX_NAME, damping=DAMPING, tolerance=TOLERANCE, max_iter=MAX_ITER, top=10, dry_run=False):
+    start = time.perf_counter()
+    pages, current = load_pages(index)
+    loaded = time.perf_counter()
+    graph = LinkGraph.from_links(pages)
+    built = time.perf_counter()
+    print(f"读取 {len(pages)} 个页面 {loaded - start:.1f}s，链接图 {graph.num_edges} 条边 "
+          f"{built - loaded:.1f}s，其中 {int((graph.out_degree() == 0).sum())} 个页面没有出链")
+
+    scores, iterations, delta = graph.pagerank(damping, tolerance, max_iter)
+    computed = time.perf_counter()
+    print(f"幂迭代 {iterations} 轮，L1 差 {delta:.2e}，{computed - built:.2f}s")
+    # 乘以页面数，平均值为 1.0
+    scores = [round(float(score), 6) for score in scores * len(graph)]
+    for i in sorted(range(len(scores)), key=scores.__getitem__, reverse=True)[:top]:
+        print(f"  {scores[i]:10.4f}  {graph.urls[i]}")
+
+    if dry_run:
+        return
+    success, errors = write_scores(graph.urls, scores, current, index)
+    print(f"\n写回完成! 更新 {success} 个文档，失败 {len(errors)} 个，{time.perf_counter() - computed:.1f}s")
+    for error in errors[:5]:
+        print(f"  更新失败: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='计算 PageRank 并写回索引')
+    parser.add_argument('--damping', type=float, default=DAMPING)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--max-iter', type=int, default=MAX_ITER)
+    parser.add_argument('--top', type=int, default=10, help='打印分值最高的页面数')
+    parser.add_argument('--dry-run', action='store_true', help='只计算，不写回索引')
+    parser.add_argument('--index', default=INDEX_NAME, help='索引名或别名，默认为当前版本')
+    args = parser.parse_args()
+    run(args.index, args.damping, args.tolerance, args.max_iter, args.top, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
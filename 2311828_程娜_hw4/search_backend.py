@@ -0,0 +1,394 @@
+"""web.py 的查询后端
+
+web.py 的各个查询函数只调用 backend.search(index, body)，body 为 Elasticsearch 查询 DSL，
+返回与 Elasticsearch 相同结构的响应字典。可选的后端：
+
+    elasticsearch   原来的 Elasticsearch 查询
+    local           进程内引擎：从 JSONL 文件（每行一个文档）载入本地索引，按中文相邻两字与
+                    英文单词建倒排表，用 BM25 打分。只实现 web.py 用到的查询：bool、match、
+                    multi_match、match_phrase、term、prefix、wildcard、match_all；
+                    不做 ik 分词，短语查询按子串匹配（忽略 slop），不返回高亮
+    record          转发给 Elasticsearch，同时把请求、响应与耗时追加到记录文件
+    replay          按请求原样回放记录文件中的响应，不需要任何服务，可选按记录的耗时等待
+
+启动 web.py 时用环境变量选择，例如 SEARCH_BACKEND=local streamlit run web.py。
+
+    python search_backend.py build --from-es                 # 把 Elasticsearch 中的文档导出为本地索引
+    python search_backend.py build                           # 由 构建索引.py 配置的页面直接生成本地索引
+    python search_backend.py bench --backend local           # 重放记录的请求，报告各请求的延迟分位数
+"""
+import abc
+import argparse
+import copy
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+# 配置参数
+ES_URL = "http://localhost:9200"
+LOCAL_INDEX = "local_index.jsonl"     # 本地索引文件，每行一个文档（_source）
+RECORD_FILE = "search_record.jsonl"   # record 后端追加、replay 后端读取的记录文件
+BENCH_RECORD_FILE = "bench_record.jsonl"  # bench 使用 record 后端时追加的文件，与被重放的请求文件分开
+BACKENDS = ("elasticsearch", "local", "record", "replay")
+TEXT_FIELDS = ("title", "content", "incoming_anchors")  # 本地索引载入时即建好倒排表的字段
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 中文按相邻两字切分（单字成词时保留单字），英文与数字按整词
+_TOKEN = re.compile(r'[㐀-䶿一-鿿豈-﫿]+|[0-9a-z]+')
+
+
+def tokenize(text):
+    tokens = []
+    for run in _TOKEN.findall(text.lower()):
+        if run[0].isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def empty_response():
+    return {"took": 0, "timed_out": False, "hits": {"total": {"value": 0, "relation": "eq"},
+                                                     "max_score": None, "hits": []}}
+
+
+def request_key(index, body):
+    """同一请求的规范化表示，用于回放时查找"""
+    return json.dumps([index, body], sort_keys=True, ensure_ascii=False)
+
+
+class SearchBackend(abc.ABC):
+    """查询后端的接口"""
+    @abc.abstractmethod
+    def search(self, index, body):
+        """执行查询，返回 Elasticsearch 格式的响应字典"""
+
+    def ping(self):
+        return True
+
+    def describe(self):
+        return type(self).__name__
+
+
+class ElasticsearchBackend(SearchBackend):
+    """原来的 Elasticsearch 查询
+
+    Attributes
+    ----------
+    url(str): Elasticsearch 地址
+    es(Elasticsearch): 客户端
+    """
+    def __init__(self, url=ES_URL, basic_auth=None):
+        from elasticsearch import Elasticsearch
+        self.url = url
+        self.es = Elasticsearch(hosts=[url], basic_auth=basic_auth, request_timeout=10,
+                                max_retries=3, retry_on_timeout=True)
+
+    def search(self, index, body):
+        return self.es.search(index=index, body=body).body
+
+    def ping(self):
+        return self.es.ping()
+
+    def describe(self):
+        return f"Elasticsearch服务: {self.url}"
+
+
+class LocalIndex:
+    """进程内的倒排索引
+
+    Attributes
+    ----------
+    name(str): 索引名，出现在命中的 _index 中
+    docs(List[dict]): 文档（_source）
+    ids(List[str]): 文档编号 -> _id（url）
+    """
+    def __init__(self, documents, name="local"):
+        self.name = name
+        self.docs = list(documents)
+        self.ids = [doc.get("url") or str(i) for i, doc in enumerate(self.docs)]
+        self._texts = {}      # 字段 -> 各文档的小写文本
+        self._postings = {}   # 字段 -> (词 -> {文档: 词频}, 各文档词数, 平均词数)
+
+    @classmethod
+    def load(cls, path=LOCAL_INDEX):
+        with open(path, encoding="utf-8") as f:
+            return cls((json.loads(line) for line in f if line.strip()), name=path)
+
+    def texts(self, field):
+        if field not in self._texts:
+            values = []
+            for doc in self.docs:
+                value = doc.get(field)
+                if isinstance(value, list):
+                    value = "\n".join(str(item) for item in value)
+                values.append("" if value is None else str(value).lower())
+            self._texts[field] = values
+        return self._texts[field]
+
+    def postings(self, field):
+        if field not in self._postings:
+            postings, lengths = defaultdict(dict), []
+            for i, text in enumerate(self.texts(field)):
+                tokens = tokenize(text)
+                lengths.append(len(tokens))
+                for token, tf in Counter(tokens).items():
+                    postings[token][i] = tf
+            average = sum(lengths) / len(lengths) if lengths else 0
+            self._postings[field] = (postings, lengths, average or 1)
+        return self._postings[field]
+
+    def bm25(self, field, tokens, require_all=False):
+        """{文档: BM25 分值}；require_all 为真时只保留包含全部词的文档"""
+        postings, lengths, average = self.postings(field)
+        n = len(self.docs)
+        scores, matched = defaultdict(float), Counter()
+        unique = set(tokens)
+        for token in unique:
+            docs = postings.get(token, {})
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for i, tf in docs.items():
+                norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * lengths[i] / average)
+                scores[i] += idf * tf * (BM25_K1 + 1) / norm
+                matched[i] += 1
+        if require_all:
+            return {i: score for i, score in scores.items() if matched[i] == len(unique)}
+        return dict(scores)
+
+    def constant(self, field, predicate, boost=1.0):
+        return {i: boost for i, text in enumerate(self.texts(field)) if predicate(text)}
+
+    def evaluate(self, query):
+        """查询 DSL -> {文档: 分值}"""
+        kind, spec = next(iter(query.items()))
+        if kind == "match_all":
+            return {i: 1.0 for i in range(len(self.docs))}
+        if kind == "bool":
+            return self._bool(spec)
+        if kind == "multi_match":
+            best = defaultdict(float)
+            for field in spec["fields"]:
+                field, _, boost = field.partition("^")
+                for i, score in self.evaluate({"match": {field: spec["query"]}}).items():
+                    best[i] = max(best[i], score * float(boost or 1))   # best_fields：取最高的字段
+            return dict(best)
+
+        field, spec = next(iter(spec.items()))
+        if not isinstance(spec, dict):
+            spec = {"query" if kind.startswith("match") else "value": spec}
+        boost = float(spec.get("boost", 1.0))
+        base, _, subfield = field.partition(".")
+        if kind == "match":
+            scores = self.bm25(base, tokenize(str(spec["query"])), spec.get("operator") == "and")
+            return {i: score * boost for i, score in scores.items()}
+        if kind == "match_phrase":
+            phrase = "".join(str(spec["query"]).lower().split())
+            scores = self.bm25(base, tokenize(phrase), require_all=True)
+            texts = self.texts(base)
+            return {i: score * boost for i, score in scores.items() if phrase in "".join(texts[i].split())}
+        value = str(spec["value"]).lower()
+        if kind == "term":
+            if subfield == "prefix":
+                return self.constant(base, lambda text: text.startswith(value), boost)
+            if subfield == "ngram":
+                return self.constant(base, lambda text: value in text, boost)
+            return self.constant(base, lambda text: text == value, boost)
+        if kind == "prefix":
+            if subfield == "ngram":
+                return self.constant(base, lambda text: value in text, boost)
+            return self.constant(base, lambda text: re.search(r'(^|\W)' + re.escape(value), text) is not None, boost)
+        if kind == "wildcard":
+            # ES 在分词后的字段上逐词匹配；这里在整段文本中查找，* 与 ? 不跨越空白
+            pattern = re.compile(''.join(r'\S*' if c == '*' else r'\S' if c == '?' else re.escape(c) for c in value))
+            return self.constant(base, lambda text: pattern.search(text) is not None, boost)
+        raise ValueError(f"本地引擎不支持的查询: {kind}")
+
+    def _bool(self, spec):
+        def clauses(key):
+            value = spec.get(key, [])
+            return [self.evaluate(q) for q in (value if isinstance(value, list) else [value])]
+
+        must, filters, should, must_not = clauses("must"), clauses("filter"), clauses("should"), clauses("must_not")
+        required = must + filters
+        if required:
+            candidates = set.intersection(*(set(scores) for scores in required))
+        else:
+            candidates = set().union(*(set(scores) for scores in should)) if should else set(range(len(self.docs)))
+        minimum = int(spec.get("minimum_should_match", 0 if required else 1))
+        excluded = set().union(*(set(scores) for scores in must_not)) if must_not else set()
+        boost = float(spec.get("boost", 1.0))
+        result = {}
+        for i in candidates - excluded:
+            matched = [scores[i] for scores in should if i in scores]
+            if len(matched) < minimum:
+                continue
+            result[i] = (sum(scores[i] for scores in must) + sum(matched)) * boost
+        return result
+
+    def search(self, body):
+        start = time.perf_counter()
+        scores = self.evaluate(body.get("query") or {"match_all": {}})
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        offset, size = int(body.get("from", 0)), int(body.get("size", 10))
+        hits = [{"_index": self.name, "_id": self.ids[i], "_score": score, "_source": self.docs[i]}
+                for i, score in ranked[offset:offset + size]]
+        return {"took": int((time.perf_counter() - start) * 1000), "timed_out": False,
+                "hits": {"total": {"value": len(ranked), "relation": "eq"},
+                         "max_score": ranked[0][1] if ranked else None, "hits": hits}}
+
+
+class LocalBackend(SearchBackend):
+    """在进程内查询本地索引文件，不需要 Elasticsearch"""
+    def __init__(self, path=LOCAL_INDEX):
+        self.path = path
+        self.index = LocalIndex.load(path)
+        for field in TEXT_FIELDS:
+            self.index.postings(field)   # 载入时建好，免得第一次查询等待
+
+    def search(self, index, body):
+        return self.index.search(body)
+
+    def describe(self):
+        return f"本地索引: {self.path}（{len(self.index.docs)} 个文档）"
+
+
+class RecordingBackend(SearchBackend):
+    """转发给 inner，并把每个请求的响应与耗时追加到记录文件
+
+    Attributes
+    ----------
+    inner(SearchBackend): 实际执行查询的后端
+    path(str): 记录文件，每行一个 JSON：{"index", "body", "seconds", "response"}
+    """
+    def __init__(self, inner, path=RECORD_FILE):
+        self.inner = inner
+        self.path = path
+
+    def search(self, index, body):
+        start = time.perf_counter()
+        response = self.inner.search(index, body)
+        seconds = time.perf_counter() - start
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"index": index, "body": body, "seconds": round(seconds, 6),
+                                "response": response}, ensure_ascii=False, default=str) + "\n")
+        return response
+
+    def ping(self):
+        return self.inner.ping()
+
+    def describe(self):
+        return f"{self.inner.describe()}（记录到 {self.path}）"
+
+
+class ReplayBackend(SearchBackend):
+    """按请求回放记录文件中的响应；没有记录的请求返回空结果并计入 misses
+
+    Attributes
+    ----------
+    path(str): 记录文件
+    latency(bool): 为真时按记录的耗时等待后再返回，模拟原后端的延迟
+    misses(int): 没有记录的请求数
+    """
+    def __init__(self, path=RECORD_FILE, latency=False):
+        self.path = path
+        self.latency = latency
+        self.misses = 0
+        self.responses = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.responses[request_key(record["index"], record["body"])] = (record["response"],
+                                                                                    record["seconds"])
+
+    def search(self, index, body):
+        recorded = self.responses.get(request_key(index, body))
+        if recorded is None:
+            self.misses += 1
+            return empty_response()
+        response, seconds = recorded
+        if self.latency:
+            time.sleep(seconds)
+        return copy.deepcopy(response)
+
+    def describe(self):
+        return f"回放记录: {self.path}（{len(self.responses)} 个请求）"
+
+
+def make_backend(kind, es_url=ES_URL, es_auth=None, local_index=LOCAL_INDEX, record_file=RECORD_FILE,
+                 replay_latency=False):
+    if kind == "elasticsearch":
+        return ElasticsearchBackend(es_url, es_auth)
+    if kind == "local":
+        return LocalBackend(local_index)
+    if kind == "record":
+        return RecordingBackend(ElasticsearchBackend(es_url, es_auth), record_file)
+    if kind == "replay":
+        return ReplayBackend(record_file, replay_latency)
+    raise ValueError(f"未知的查询后端: {kind}，可选 {', '.join(BACKENDS)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='web.py 查询后端的本地索引与延迟测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_build = sub.add_parser('build', help='生成本地索引文件')
+    p_build.add_argument('--output', default=LOCAL_INDEX)
+    p_build.add_argument('--from-es', action='store_true',
+                         help='从 Elasticsearch 导出（含 pagerank 与入链锚文本），默认由页面直接解析')
+    p_bench = sub.add_parser('bench', help='把记录文件中的请求在指定后端上重放，报告延迟分位数')
+    p_bench.add_argument('--backend', choices=BACKENDS, default='local')
+    p_bench.add_argument('--requests', default=RECORD_FILE, help='记录文件，取其中的请求')
+    p_bench.add_argument('--local-index', default=LOCAL_INDEX)
+    p_bench.add_argument('--record-file', default=None,
+                         help=f'record 后端追加的文件（默认 {BENCH_RECORD_FILE}）或 replay 后端读取的文件（默认同 --requests）')
+    p_bench.add_argument('--es-url', default=ES_URL)
+    p_bench.add_argument('--es-user', default=None, help='Elasticsearch 用户名，与 web.py 的 ES_USER 相同')
+    p_bench.add_argument('--es-password', default=None)
+    p_bench.add_argument('--repeat', type=int, default=3, help='每个请求重复的次数')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        import 构建索引 as indexer
+        count = 0
+        with open(args.output, 'w', encoding='utf-8') as f:
+            if args.from_es:
+                from elasticsearch import helpers
+                documents = (hit['_source'] for hit in helpers.scan(indexer.es, index=indexer.INDEX_NAME,
+                                                                    query={"query": {"match_all": {}}}))
+            else:
+                documents = (document for _, _, _, document in indexer.parse_records(indexer.iter_records())
+                             if document is not None)
+            for document in documents:
+                f.write(json.dumps(document, ensure_ascii=False) + '\n')
+                count += 1
+        print(f"已写入 {count} 个文档到 {args.output}")
+        return
+
+    record_file = args.record_file or (BENCH_RECORD_FILE if args.backend == 'record' else args.requests)
+    if args.backend == 'record' and os.path.abspath(record_file) == os.path.abspath(args.requests):
+        parser.error('--record-file 不能与 --requests 相同：重放的同时追加会使文件不断变大')
+    with open(args.requests, encoding='utf-8') as f:
+        requests = [json.loads(line) for line in f if line.strip()]
+    es_auth = (args.es_user, args.es_password or '') if args.es_user else None
+    backend = make_backend(args.backend, es_url=args.es_url, es_auth=es_auth, local_index=args.local_index,
+                           record_file=record_file)
+    print(f"后端: {backend.describe()}，{len(requests)} 个请求 × {args.repeat}")
+    latencies = []
+    for _ in range(args.repeat):
+        for request in requests:
+            start = time.perf_counter()
+            backend.search(request['index'], request['body'])
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    if latencies:
+        def quantile(q):
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000
+        print(f"延迟 p50 {quantile(0.5):.1f}ms，p99 {quantile(0.99):.1f}ms，最大 {latencies[-1] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
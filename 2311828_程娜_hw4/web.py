@@ -2,7 +2,7 @@ import os
 import streamlit as st
 import re
 from datetime import datetime
-from elasticsearch import Elasticsearch
+from search_backend import make_backend
 import json
 
 # 配置页面
@@ -21,27 +21,38 @@ st.markdown(hide_style, unsafe_allow_html=True)
 st.header("欢迎来到南开资源站！")
 st.subheader("查询你想要的南开资源信息")
 
-# Elasticsearch 配置
+# Elasticsearch 配置（SEARCH_BACKEND 为 elasticsearch 或 record 时使用）
 ES_URL = "http://localhost:9200"
 ES_USER = ('elastic', '123456')
+INDEX_ALIAS = "web_pages"  # 索引别名，构建索引.py --rebuild 完成后原子地切换到新版本
+ANCHOR_FIELD = "incoming_anchors^2"  # 指向页面的锚文本（anchor_text.py 汇总），关键词查询时加权
 
-# 尝试连接Elasticsearch
+# 查询后端：elasticsearch（默认）/ local（本地索引，无需服务）/ record（查询 ES 并记录）/ replay（回放记录），
+# 用环境变量选择，例如 SEARCH_BACKEND=local streamlit run web.py，详见 search_backend.py
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "elasticsearch")
+LOCAL_INDEX = os.environ.get("LOCAL_INDEX", "local_index.jsonl")
+RECORD_FILE = os.environ.get("RECORD_FILE", "search_record.jsonl")
+REPLAY_LATENCY = os.environ.get("REPLAY_LATENCY") == "1"  # 回放时按记录的耗时等待
+
+
+# 每次交互 Streamlit 都会重新执行脚本，后端（本地索引、回放记录）只创建一次
+@st.cache_resource
+def get_backend(kind):
+    return make_backend(kind, es_url=ES_URL, es_auth=ES_USER, local_index=LOCAL_INDEX,
+                        record_file=RECORD_FILE, replay_latency=REPLAY_LATENCY)
+
+
+# 尝试连接查询后端
 try:
-    es = Elasticsearch(
-        hosts=[ES_URL],
-        basic_auth=ES_USER,
-        request_timeout=10,
-        max_retries=3,
-        retry_on_timeout=True
-    )
-    if not es.ping():
-        st.error(f"❌ 无法连接到Elasticsearch服务: {ES_URL}")
+    backend = get_backend(SEARCH_BACKEND)
+    if not backend.ping():
+        st.error(f"❌ 无法连接到{backend.describe()}")
         st.info("请检查: 1) Elasticsearch服务是否已启动 2) 连接地址是否正确 3) 认证信息是否正确")
     else:
-        st.success("✅ 已成功连接到Elasticsearch")
+        st.success(f"✅ 已连接到{backend.describe()}")
 except Exception as e:
-    st.error(f"❌ 连接Elasticsearch时出错: {str(e)}")
-    st.info("请检查Elasticsearch服务状态和配置")
+    st.error(f"❌ 创建查询后端 {SEARCH_BACKEND} 时出错: {str(e)}")
+    st.info("请检查Elasticsearch服务状态和配置，或本地索引、记录文件是否存在")
 
 # 记录查询日志
 def log_search(query_type, params):
@@ -69,11 +80,11 @@ def in_web_search(webtext, keytext=None):
 
     # 如果提供了关键词，添加内容匹配条件
     if keytext:
-        query["bool"]["must"].append({"match": {"content": keytext}})
+        query["bool"]["must"].append({"multi_match": {"query": keytext, "fields": ["content", ANCHOR_FIELD]}})
 
     try:
         # 执行搜索
-        result = es.search(index="web_pages", body={"query": query, "size": 20})
+        result = backend.search(INDEX_ALIAS, {"query": query, "size": 20})
         return result
     except Exception as e:
         st.error(f"查询时出错: {str(e)}")
@@ -110,14 +121,14 @@ def doc_search(itext):
         query = {
             "multi_match": {
                 "query": itext,
-                "fields": ["content", "title"],
+                "fields": ["content", "title", ANCHOR_FIELD],
                 "analyzer": "ik_max_word"  # 中文分词，按实际需求换分词器
             }
         }
 
     try:
 
-        return es.search(index="web_pages", body={"query": query, "size": 20})
+        return backend.search(INDEX_ALIAS, {"query": query, "size": 20})
     except Exception as e:
         st.error(f"查询时出错: {str(e)}")
         return {"hits": {"total": {"value": 0}, "hits": []}}
@@ -163,57 +174,99 @@ def phrase_search(keytexts, slop=2, fields=["content", "title"], analyzer="ik_ma
         }
 
         # 执行搜索，包含高亮
-        return es.search(
-            index="web_pages",
-            body={"query": query, "highlight": highlight, "size": 20}
+        return backend.search(
+            INDEX_ALIAS,
+            {"query": query, "highlight": highlight, "size": 20}
         )
     except Exception as e:
         st.error(f"查询时出错: {str(e)}")
         return {"hits": {"total": {"value": 0}, "hits": []}}
 
+# 通配查询的改写：中文片段在 ngram 子字段（相邻两字）上做短语查询即子串匹配，
+# 标题前缀在 title.prefix 子字段上做一次词项查找，都不需要遍历词典
+CJK_PATTERN = re.compile(r'^[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff*?]+$')
+PREFIX_MAX = 20  # 与 构建索引.py 中 title.prefix 子字段的最长前缀一致
+
+
+def fragment_query(field, fragment):
+    """片段出现在字段中：两字以上为 ngram 短语，单字为以它开头的两字词项或单字词项"""
+    if len(fragment) >= 2:
+        return {"match_phrase": {field: fragment}}
+    return {"bool": {"should": [{"term": {field: fragment}}, {"prefix": {field: fragment}}]}}
+
+
+def rewrite_wildcard(query_text, fields):
+    """把通配模式改写为子字段上的查询，不能改写时返回 None
+
+    模式按 * 与 ? 切成片段，要求各片段都出现（? 按 * 处理，结果可能略多）。
+    """
+    if not CJK_PATTERN.match(query_text):
+        return None
+    fragments = [f for f in re.split(r'[*?]+', query_text) if f]
+    should = [{
+        "bool": {
+            "must": [fragment_query(f"{field}.ngram", fragment) for fragment in fragments],
+            "boost": 2.0 if field == "title" else 1.0  # 标题匹配权重更高
+        }
+    } for field in fields]
+    # “南开*” 这类前缀模式额外匹配以它开头的标题
+    prefix = re.fullmatch(r'([^*?]+)\*+', query_text)
+    if "title" in fields and prefix and len(prefix.group(1)) <= PREFIX_MAX:
+        should.append({"term": {"title.prefix": {"value": prefix.group(1), "boost": 3.0}}})
+    return {"bool": {"should": should, "minimum_should_match": 1}}
+
+
 # 通配查询功能
-def wildcard_search(query_text, fields=["content", "title"], index_name="web_pages", max_results=20):
+def wildcard_search(query_text, fields=["content", "title"], index_name=INDEX_ALIAS, max_results=20):
 
     if not query_text:
         return {"hits": {"total": {"value": 0}, "hits": []}}
 
     # 检查并优化通配符查询
     query_text = query_text.strip()
+    if not re.sub(r'[*?]', '', query_text):
+        st.warning("⚠️ 请至少输入一个非通配字符")
+        return {"hits": {"total": {"value": 0}, "hits": []}}
 
-    # 警告前导通配符可能导致的性能问题
-    if query_text.startswith('*'):
-        st.warning("⚠️ 前导通配符可能导致查询性能下降，请尽量避免使用")
+    query = rewrite_wildcard(query_text, fields)
+    highlight_fields = [f"{field}.ngram" for field in fields]
+    if query is None:
+        # 含非中文字符时仍用原来的 wildcard 查询
+        highlight_fields = fields
+        # 警告前导通配符可能导致的性能问题
+        if query_text.startswith('*'):
+            st.warning("⚠️ 前导通配符可能导致查询性能下降，请尽量避免使用")
 
-    # 构建多字段通配查询
-    query = {
-        "bool": {
-            "should": []
+        # 构建多字段通配查询
+        query = {
+            "bool": {
+                "should": []
+            }
         }
-    }
 
-    # 为每个字段添加通配查询条件
-    for field in fields:
-        query["bool"]["should"].append({
-            "wildcard": {
-                field: {
-                    "value": query_text,
-                    "boost": 2.0 if field == "title" else 1.0  # 标题匹配权重更高
+        # 为每个字段添加通配查询条件
+        for field in fields:
+            query["bool"]["should"].append({
+                "wildcard": {
+                    field: {
+                        "value": query_text,
+                        "boost": 2.0 if field == "title" else 1.0  # 标题匹配权重更高
+                    }
                 }
-            }
-        })
+            })
 
-    # 至少匹配一个条件
-    query["bool"]["minimum_should_match"] = 1
+        # 至少匹配一个条件
+        query["bool"]["minimum_should_match"] = 1
 
     try:
         # 执行查询并返回结果
-        return es.search(
-            index=index_name,
-            body={
+        return backend.search(
+            index_name,
+            {
                 "query": query,
                 "size": max_results,
                 "highlight": {
-                    "fields": {field: {} for field in fields}
+                    "fields": {field: {} for field in highlight_fields}
                 }
             }
         )
@@ -229,7 +282,7 @@ def web_snapshot(url):
 
     query = {"term": {"url": url}}
     try:
-        res = es.search(index="web_pages", body={"query": query, "size": 1})
+        res = backend.search(INDEX_ALIAS, {"query": query, "size": 1})
         if res['hits']['total']['value'] > 0:
             return {
                 "success": True,
@@ -0,0 +1,82 @@
+"""爬虫的逐 URL 抓取记录
+
+保存每个 URL 最近一次抓取得到的 ETag、Last-Modified 与内容哈希，供增量抓取发送条件
+请求（If-None-Match / If-Modified-Since），并在服务器不支持条件请求时用内容哈希判断
+页面是否变化。记录保存在 SQLite 文件中，定期批量提交。
+"""
+import hashlib
+import sqlite3
+import time
+
+STATE_PATH = 'crawl_state.db'
+COMMIT_EVERY = 500  # 每累计多少条更新提交一次
+
+
+def content_hash(body):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class CrawlState:
+    """URL -> (etag, last_modified, content_hash, fetched_at)
+
+    Attributes
+    ----------
+    path(str): SQLite 文件路径
+    commit_every(int): 批量提交的更新条数
+    """
+    def __init__(self, path=STATE_PATH, commit_every=COMMIT_EVERY):
+        self.path = path
+        self.commit_every = commit_every
+        self.pending = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS pages ('
+                        'url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+                        'content_hash TEXT, fetched_at REAL)')
+
+    def __contains__(self, url):
+        return self.db.execute('SELECT 1 FROM pages WHERE url = ?', (url,)).fetchone() is not None
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def get(self, url):
+        row = self.db.execute('SELECT etag, last_modified, content_hash, fetched_at '
+                              'FROM pages WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('etag', 'last_modified', 'content_hash', 'fetched_at'), row))
+
+    def conditional_headers(self, url):
+        """构造条件请求头，没有记录时为空"""
+        record = self.get(url)
+        headers = {}
+        if record is not None:
+            if record['etag']:
+                headers['If-None-Match'] = record['etag']
+            if record['last_modified']:
+                headers['If-Modified-Since'] = record['last_modified']
+        return headers
+
+    def record(self, url, etag, last_modified, body_hash):
+        self.db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                        (url, etag, last_modified, body_hash, time.time()))
+        self._maybe_commit()
+
+    def touch(self, url):
+        """304 时只更新抓取时间"""
+        self.db.execute('UPDATE pages SET fetched_at = ? WHERE url = ?', (time.time(), url))
+        self._maybe_commit()
+
+    def _maybe_commit(self):
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        self.db.commit()
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self.db.close()
@@ -0,0 +1,687 @@
+"""南开新闻爬虫引擎：各栏目共用的并发抓取
+
+原先每个栏目一份脚本（南开要闻.py、综合新闻.py……），用 requests.get 逐个串行抓取
+列表页和文章页。这里把栏目之间的差异收敛为 SECTIONS 配置（列表页 URL 模板、页码范围、
+文章链接正则），由同一个引擎用 aiohttp 异步抓取：连接池复用 keep-alive 连接，按主机
+限制同时进行的请求数，并保证同一主机相邻两次请求之间的最小间隔（礼貌延迟）。
+输出与旧脚本一致：pages/ 下的 HTML 文件与 title2url.csv；清单边抓取边追加、按 URL
+去重（见 manifest.py），中途退出也不丢失已保存文章的记录。
+
+每个 URL 的 ETag、Last-Modified 与内容哈希记录在 crawl_state.db 中。增量模式
+（--incremental）下按从新到旧的顺序逐页抓取列表页并发送条件请求，某栏目连续
+--patience 个列表页没有新文章链接（304、内容未变或链接均已抓取过）即停止该栏目，
+已抓取过的文章不再请求（--revalidate 时以条件请求复查）。
+
+--store 时页面不再逐篇写成 .html 文件，而是追加到分段压缩的页面存储中（见
+page_store.py），清单中的 filename 列仍按原规则生成，作为文档的稳定名称。
+
+文章保存前用 SimHash 做近重复检测（见 near_dup.py）：同一篇报道在多个栏目下的副本
+只记录到重复簇中、指向最先抓取到的规范 URL，不保存也不写入清单。--no-dedup 关闭。
+
+SECTIONS 中的页码范围只是后备：每个栏目先抓取首页，从其中的分页链接得到实际的
+页码范围（见 Section.update_bounds），之后抓到的列表页若链接到范围之外的页码也会
+随之扩展，因此不请求不存在的页，也不漏掉新增的页。待抓取任务按新旧排序：越新的
+列表页及其文章越先抓取，各栏目的最新内容交错优先。
+
+待抓取任务与已见 URL 集合定期 checkpoint 到 crawl_frontier.db（见 frontier.py），
+中断后用 --resume 从上次停下的地方继续。
+
+抓取速度、各主机与栏目的响应时间直方图、状态码与异常计数、重试次数每隔
+--metrics-every 秒写入 crawl_metrics.json 与 crawl_metrics.prom（见 metrics.py）。
+
+    python crawler.py                                  # 抓取全部栏目
+    python crawler.py --resume                         # 继续上次被中断的抓取
+    python crawler.py --incremental                    # 每日增量刷新
+    python crawler.py --store page_store               # 页面写入分段存储
+    python crawler.py ywsd zhxw --per-host 4 --delay 0.2
+    python crawler.py --origin https://news.nankai.edu.cn=http://127.0.0.1:8765   # 对本地替身服务器抓取
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import time
+from collections import namedtuple
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+from crawl_state import STATE_PATH, CrawlState, content_hash
+from frontier import FRONTIER_PATH, CrawlFrontier
+from manifest import Manifest
+from metrics import METRICS_EVERY, METRICS_PATH, CrawlMetrics
+from near_dup import DEDUP_PATH, DuplicateIndex
+from page_store import PageStore
+
+# 配置部分
+OUTPUT_DIR = 'pages'
+CSV_PATH = 'title2url.csv'
+CONCURRENCY = 32       # 全局同时进行的请求数，即连接池大小
+PER_HOST = 8           # 每个主机同时进行的请求数
+DELAY = 0.02           # 同一主机相邻两次请求开始的最小间隔（秒）
+RETRIES = 3            # 网络错误或 5xx 时的重试次数
+LISTING_TIMEOUT = 10
+ARTICLE_TIMEOUT = 15
+PATIENCE = 1           # 增量模式下连续多少个列表页没有新链接后停止该栏目
+CHECKPOINT_EVERY = 30  # 每隔多少秒保存一次待抓取任务与已见集合
+USER_AGENT = 'Mozilla/5.0 (compatible; NankaiNewsCrawler/1.0)'
+
+NEWS_SITE = 'https://news.nankai.edu.cn'
+
+
+class Section:
+    """一个栏目的抓取配置
+
+    列表页用页码表示，None 表示栏目首页 index_url（没有 index_url 的栏目以最新的
+    编号页作为首页）。首页最新，其余按页码从新到旧。
+
+    Attributes
+    ----------
+    name(str): 栏目中文名
+    listing_url(str): 列表页 URL 模板，{page} 替换为页码
+    pages(range): 列表页页码范围；初始为配置的后备值，抓到首页后按分页链接更新
+    link_pattern(str): 文章链接 href 需匹配的正则
+    index_url(str): 栏目首页，如 index.shtml，为 None 时没有单独的首页
+    reverse_pages(bool): 页码越大内容越新（新闻网按从旧到新编号）
+    """
+    def __init__(self, name, listing_url, pages, link_pattern, index_url=None,
+                 reverse_pages=False):
+        self.name = name
+        self.listing_url = listing_url
+        self.pages = pages
+        self.link_pattern = re.compile(link_pattern)
+        self.index_url = index_url
+        self.reverse_pages = reverse_pages
+        # 由 URL 模板得到匹配分页链接的正则，如 .../c0003000000000000000_(\d+).shtml
+        prefix, _, rest = listing_url.partition('{page')
+        self.page_link = re.compile(re.escape(prefix) + r'(\d+)' + re.escape(rest.partition('}')[2]) + '$')
+
+    def index_page(self):
+        """首页对应的页码：有 index_url 时为 None，否则为最新的编号页"""
+        if self.index_url is not None:
+            return None
+        return self.pages[-1] if self.reverse_pages else self.pages[0]
+
+    def url_for(self, page):
+        return self.index_url if page is None else self.listing_url.format(page=page)
+
+    def newest_first(self):
+        """全部编号页的页码，按从新到旧排列"""
+        return list(reversed(self.pages) if self.reverse_pages else self.pages)
+
+    def older(self, page):
+        """比 page 旧一页的页码，已是最旧一页时为 None"""
+        if page is None:
+            return self.newest_first()[0]
+        older = page - 1 if self.reverse_pages else page + 1
+        return older if older in self.pages else None
+
+    def age(self, page):
+        """列表页的新旧程度，首页为 0，越旧越大"""
+        if page is None:
+            return 0
+        newest = self.pages[-1] if self.reverse_pages else self.pages[0]
+        return abs(newest - page) + (self.index_url is not None)
+
+    def update_bounds(self, pages, replace=False):
+        """按列表页中链接到的页码更新页码范围，返回是否有变化
+
+        replace 为真（首页）时分页链接（下一页、尾页等）给出实际的范围，取代配置的
+        后备值；否则只扩展不收缩。
+        """
+        if not pages:
+            return False
+        if self.index_url is None and replace:
+            pages = pages | {self.index_page()}   # 首页本身也是编号页
+        first, last = min(pages), max(pages)
+        if not replace:
+            first, last = min(first, self.pages[0]), max(last, self.pages[-1])
+        if range(first, last + 1) == self.pages:
+            return False
+        self.pages = range(first, last + 1)
+        return True
+
+
+def news_section(name, code, channel, pages):
+    """news.nankai.edu.cn 下的栏目：列表页按 9 位页码编号，文章链接含 /system/年份/"""
+    listing_url = (f'{NEWS_SITE}/{code}/system/count//{channel}/000000000000/000/000/'
+                   f'c{channel}000000000000_{{page:09d}}.shtml')
+    return Section(name, listing_url, pages, r'/system/\d{4}/',
+                   index_url=f'{NEWS_SITE}/{code}/index.shtml', reverse_pages=True)
+
+
+SECTIONS = {
+    'ywsd': news_section('南开要闻', 'ywsd', '0003000', range(100, 658)),
+    'zhxw': news_section('综合新闻', 'zhxw', '0004000', range(100, 844)),
+    'dcxy': news_section('多彩校园', 'dcxy', '0005000', range(100, 534)),
+    'mtnk': news_section('媒体南开', 'mtnk', '0006000', range(100, 999)),
+    'nkrw': news_section('南开故事', 'nkrw', '0008000', range(10, 68)),
+    'nkdxb': news_section('南开大学报', 'nkdxb', '0011000', range(10, 78)),
+    'xb': Section('南开办公网', 'https://xb.nankai.edu.cn/category/16/{page}', range(1, 95),
+                  r'/article/'),
+}
+
+
+def article_filename(url, title):
+    """文件名规则与旧脚本相同：过滤非法字符后的标题 + URL 的 MD5 前 8 位"""
+    valid_title = re.sub(r'[<>:"/\\|?*]', '_', title)
+    url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+    return valid_title, f"{valid_title}_{url_hash}.html"
+
+
+def extract_links(section, base_url, html):
+    """从列表页中提取 [(文章绝对 URL, 标题)] 与分页链接指向的页码集合"""
+    soup = BeautifulSoup(html, 'html.parser')
+    links, pages = [], set()
+    for link in soup.find_all('a', href=True):
+        href = urljoin(base_url, link['href'])
+        match = section.page_link.match(href)
+        if match:
+            pages.add(int(match.group(1)))
+            continue
+        if not section.link_pattern.search(link['href']):
+            continue
+        text = link.get_text().strip()
+        if len(text) > 0 and "index.shtml" not in href:
+            links.append((href, text))
+    return links, pages
+
+
+# 一次抓取的结果；status 为 304 时 body 为空，fetched_at 为收到响应的 time.time()
+Response = namedtuple('Response', 'status body encoding changed fetched_at')
+
+
+class HostLimiter:
+    """单个主机的并发上限与礼貌延迟"""
+    def __init__(self, per_host, delay):
+        self.semaphore = asyncio.Semaphore(per_host)
+        self.delay = delay
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.delay > 0:
+            # 按到达顺序分配请求开始时刻，相邻两次至少间隔 delay
+            async with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_start)
+                self.next_start = start + self.delay
+            if start > now:
+                await asyncio.sleep(start - now)
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        self.semaphore.release()
+
+
+class Crawler:
+    """栏目爬虫：列表页与文章页共用一个任务队列和一组工作协程
+
+    Attributes
+    ----------
+    output_dir(str): HTML 文件保存目录
+    csv_path(str): 标题与 URL 映射表（只追加的清单）
+    concurrency(int): 工作协程数，同时也是连接池大小
+    per_host(int): 每个主机同时进行的请求数
+    delay(float): 同一主机相邻请求的最小间隔（秒）
+    origins(dict): 实际请求时的站点替换，如 {'https://news.nankai.edu.cn': 'http://127.0.0.1:8765'}；
+        记录与文件名仍使用原始 URL，便于对本地替身服务器测试
+    state(CrawlState): 逐 URL 的验证器与内容哈希
+    incremental(bool): 增量模式，见模块说明
+    patience(int): 增量模式下连续多少个列表页没有新链接后停止该栏目
+    revalidate(bool): 增量模式下是否以条件请求复查已抓取的文章
+    frontier(CrawlFrontier): 持久化的待抓取任务与已见集合，为 None 时只在内存中去重
+    checkpoint_every(float): checkpoint 的间隔（秒）
+    page_store(PageStore): 页面存储，为 None 时每篇文章写成 output_dir 下的一个文件
+    dedup(DuplicateIndex): 近重复检测，为 None 时不检测
+    metrics(CrawlMetrics): 结构化指标，为 None 时只在内存中统计
+    metrics_every(float): 写指标文件的间隔（秒）
+    sink: 新保存的文章交给它继续处理（如 pipeline.py 的解析与索引流水线），需提供
+        协程方法 put(url, title, filename, html, fetched_at)；队列满时 put 阻塞，抓取随之放缓
+    """
+    def __init__(self, output_dir=OUTPUT_DIR, csv_path=CSV_PATH, concurrency=CONCURRENCY,
+                 per_host=PER_HOST, delay=DELAY, retries=RETRIES, origins=None,
+                 state=None, incremental=False, patience=PATIENCE, revalidate=False,
+                 frontier=None, checkpoint_every=CHECKPOINT_EVERY, page_store=None,
+                 dedup=None, metrics=None, metrics_every=METRICS_EVERY, sink=None):
+        self.output_dir = output_dir
+        self.csv_path = csv_path
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.delay = delay
+        self.retries = retries
+        self.origins = origins or {}
+        self.state = state
+        self.incremental = incremental
+        self.patience = patience
+        self.revalidate = revalidate
+        self.frontier = frontier
+        self.checkpoint_every = checkpoint_every
+        self.page_store = page_store
+        self.dedup = dedup
+        self.metrics = metrics if metrics is not None else CrawlMetrics()
+        self.metrics_every = metrics_every
+        self.sink = sink
+        self.hosts = {}
+        self.sections = {}    # 栏目名 -> 本次抓取的 Section
+        self.listed = {}      # 栏目名 -> 已加入队列的列表页页码
+        self.manifest = None
+        self.seen = set()     # 没有 frontier 时已入队的文章 URL
+        self.pending = {}     # 任务序号 -> 尚未完成的任务（含已出队正在处理的）
+        self.next_job = 0
+        self.stats = {'requests': 0, 'listings': 0, 'saved': 0, 'skipped': 0,
+                      'not_modified': 0, 'unchanged': 0, 'duplicates': 0, 'errors': 0,
+                      'bytes': 0}
+
+    def request_url(self, url):
+        for origin, replacement in self.origins.items():
+            if url.startswith(origin):
+                return replacement + url[len(origin):]
+        return url
+
+    def mark_seen(self, url):
+        """标记 URL 为已见，返回它此前是否未见过"""
+        if self.frontier is not None:
+            return self.frontier.add(url)
+        if url in self.seen:
+            return False
+        self.seen.add(url)
+        return True
+
+    def has_page(self, url, filename):
+        if self.page_store is not None:
+            return url in self.page_store
+        return os.path.exists(os.path.join(self.output_dir, filename))
+
+    def is_duplicate(self, url):
+        return self.dedup is not None and self.dedup.is_duplicate(url)
+
+    def write_page(self, url, title, filename, html):
+        if self.page_store is not None:
+            self.page_store.put(url, html.encode('utf-8'), title=title)
+        else:
+            with open(os.path.join(self.output_dir, filename), 'w', encoding='utf-8') as f:
+                f.write(html)
+
+    def enqueue(self, queue, job):
+        """任务在处理完之前一直留在 pending 中，checkpoint 时一并保存
+
+        队列按 (新旧程度, 列表页优先, 入队顺序) 排序：文章继承所在列表页的新旧程度，
+        越新的内容越先抓取；同样新的列表页先于文章，以便尽早发现其中的链接。
+        """
+        kind, section, *args = job
+        if kind == 'listing':
+            priority = (section.age(args[0]), 0)
+        else:
+            priority = (args[2] if len(args) > 2 else 0, 1)
+        self.pending[self.next_job] = job
+        queue.put_nowait((*priority, self.next_job, job))
+        self.next_job += 1
+
+    def enqueue_listings(self, queue, section):
+        """非增量模式：把页码范围内尚未入队的列表页全部加入队列"""
+        listed = self.listed.setdefault(section.name, set())
+        for page in section.newest_first():
+            if page not in listed:
+                listed.add(page)
+                self.enqueue(queue, ('listing', section, page, 0))
+
+    def host_limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = HostLimiter(self.per_host, self.delay)
+        return self.hosts[host]
+
+    async def fetch(self, session, url, timeout, section, conditional=False):
+        """GET 并返回 Response；网络错误与 5xx 按指数退避重试
+
+        conditional 为真时带上记录的验证器，服务器返回 304 则 status 为 304。
+        200 时更新抓取记录，changed 表示内容哈希与上次不同。
+        section 为栏目名，用于按栏目统计响应时间。
+        """
+        target = self.request_url(url)
+        host = urlsplit(url).netloc
+        headers = self.state.conditional_headers(url) if conditional and self.state else {}
+        for attempt in range(self.retries + 1):
+            try:
+                queued = time.perf_counter()
+                async with self.host_limiter(target):
+                    started = time.perf_counter()
+                    self.metrics.waited(host, started - queued)
+                    self.stats['requests'] += 1
+                    async with session.get(target, headers=headers,
+                                           timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                        if response.status == 304:
+                            self.metrics.response(host, section, 304, time.perf_counter() - started)
+                            self.stats['not_modified'] += 1
+                            if self.state is not None:
+                                self.state.touch(url)
+                            return Response(304, b'', None, False, time.time())
+                        if response.status >= 400:
+                            self.metrics.response(host, section, response.status,
+                                                  time.perf_counter() - started)
+                        if response.status >= 500 and attempt < self.retries:
+                            raise aiohttp.ClientResponseError(response.request_info, (),
+                                                              status=response.status)
+                        response.raise_for_status()  # 主动检查HTTP错误
+                        body = await response.read()
+                        self.metrics.response(host, section, response.status,
+                                              time.perf_counter() - started)
+                        encoding = response.get_encoding()
+                        etag = response.headers.get('ETag')
+                        last_modified = response.headers.get('Last-Modified')
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.metrics.exception(e)
+                if attempt == self.retries or (isinstance(e, aiohttp.ClientResponseError)
+                                               and e.status < 500):
+                    raise
+                self.metrics.retry()
+                await asyncio.sleep(0.5 * 2 ** attempt)
+
+        self.stats['bytes'] += len(body)
+        changed = True
+        if self.state is not None:
+            body_hash = content_hash(body)
+            previous = self.state.get(url)
+            changed = previous is None or previous['content_hash'] != body_hash
+            self.state.record(url, etag, last_modified, body_hash)
+        if not changed:
+            self.stats['unchanged'] += 1
+        return Response(response.status, body, encoding, changed, time.time())
+
+    async def crawl_listing(self, session, queue, section, page, misses):
+        """抓取列表页，把其中尚未见过的文章加入队列
+
+        首页总是完整抓取，用其中的分页链接确定实际的页码范围；其他列表页链接到
+        范围之外的页码时同样扩展范围，非增量模式下新增的页随即入队。
+        增量模式下列表页是逐页抓取的：本页有新链接则继续下一页，连续 patience
+        页没有新链接则停止该栏目。
+        """
+        url = section.url_for(page)
+        first = page == section.index_page()
+        response = await self.fetch(session, url, LISTING_TIMEOUT, section.name,
+                                    conditional=self.incremental and not first)
+        self.stats['listings'] += 1
+        new = 0
+        if response.status != 304 and (response.changed or not self.incremental or first):
+            links, pages = extract_links(section, url, response.body)
+            previous = section.pages
+            changed = section.update_bounds(pages, replace=first)
+            if changed:
+                print(f"  🧭 {section.name}: 列表页范围 {previous.start}-{previous.stop - 1} "
+                      f"-> {section.pages.start}-{section.pages.stop - 1}")
+            if not self.incremental and (first or changed):
+                self.enqueue_listings(queue, section)
+            for href, title in links:
+                if not self.mark_seen(href):
+                    continue
+                valid_title, filename = article_filename(href, title)
+                if self.incremental and self.is_duplicate(href):
+                    continue  # 已知的近重复副本
+                if self.incremental and self.has_page(href, filename):
+                    # 已抓取过的文章不算新链接，只有 --revalidate 时才复查
+                    self.manifest.add(valid_title, href, filename)
+                    if not self.revalidate:
+                        continue
+                else:
+                    new += 1
+                self.enqueue(queue, ('article', section, href, title, section.age(page)))
+        if self.incremental:
+            misses = 0 if new else misses + 1
+            older = section.older(page)
+            if misses < self.patience and older is not None:
+                self.enqueue(queue, ('listing', section, older, misses))
+            elif older is not None:
+                print(f"  ⏹️ {section.name}: 连续 {misses} 个列表页没有新文章，停止于 {url}")
+
+    async def save_article(self, session, section, url, title, age=0):
+        """保存单篇新闻的HTML内容并记录标题与URL映射"""
+        valid_title, filename = article_filename(url, title)
+        if self.is_duplicate(url):
+            self.stats['duplicates'] += 1
+            return
+        exists = self.has_page(url, filename)
+        if exists and not (self.incremental and self.revalidate):
+            self.stats['skipped'] += 1
+        else:
+            response = await self.fetch(session, url, ARTICLE_TIMEOUT, section.name,
+                                        conditional=exists)
+            if response.status == 304 or (exists and not response.changed):
+                self.stats['skipped'] += 1
+            else:
+                html = response.body.decode(response.encoding, errors='replace')
+                canonical = self.dedup.check(url, html) if self.dedup is not None else None
+                if canonical is not None:
+                    # 只保存规范文章，副本记录在重复簇中
+                    self.stats['duplicates'] += 1
+                    return
+                self.write_page(url, valid_title, filename, html)
+                self.stats['saved'] += 1
+                if self.sink is not None:
+                    await self.sink.put(url, title, filename, html, response.fetched_at)
+        self.manifest.add(valid_title, url, filename)
+
+    async def worker(self, session, queue):
+        while True:
+            *_, job_id, (kind, section, *args) = await queue.get()
+            cancelled = False
+            try:
+                if kind == 'listing':
+                    await self.crawl_listing(session, queue, section, *args)
+                else:
+                    await self.save_article(session, section, *args)
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                if kind == 'listing':
+                    page, misses = args
+                    url = section.url_for(page)
+                    if self.incremental and section.older(page) is not None:
+                        # 出错的列表页不计入连续无新链接的页数，继续向后抓取
+                        self.enqueue(queue, ('listing', section, section.older(page), misses))
+                    elif page == section.index_page() and not self.incremental:
+                        # 首页抓取失败，按配置的页码范围抓取
+                        self.enqueue_listings(queue, section)
+                else:
+                    url = args[0]
+                if not isinstance(e, (aiohttp.ClientError, asyncio.TimeoutError)):
+                    self.metrics.exception(e)   # 请求异常已在 fetch 中计数
+                self.metrics.error(kind, url, e)
+                print(f"  ⚠️ Error for {kind} page {url}: {e!r}")
+            finally:
+                # 子任务已先入队，再移除本任务，checkpoint 不会漏掉任何一方；
+                # 被中断（Ctrl-C）的任务留在 pending 中，由最后的 checkpoint 保存
+                if not cancelled:
+                    del self.pending[job_id]
+                queue.task_done()
+
+    def checkpoint(self):
+        jobs = [[kind, section.name, *args] for kind, section, *args in self.pending.values()]
+        self.frontier.checkpoint(jobs, {name: section.pages for name, section in self.sections.items()},
+                                 self.listed)
+        if self.state is not None:
+            self.state.commit()
+        if self.page_store is not None:
+            self.page_store.commit()
+        if self.dedup is not None:
+            self.dedup.commit()
+        return len(jobs)
+
+    async def checkpointer(self):
+        while True:
+            await asyncio.sleep(self.checkpoint_every)
+            self.checkpoint()
+
+    async def metrics_writer(self):
+        while True:
+            await asyncio.sleep(self.metrics_every)
+            self.metrics.write(self.stats)
+
+    async def progress(self, start):
+        while True:
+            await asyncio.sleep(5)
+            elapsed = time.perf_counter() - start
+            print(f"⏱️ {elapsed:.0f}s: 列表页 {self.stats['listings']}，保存 {self.stats['saved']}，"
+                  f"跳过 {self.stats['skipped']}，重复 {self.stats['duplicates']}，错误 {self.stats['errors']}，"
+                  f"{self.stats['saved'] / elapsed:.1f} 篇/秒")
+
+    async def run(self, sections, resume=False):
+        """抓取给定的栏目（Section 列表）
+
+        resume 为真且 frontier 中有上次未完成的任务时，从这些任务继续，
+        否则清空 frontier 从头开始。
+        """
+        if self.page_store is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+        self.manifest = Manifest(self.csv_path)
+        queue = asyncio.PriorityQueue()
+        self.sections = {section.name: section for section in sections}
+
+        jobs = self.frontier.resume() if resume and self.frontier is not None else []
+        jobs = [(kind, self.sections[name], *args) for kind, name, *args in jobs if name in self.sections]
+        if jobs:
+            print(f"🔁 从 checkpoint 恢复 {len(jobs)} 个未完成任务")
+            # 恢复上次的页码范围与已入队过的列表页（未完成的在恢复的任务中），之后只有
+            # 尚未入队的页才入队；首页尚未抓取时已入队的只有首页，抓取后按实际范围入队
+            bounds, listed = self.frontier.bounds(), self.frontier.listed()
+            for section in sections:
+                section.pages = bounds.get(section.name, section.pages)
+                # 旧版本的 frontier 没有记录已入队的页，视为范围内的页都已入队
+                self.listed[section.name] = listed.get(section.name, set(section.pages) | {None})
+        else:
+            if self.frontier is not None:
+                self.frontier.reset()
+            for section in sections:
+                # 先抓首页确定页码范围，之后增量模式逐页推进，否则一次性加入全部列表页
+                self.listed[section.name] = {section.index_page()}
+                jobs.append(('listing', section, section.index_page(), 0))
+        for job in jobs:
+            self.enqueue(queue, job)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                         keepalive_timeout=30)
+        start = time.perf_counter()
+        async with aiohttp.ClientSession(connector=connector,
+                                         headers={'User-Agent': USER_AGENT}) as session:
+            workers = [asyncio.create_task(self.worker(session, queue))
+                       for _ in range(self.concurrency)]
+            background = [asyncio.create_task(self.progress(start)),
+                          asyncio.create_task(self.metrics_writer())]
+            if self.frontier is not None:
+                background.append(asyncio.create_task(self.checkpointer()))
+            completed = False
+            try:
+                await queue.join()
+                completed = True
+            finally:
+                for task in workers + background:
+                    task.cancel()
+                await asyncio.gather(*workers, *background, return_exceptions=True)
+                if self.frontier is not None:
+                    if completed:
+                        self.frontier.finish()
+                    else:
+                        print(f"💾 已保存 checkpoint：{self.checkpoint()} 个未完成任务，"
+                              f"用 --resume 继续")
+                self.manifest.close()
+                self.metrics.write(self.stats)
+                print(f"📊 {len(self.manifest)} article mappings in {self.csv_path} "
+                      f"({self.manifest.added} new)")
+                if self.state is not None:
+                    self.state.commit()
+        return time.perf_counter() - start
+
+
+def parse_origins(values):
+    origins = {}
+    for value in values or []:
+        origin, _, replacement = value.partition('=')
+        origins[origin.rstrip('/')] = replacement.rstrip('/')
+    return origins
+
+
+def build_parser(default_sections=None, description='南开新闻并发爬虫'):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('sections', nargs='*', default=default_sections or list(SECTIONS),
+                        help=f"栏目代号，可选 {', '.join(SECTIONS)}，默认全部")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--csv', default=CSV_PATH)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--per-host', type=int, default=PER_HOST)
+    parser.add_argument('--delay', type=float, default=DELAY, help='同一主机相邻请求的最小间隔（秒）')
+    parser.add_argument('--retries', type=int, default=RETRIES)
+    parser.add_argument('--origin', action='append', metavar='ORIGIN=REPLACEMENT',
+                        help='请求时替换站点，可多次指定，用于对本地替身服务器测试')
+    parser.add_argument('--state', default=STATE_PATH, help='逐 URL 抓取记录（SQLite）')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量抓取：条件请求，列表页没有新链接时停止该栏目')
+    parser.add_argument('--patience', type=int, default=PATIENCE,
+                        help='增量模式下连续多少个列表页没有新链接后停止')
+    parser.add_argument('--revalidate', action='store_true',
+                        help='增量模式下以条件请求复查有变化的列表页中已抓取过的文章')
+    parser.add_argument('--frontier', default=FRONTIER_PATH, help='待抓取任务与已见集合（SQLite）')
+    parser.add_argument('--resume', action='store_true', help='从上次的 checkpoint 继续')
+    parser.add_argument('--store', default=None, help='页面存储目录，给定时不再逐篇写 .html 文件')
+    parser.add_argument('--dedup', default=DEDUP_PATH, help='近重复指纹与重复簇（SQLite）')
+    parser.add_argument('--no-dedup', action='store_true', help='不做近重复检测')
+    parser.add_argument('--checkpoint-every', type=float, default=CHECKPOINT_EVERY,
+                        help='checkpoint 间隔（秒）')
+    parser.add_argument('--metrics', default=METRICS_PATH,
+                        help='指标文件名前缀，写出 <前缀>.json 与 <前缀>.prom')
+    parser.add_argument('--no-metrics', action='store_true', help='不写指标文件')
+    parser.add_argument('--metrics-every', type=float, default=METRICS_EVERY,
+                        help='写指标文件的间隔（秒）')
+    return parser
+
+
+def make_crawler(parser, args, **options):
+    """按命令行参数构造 Crawler，options 为额外的构造参数"""
+    unknown = [name for name in args.sections if name not in SECTIONS]
+    if unknown:
+        parser.error(f"未知栏目: {', '.join(unknown)}")
+    return Crawler(output_dir=args.output_dir, csv_path=args.csv,
+                   concurrency=args.concurrency, per_host=args.per_host,
+                   delay=args.delay, retries=args.retries,
+                   origins=parse_origins(args.origin), state=CrawlState(args.state),
+                   incremental=args.incremental, patience=args.patience,
+                   revalidate=args.revalidate, frontier=CrawlFrontier(args.frontier),
+                   checkpoint_every=args.checkpoint_every,
+                   page_store=PageStore(args.store) if args.store else None,
+                   dedup=None if args.no_dedup else DuplicateIndex(args.dedup),
+                   metrics=CrawlMetrics(None if args.no_metrics else args.metrics),
+                   metrics_every=args.metrics_every, **options)
+
+
+def close_crawler(crawler):
+    crawler.state.close()
+    crawler.frontier.close()
+    if crawler.page_store is not None:
+        crawler.page_store.close()
+    if crawler.dedup is not None:
+        crawler.dedup.close()
+
+
+def main(default_sections=None):
+    parser = build_parser(default_sections)
+    args = parser.parse_args()
+    crawler = make_crawler(parser, args)
+    sections = [SECTIONS[name] for name in args.sections]
+    print(f"🚀 Starting crawler for {', '.join(s.name for s in sections)}. "
+          f"Saving HTML files to '{args.store or args.output_dir}', mapping to '{args.csv}'")
+    try:
+        elapsed = asyncio.run(crawler.run(sections, resume=args.resume))
+        print(f"✅ Crawling completed in {elapsed:.1f}s: {crawler.stats}")
+    except KeyboardInterrupt:
+        print("\n🛑 Crawling interrupted by user.")
+    finally:
+        close_crawler(crawler)
+
+
+if __name__ == '__main__':
+    main()
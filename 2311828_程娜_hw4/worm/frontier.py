@@ -0,0 +1,164 @@
+"""爬虫的持久化待抓取队列（frontier）与已见 URL 集合
+
+已见集合分两层：内存中的 Bloom 过滤器回答“一定没见过”，只有过滤器认为可能见过时
+才查询 SQLite 中的精确集合，因此新 URL 的去重判断不访问磁盘，也不必像旧脚本那样
+对每个 URL 做一次文件系统 stat。
+
+待抓取任务与已见集合在同一个 SQLite 事务中定期提交（checkpoint），两者始终对应
+同一时刻：进程被杀后从最近一次 checkpoint 恢复，不会出现“链接已标记为见过、
+对应任务却丢失”的情况。
+"""
+import hashlib
+import json
+import math
+import os
+import sqlite3
+
+FRONTIER_PATH = 'crawl_frontier.db'
+BLOOM_CAPACITY = 1000000   # 预计的 URL 数，超出后误判率逐渐升高，但结果仍然精确
+BLOOM_ERROR_RATE = 0.001
+
+
+class BloomFilter:
+    """基于 blake2b 双重哈希的 Bloom 过滤器
+
+    Attributes
+    ----------
+    num_bits(int): 位数组长度
+    num_hashes(int): 每个元素设置的位数
+    """
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+    def save(self, path, count):
+        """写出位数组，count 为当时精确集合的大小，用于恢复时校验"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps({'num_bits': self.num_bits, 'num_hashes': self.num_hashes,
+                                'count': count}).encode() + b'\n')
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    def load(self, path, count):
+        """读入位数组；文件不存在或与精确集合不一致时返回 False"""
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                bits = f.read()
+        except (OSError, ValueError):
+            return False
+        if (header.get('num_bits') != self.num_bits or header.get('count') != count
+                or len(bits) != len(self.bits)):
+            return False
+        self.num_hashes = header['num_hashes']
+        self.bits = bytearray(bits)
+        return True
+
+
+class CrawlFrontier:
+    """持久化的待抓取任务与已见 URL 集合
+
+    Attributes
+    ----------
+    path(str): SQLite 文件路径，Bloom 过滤器保存在 path + '.bloom'
+    bloom(BloomFilter): 内存中的已见 URL 过滤器
+    """
+    def __init__(self, path=FRONTIER_PATH, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE):
+        self.path = path
+        self.bloom_path = path + '.bloom'
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS seen (url TEXT PRIMARY KEY)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS frontier (seq INTEGER PRIMARY KEY, job TEXT)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS bounds (section TEXT PRIMARY KEY, first INTEGER, last INTEGER, '
+                        'listed TEXT)')
+        if 'listed' not in {row[1] for row in self.db.execute('PRAGMA table_info(bounds)')}:
+            self.db.execute('ALTER TABLE bounds ADD COLUMN listed TEXT')  # 旧版本创建的 frontier
+        self.db.commit()
+        self.disk_lookups = 0
+
+    def seen_count(self):
+        return self.db.execute('SELECT COUNT(*) FROM seen').fetchone()[0]
+
+    def resume(self):
+        """恢复上次 checkpoint 时的已见集合，返回当时未完成的任务列表"""
+        count = self.seen_count()
+        if not self.bloom.load(self.bloom_path, count):
+            # 位数组缺失或过期，从精确集合重建
+            self.bloom = BloomFilter(self.capacity, self.error_rate)
+            for (url,) in self.db.execute('SELECT url FROM seen'):
+                self.bloom.add(url)
+        return [json.loads(job) for (job,) in
+                self.db.execute('SELECT job FROM frontier ORDER BY seq')]
+
+    def bounds(self):
+        """上次 checkpoint 时各栏目的列表页页码范围 {栏目名: range}"""
+        return {section: range(first, last + 1) for section, first, last in
+                self.db.execute('SELECT section, first, last FROM bounds')}
+
+    def listed(self):
+        """上次 checkpoint 时各栏目已入队过的列表页页码 {栏目名: set}，首页为 None；
+        旧版本的 frontier 没有记录时不含该栏目"""
+        return {section: set(json.loads(listed)) for section, listed in
+                self.db.execute('SELECT section, listed FROM bounds WHERE listed IS NOT NULL')}
+
+    def reset(self):
+        """清空已见集合与待抓取任务，开始新一轮抓取"""
+        self.db.execute('DELETE FROM seen')
+        self.db.execute('DELETE FROM frontier')
+        self.db.execute('DELETE FROM bounds')
+        self.db.commit()
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        if os.path.exists(self.bloom_path):
+            os.remove(self.bloom_path)
+
+    def add(self, url):
+        """标记 URL 为已见，返回它此前是否未见过"""
+        if url in self.bloom:
+            self.disk_lookups += 1
+            if self.db.execute('SELECT 1 FROM seen WHERE url = ?', (url,)).fetchone():
+                return False
+        self.bloom.add(url)
+        self.db.execute('INSERT OR IGNORE INTO seen VALUES (?)', (url,))
+        return True
+
+    def checkpoint(self, jobs, bounds=None, listed=None):
+        """在一个事务中提交已见集合的新增部分、当前全部未完成任务、各栏目的页码范围
+        与已入队过的列表页页码"""
+        listed = listed or {}
+        self.db.execute('DELETE FROM frontier')
+        self.db.executemany('INSERT INTO frontier (job) VALUES (?)',
+                            ((json.dumps(job, ensure_ascii=False),) for job in jobs))
+        self.db.executemany('INSERT OR REPLACE INTO bounds VALUES (?, ?, ?, ?)',
+                            ((section, pages.start, pages.stop - 1,
+                              json.dumps(list(listed[section])) if section in listed else None)
+                             for section, pages in (bounds or {}).items()))
+        self.db.commit()
+        self.bloom.save(self.bloom_path, self.seen_count())
+
+    def finish(self):
+        """抓取正常结束：清空待抓取任务，下次 --resume 将从头开始"""
+        self.checkpoint([])
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
@@ -0,0 +1,109 @@
+"""爬虫输出清单 title2url.csv 的流式追加写入
+
+每保存一篇文章立即追加一行（title, url, filename），按 URL 去重，列与编码同旧脚本
+（utf-8-sig），构建索引.py 与 bsbi_nankai.py 可直接读取。爬虫中途退出时已写入的记录
+不会丢失；重新打开时先截掉崩溃留下的半行，再继续追加。
+"""
+import csv
+import hashlib
+import os
+
+FSYNC_EVERY = 200  # 每追加多少行同步到磁盘一次
+
+
+def url_digest(url):
+    """URL 的 8 字节摘要，去重集合只保存摘要以节省内存"""
+    return hashlib.blake2b(url.encode(), digest_size=8).digest()
+
+
+def read_manifest_rows(path):
+    """逐行读取清单，产出 (title, url, filename)"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 跳过标题行
+        for row in reader:
+            if len(row) >= 3:
+                yield row[0], row[1], row[2]
+
+
+class Manifest:
+    """以 URL 为键、只追加的清单文件
+
+    Attributes
+    ----------
+    path(str): 清单路径
+    fsync_every(int): 每追加多少行 fsync 一次
+    """
+    def __init__(self, path, fsync_every=FSYNC_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.urls = set()
+        self.added = 0
+        self._repair()
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            for _, url, _ in read_manifest_rows(self.path):
+                self.urls.add(url_digest(url))
+            self.file = open(self.path, 'a', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file)
+        else:
+            # 新文件写入 BOM 与标题行，与 DataFrame.to_csv(encoding='utf-8-sig') 一致
+            self.file = open(self.path, 'w', encoding='utf-8-sig', newline='')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(['title', 'url', 'filename'])
+            self.file.flush()
+
+    def _repair(self):
+        """截掉末尾不完整的一行（上次写到一半时进程被杀）"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b'\n':
+                return
+            # 从末尾向前找最后一个换行符
+            position = size
+            while position > 0:
+                step = min(4096, position)
+                position -= step
+                f.seek(position)
+                chunk = f.read(step)
+                newline = chunk.rfind(b'\n')
+                if newline >= 0:
+                    f.truncate(position + newline + 1)
+                    return
+            f.truncate(0)
+
+    def __contains__(self, url):
+        return url_digest(url) in self.urls
+
+    def __len__(self):
+        return len(self.urls)
+
+    def add(self, title, url, filename):
+        """追加一条记录并立即刷出；URL 已存在时忽略，返回是否写入"""
+        digest = url_digest(url)
+        if digest in self.urls:
+            return False
+        self.urls.add(digest)
+        self.writer.writerow([title, url, filename])
+        self.file.flush()
+        self.added += 1
+        if self.added % self.fsync_every == 0:
+            os.fsync(self.file.fileno())
+        return True
+
+    def close(self):
+        if not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
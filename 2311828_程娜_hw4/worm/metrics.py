@@ -0,0 +1,216 @@
+"""爬虫的结构化指标
+
+按主机与栏目统计响应时间直方图，按状态码统计响应数，按异常类型统计异常数，以及重试
+次数、字节数与抓取速度。爬虫运行期间定期把快照原子地写成两份文件：
+
+    crawl_metrics.json   便于脚本读取与比较不同参数下的运行
+    crawl_metrics.prom   Prometheus 文本格式，可交给 node_exporter 的 textfile 收集器
+
+调并发度时关注各主机响应时间的分布与 429/503、超时的计数：并发加大后响应时间整体
+右移或这些计数开始增长，说明对方已在限流。最近的若干条错误也保存在 JSON 中，
+不再只打印在终端里。
+
+    python metrics.py crawl_metrics.json               # 打印各主机的响应时间分位数
+"""
+import argparse
+import bisect
+import json
+import os
+import time
+from collections import Counter, defaultdict, deque
+
+METRICS_PATH = 'crawl_metrics'   # 输出文件名前缀，分别加 .json 与 .prom 后缀
+METRICS_EVERY = 10               # 每隔多少秒写一次指标文件
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)   # 秒
+RECENT_ERRORS = 50               # JSON 中保留的最近错误条数
+
+
+class Histogram:
+    """固定桶的直方图，counts[i] 为落在 (LATENCY_BUCKETS[i-1], LATENCY_BUCKETS[i]] 的个数"""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Prometheus 风格的累计计数 [(上界, 不超过该上界的个数)]"""
+        total, result = 0, []
+        for bound, count in zip(list(self.buckets) + [float('inf')], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """按桶上界估计分位数，落在 +Inf 桶时返回最大的有限上界"""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != float('inf') else self.buckets[-1]
+
+    def to_dict(self):
+        return {'buckets': {('+Inf' if bound == float('inf') else str(bound)): total
+                            for bound, total in self.cumulative()},
+                'count': self.count, 'sum': round(self.sum, 6)}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_label(value)}"' for name, value in labels.items()) + '}'
+
+
+def _write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+class CrawlMetrics:
+    """一次抓取的指标
+
+    Attributes
+    ----------
+    path(str): 输出文件名前缀，为 None 时只在内存中统计、不写文件
+    latency(dict): (主机, 栏目) -> 响应时间直方图（秒），从拿到主机许可开始计时
+    wait(dict): 主机 -> 等待主机并发许可与礼貌延迟的总秒数
+    statuses(Counter): HTTP 状态码 -> 响应数
+    exceptions(Counter): 异常类型名 -> 次数（含随后重试成功的）
+    retries(int): 重试次数
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.start = time.time()
+        self.latency = defaultdict(Histogram)
+        self.wait = Counter()
+        self.statuses = Counter()
+        self.exceptions = Counter()
+        self.retries = 0
+        self.errors = deque(maxlen=RECENT_ERRORS)
+        self.last_write = (time.perf_counter(), 0)   # (时刻, 当时的保存篇数)，用于计算近期速度
+
+    def response(self, host, section, status, seconds):
+        self.statuses[status] += 1
+        self.latency[host, section].observe(seconds)
+
+    def waited(self, host, seconds):
+        self.wait[host] += seconds
+
+    def exception(self, exception):
+        self.exceptions[type(exception).__name__] += 1
+
+    def retry(self):
+        self.retries += 1
+
+    def error(self, kind, url, exception):
+        """记录最终失败的任务（重试用尽或不可重试）"""
+        self.errors.append({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'kind': kind,
+                            'url': url, 'error': repr(exception)})
+
+    def snapshot(self, stats):
+        """当前指标的字典形式，stats 为 Crawler.stats"""
+        now = time.perf_counter()
+        elapsed = max(time.time() - self.start, 1e-9)
+        last_time, last_saved = self.last_write
+        interval = max(now - last_time, 1e-9)
+        return {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'elapsed_seconds': round(elapsed, 3),
+            'stats': dict(stats),
+            'pages_per_second': round(stats['saved'] / elapsed, 3),
+            'recent_pages_per_second': round((stats['saved'] - last_saved) / interval, 3),
+            'bytes_per_second': round(stats['bytes'] / elapsed, 1),
+            'retries': self.retries,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'exceptions': dict(self.exceptions.most_common()),
+            'host_wait_seconds': {host: round(seconds, 3) for host, seconds in self.wait.items()},
+            'latency_seconds': [{'host': host, 'section': section, **histogram.to_dict()}
+                                for (host, section), histogram in sorted(self.latency.items())],
+            'recent_errors': list(self.errors),
+        }
+
+    def prometheus(self, stats):
+        """Prometheus 文本格式"""
+        elapsed = max(time.time() - self.start, 1e-9)
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                lines.append(f'{name}{labels} {value}')
+
+        metric('crawler_requests_total', 'counter', 'HTTP requests sent, including retries.',
+               [('', stats['requests'])])
+        metric('crawler_bytes_total', 'counter', 'Response body bytes received.',
+               [('', stats['bytes'])])
+        metric('crawler_pages_total', 'counter', 'Article and listing outcomes.',
+               [(_labels(result=key), value) for key, value in stats.items()
+                if key not in ('requests', 'bytes')])
+        metric('crawler_pages_per_second', 'gauge', 'Articles saved per second since start.',
+               [('', round(stats['saved'] / elapsed, 3))])
+        metric('crawler_responses_total', 'counter', 'HTTP responses by status code.',
+               [(_labels(status=status), count) for status, count in sorted(self.statuses.items())])
+        metric('crawler_exceptions_total', 'counter', 'Request exceptions by type.',
+               [(_labels(type=name), count) for name, count in sorted(self.exceptions.items())])
+        metric('crawler_retries_total', 'counter', 'Requests retried after an error or 5xx.',
+               [('', self.retries)])
+        metric('crawler_host_wait_seconds_total', 'counter',
+               'Time spent waiting for a per-host slot and the politeness delay.',
+               [(_labels(host=host), round(seconds, 6)) for host, seconds in sorted(self.wait.items())])
+        lines.append('# HELP crawler_response_seconds Response time by host and section.')
+        lines.append('# TYPE crawler_response_seconds histogram')
+        for (host, section), histogram in sorted(self.latency.items()):
+            for bound, total in histogram.cumulative():
+                le = '+Inf' if bound == float('inf') else str(bound)
+                lines.append(f'crawler_response_seconds_bucket'
+                             f'{_labels(host=host, section=section, le=le)} {total}')
+            labels = _labels(host=host, section=section)
+            lines.append(f'crawler_response_seconds_sum{labels} {histogram.sum:.6f}')
+            lines.append(f'crawler_response_seconds_count{labels} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, stats):
+        """写出 JSON 与 Prometheus 两份文件（先写临时文件再替换，读者不会读到半份）"""
+        if self.path is None:
+            return
+        _write_atomic(self.path + '.json', json.dumps(self.snapshot(stats), ensure_ascii=False, indent=2))
+        _write_atomic(self.path + '.prom', self.prometheus(stats))
+        self.last_write = (time.perf_counter(), stats['saved'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看爬虫指标')
+    parser.add_argument('path', nargs='?', default=METRICS_PATH + '.json')
+    args = parser.parse_args()
+
+    with open(args.path, encoding='utf-8') as f:
+        snapshot = json.load(f)
+    print(f"⏱️ {snapshot['elapsed_seconds']:.0f}s，{snapshot['pages_per_second']} 篇/秒"
+          f"（最近 {snapshot['recent_pages_per_second']}），{snapshot['stats']['bytes'] / 1e6:.1f} MB，"
+          f"重试 {snapshot['retries']}")
+    print(f"  状态码: {snapshot['statuses']}  异常: {snapshot['exceptions']}")
+    for entry in snapshot['latency_seconds']:
+        histogram = Histogram()
+        histogram.count = entry['count']
+        previous = 0
+        for i, total in enumerate(entry['buckets'].values()):
+            histogram.counts[i] = total - previous
+            previous = total
+        mean = entry['sum'] / entry['count'] if entry['count'] else 0
+        print(f"  {entry['host']} {entry['section']}: {entry['count']} 次，平均 {mean * 1000:.0f}ms，"
+              f"p50 ≤ {histogram.quantile(0.5)}s，p99 ≤ {histogram.quantile(0.99)}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+"""抓取时的近重复文章检测（SimHash）
+
+同一篇南开新闻常以不同 URL 同时发在要闻、综合新闻、媒体南开等栏目下。抓取到文章后
+提取正文，按字符 4-gram 计算 64 位 SimHash；与已有指纹的汉明距离不超过 MAX_DISTANCE
+即视为近重复，记录到重复簇中并指向最先抓取到的规范（canonical）URL，只有规范文章
+会被保存并写入清单，从而只被索引一次。
+
+指纹切成 MAX_DISTANCE + 1 段分桶：汉明距离不超过 MAX_DISTANCE 的两个指纹至少有一段
+完全相同，因此只需比较同桶的候选。新闻正文较短，几处改动（来源、编辑、日期）就会
+翻转 4~6 位，阈值取 6；无关文章的距离集中在 32 附近，不会落入。指纹与重复簇保存在
+SQLite 中，后续增量抓取也能识别旧文章的副本。
+
+    python near_dup.py clusters --db near_dup.db        # 以 JSONL 输出重复簇
+"""
+import argparse
+import hashlib
+import html as html_lib
+import json
+import re
+import sqlite3
+from collections import defaultdict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEDUP_PATH = 'near_dup.db'
+SHINGLE = 4          # 字符 n-gram 长度
+MAX_DISTANCE = 6     # 判为近重复的最大汉明距离
+MIN_SHINGLES = 30    # 正文过短时不做判断，避免把短通知误判为重复
+
+# 导航、链接、页眉页脚等模板内容在同一站点的所有页面中重复出现，计算指纹前去掉
+_BOILERPLATE = re.compile(r'<(script|style|head|nav|header|footer|a)\b.*?</\1\s*>',
+                          re.IGNORECASE | re.DOTALL)
+_TAG = re.compile(r'<[^>]+>')
+_SPACE = re.compile(r'\s+')
+
+
+def article_text(html):
+    """粗略提取正文文本：去掉模板标签块与其余标签"""
+    text = _TAG.sub(' ', _BOILERPLATE.sub(' ', html))
+    return _SPACE.sub('', html_lib.unescape(text))
+
+
+def shingles(text):
+    return {text[i:i + SHINGLE] for i in range(len(text) - SHINGLE + 1)}
+
+
+def simhash(features):
+    """64 位 SimHash：每一位取各特征哈希在该位上的多数票"""
+    hashes = [hashlib.blake2b(feature.encode(), digest_size=8).digest() for feature in features]
+    if np is not None:
+        matrix = np.frombuffer(b''.join(hashes), dtype=np.uint8).reshape(-1, 8)
+        counts = np.unpackbits(matrix, axis=1, bitorder='little').sum(axis=0)
+        bits = counts * 2 > len(hashes)
+        return sum(1 << int(b) for b in np.flatnonzero(bits))
+    values = [int.from_bytes(h, 'little') for h in hashes]
+    fingerprint = 0
+    for bit in range(64):
+        if sum((value >> bit) & 1 for value in values) * 2 > len(values):
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def _signed(value):
+    """SQLite 的 INTEGER 是有符号 64 位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class DuplicateIndex:
+    """SimHash 指纹库与重复簇记录
+
+    Attributes
+    ----------
+    path(str): SQLite 文件路径
+    max_distance(int): 判为近重复的最大汉明距离
+    """
+    def __init__(self, path=DEDUP_PATH, max_distance=MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        # 把 64 位尽量均匀地分成 max_distance + 1 段，记录每段的 (起始位, 掩码)
+        bands = max_distance + 1
+        bounds = [64 * i // bands for i in range(bands + 1)]
+        self.bands = [(start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])]
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS fingerprints (url TEXT PRIMARY KEY, simhash INTEGER)')
+        self.db.execute('CREATE TABLE IF NOT EXISTS duplicates '
+                        '(url TEXT PRIMARY KEY, canonical TEXT, distance INTEGER)')
+        self.db.commit()
+        self.buckets = defaultdict(list)   # (段号, 段值) -> [(指纹, url)]
+        self.fingerprints = {}
+        for url, value in self.db.execute('SELECT url, simhash FROM fingerprints'):
+            self._add(url, value & ((1 << 64) - 1))
+
+    def _bands(self, fingerprint):
+        return [(band, (fingerprint >> start) & mask) for band, (start, mask) in enumerate(self.bands)]
+
+    def _add(self, url, fingerprint):
+        self.fingerprints[url] = fingerprint
+        for key in self._bands(fingerprint):
+            self.buckets[key].append((fingerprint, url))
+
+    def nearest(self, fingerprint):
+        """返回距离不超过 max_distance 的最近规范文章 (url, 距离)，没有则为 None"""
+        best = None
+        for key in self._bands(fingerprint):
+            for candidate, url in self.buckets.get(key, ()):
+                distance = hamming(fingerprint, candidate)
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (url, distance)
+        return best
+
+    def check(self, url, html):
+        """登记一篇文章，是近重复时记录到重复簇并返回规范 URL，否则返回 None
+
+        同一 URL 再次登记（复查抓取）时不会与自己匹配。
+        """
+        features = shingles(article_text(html))
+        if len(features) < MIN_SHINGLES or url in self.fingerprints:
+            return None
+        fingerprint = simhash(features)
+        match = self.nearest(fingerprint)
+        if match is not None:
+            canonical, distance = match
+            self.db.execute('INSERT OR REPLACE INTO duplicates VALUES (?, ?, ?)',
+                            (url, canonical, distance))
+            return canonical
+        self._add(url, fingerprint)
+        self.db.execute('INSERT OR REPLACE INTO fingerprints VALUES (?, ?)', (url, _signed(fingerprint)))
+        return None
+
+    def is_duplicate(self, url):
+        return self.db.execute('SELECT 1 FROM duplicates WHERE url = ?', (url,)).fetchone() is not None
+
+    def clusters(self):
+        """规范 URL -> [(重复 URL, 距离)]"""
+        result = defaultdict(list)
+        for url, canonical, distance in self.db.execute(
+                'SELECT url, canonical, distance FROM duplicates ORDER BY canonical, url'):
+            result[canonical].append((url, distance))
+        return result
+
+    def commit(self):
+        self.db.commit()
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='近重复文章检测结果')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_clusters = sub.add_parser('clusters', help='以 JSONL 输出重复簇')
+    p_clusters.add_argument('--db', default=DEDUP_PATH)
+    args = parser.parse_args()
+
+    index = DuplicateIndex(args.db)
+    try:
+        for canonical, duplicates in index.clusters().items():
+            print(json.dumps({'canonical': canonical,
+                              'duplicates': [{'url': url, 'distance': distance}
+                                             for url, distance in duplicates]},
+                             ensure_ascii=False))
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+"""WARC 风格的分段页面存储：代替每篇文章一个 .html 文件
+
+页面依次追加到滚动的段文件 segment-00000.warc.gz、segment-00001.warc.gz……中，
+每条记录是一个独立的 gzip 成员（与 WARC.gz 相同），因此既可以从头顺序解压扫描，
+也可以按偏移量直接解压单条记录。URL -> (段号, 偏移, 长度) 的索引保存在 index.db。
+
+    store = PageStore('page_store')
+    store.put(url, html_bytes, title='标题')
+    store.get(url).body                 # 随机读取
+    for record in store.scan():         # 顺序扫描，构建索引.py 从这里流式读取
+        ...
+
+记录格式（解压后）：
+
+    WARC/1.0
+    WARC-Type: resource
+    WARC-Target-URI: <url>
+    WARC-Date: 2024-05-01T08:00:00Z
+    WARC-Record-ID: <urn:uuid:...>
+    WARC-Payload-Digest: blake2b:<hex>
+    X-Title: <百分号编码的标题>
+    Content-Type: text/html; charset=utf-8
+    Content-Length: <正文字节数>
+
+    <正文>
+
+进程在写入途中被杀时，下次打开会扫描最后一段中尚未登记的记录补全索引，并截掉
+末尾不完整的记录。
+"""
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import uuid
+import zlib
+from collections import namedtuple
+from urllib.parse import quote, unquote
+
+SEGMENT_SIZE = 128 * 1024 * 1024   # 段文件超过该大小后开始新的一段
+COMMIT_EVERY = 500                 # 每写入多少条记录提交一次索引
+READ_CHUNK = 1024 * 1024
+SEGMENT_NAME = re.compile(r'^segment-(\d{5})\.warc\.gz$')
+
+PageRecord = namedtuple('PageRecord', 'url title date body headers')
+
+
+class TornRecord(Exception):
+    """段文件末尾的记录不完整"""
+
+
+def segment_name(number):
+    return f'segment-{number:05d}.warc.gz'
+
+
+def iter_members(f, offset=0):
+    """从 offset 开始逐个解压 gzip 成员，产出 (偏移, 压缩长度, 解压后的字节)
+
+    末尾的成员不完整时抛出 TornRecord，其 args[0] 为该成员的起始偏移。
+    """
+    f.seek(offset)
+    pending = b''
+    while True:
+        if not pending:
+            pending = f.read(READ_CHUNK)
+            if not pending:
+                return
+        decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        parts, length = [], 0
+        while True:
+            try:
+                parts.append(decompressor.decompress(pending))
+            except zlib.error:
+                raise TornRecord(offset)
+            if decompressor.eof:
+                length += len(pending) - len(decompressor.unused_data)
+                pending = decompressor.unused_data
+                break
+            length += len(pending)
+            pending = f.read(READ_CHUNK)
+            if not pending:
+                raise TornRecord(offset)
+        yield offset, length, b''.join(parts)
+        offset += length
+
+
+def encode_record(url, body, title='', date=None):
+    date = date or time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    headers = [
+        'WARC/1.0',
+        'WARC-Type: resource',
+        f'WARC-Target-URI: {url}',
+        f'WARC-Date: {date}',
+        f'WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>',
+        f'WARC-Payload-Digest: blake2b:{hashlib.blake2b(body, digest_size=16).hexdigest()}',
+        f'X-Title: {quote(title)}',
+        'Content-Type: text/html; charset=utf-8',
+        f'Content-Length: {len(body)}',
+    ]
+    return ('\r\n'.join(headers) + '\r\n\r\n').encode() + body + b'\r\n\r\n'
+
+
+def decode_record(data):
+    head, _, rest = data.partition(b'\r\n\r\n')
+    headers = {}
+    for line in head.decode().split('\r\n')[1:]:
+        name, _, value = line.partition(': ')
+        headers[name] = value
+    body = rest[:int(headers.get('Content-Length', len(rest)))]
+    return PageRecord(headers.get('WARC-Target-URI'), unquote(headers.get('X-Title', '')),
+                      headers.get('WARC-Date'), body, headers)
+
+
+class PageStore:
+    """分段页面存储
+
+    Attributes
+    ----------
+    root(str): 存储目录
+    segment_size(int): 单个段文件的大小上限（字节）
+    readonly(bool): 只读打开时不恢复、不写入，可与正在写入的爬虫并存
+    """
+    def __init__(self, root, segment_size=SEGMENT_SIZE, commit_every=COMMIT_EVERY, readonly=False):
+        self.root = root
+        self.segment_size = segment_size
+        self.commit_every = commit_every
+        self.readonly = readonly
+        self.pending = 0
+        if not readonly:
+            os.makedirs(root, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, 'index.db'))
+        self.db.execute('PRAGMA journal_mode=WAL')
+        if not readonly:
+            self.db.execute('CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, '
+                            'segment INTEGER, offset INTEGER, length INTEGER)')
+            self.db.commit()
+        self.readers = {}   # 段号 -> 打开的只读文件
+        self.writer = None
+        self.segment = None
+        if not readonly:
+            self._recover()
+
+    def segments(self):
+        return sorted(int(m.group(1)) for m in map(SEGMENT_NAME.match, os.listdir(self.root)) if m)
+
+    def _segment_path(self, number):
+        return os.path.join(self.root, segment_name(number))
+
+    def _recover(self):
+        """补登记最后一段中索引之后的完整记录，截掉不完整的尾部"""
+        segments = self.segments()
+        if not segments:
+            return
+        last = segments[-1]
+        row = self.db.execute('SELECT MAX(offset + length) FROM pages WHERE segment = ?',
+                              (last,)).fetchone()
+        end = row[0] or 0
+        path = self._segment_path(last)
+        if os.path.getsize(path) == end:
+            return
+        recovered = 0
+        with open(path, 'rb') as f:
+            try:
+                for offset, length, data in iter_members(f, end):
+                    self._index(decode_record(data).url, last, offset, length)
+                    end = offset + length
+                    recovered += 1
+            except TornRecord as e:
+                end = e.args[0]
+        with open(path, 'rb+') as f:
+            f.truncate(end)
+        self.commit()
+        if recovered:
+            print(f"🔧 页面存储恢复了 {recovered} 条未登记的记录")
+
+    def _index(self, url, segment, offset, length):
+        self.db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)',
+                        (url, segment, offset, length))
+
+    def _open_writer(self):
+        segments = self.segments()
+        self.segment = segments[-1] if segments else 0
+        self.writer = open(self._segment_path(self.segment), 'ab')
+        if self.writer.tell() >= self.segment_size:
+            self._roll()
+
+    def _roll(self):
+        self.writer.close()
+        self.segment += 1
+        self.writer = open(self._segment_path(self.segment), 'ab')
+
+    def put(self, url, body, title='', date=None):
+        """追加一条页面记录；同一 URL 再次写入时索引指向最新的记录"""
+        if self.writer is None:
+            self._open_writer()
+        elif self.writer.tell() >= self.segment_size:
+            self._roll()
+        data = gzip.compress(encode_record(url, body, title, date), compresslevel=6)
+        offset = self.writer.tell()
+        self.writer.write(data)
+        self.writer.flush()
+        self._index(url, self.segment, offset, len(data))
+        self.pending += 1
+        if self.pending >= self.commit_every:
+            self.commit()
+
+    def locate(self, url):
+        return self.db.execute('SELECT segment, offset, length FROM pages WHERE url = ?',
+                               (url,)).fetchone()
+
+    def __contains__(self, url):
+        return self.locate(url) is not None
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+
+    def get(self, url):
+        """随机读取：按索引定位并只解压这一条记录，URL 不存在时返回 None"""
+        location = self.locate(url)
+        if location is None:
+            return None
+        segment, offset, length = location
+        if segment not in self.readers:
+            self.readers[segment] = open(self._segment_path(segment), 'rb')
+        f = self.readers[segment]
+        f.seek(offset)
+        return decode_record(gzip.decompress(f.read(length)))
+
+    def scan(self, latest_only=True):
+        """按写入顺序扫描全部记录
+
+        latest_only 为真时跳过已被同一 URL 的新记录取代的旧记录（需查询索引）。
+        段文件末尾正在写入的不完整记录会被忽略。
+        """
+        for segment in self.segments():
+            with open(self._segment_path(segment), 'rb') as f:
+                try:
+                    for offset, length, data in iter_members(f):
+                        record = decode_record(data)
+                        if latest_only:
+                            # 索引尚未提交的新记录（location 为 None）照常产出
+                            location = self.locate(record.url)
+                            if location is not None and location != (segment, offset, length):
+                                continue
+                        yield record
+                except TornRecord:
+                    pass
+
+    def commit(self):
+        if not self.readonly:
+            self.db.commit()
+        self.pending = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+            self.writer.close()
+            self.writer = None
+        self.commit()
+        for f in self.readers.values():
+            f.close()
+        self.readers.clear()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.close()
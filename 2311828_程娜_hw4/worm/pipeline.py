@@ -0,0 +1,196 @@
+"""抓取 → 解析 → 批量索引 的流水线模式
+
+原先爬虫只把 HTML 写到磁盘，之后再由 构建索引.py 串行地重新读取、用 BeautifulSoup
+解析每个文件。流水线模式下三个阶段并发运行，中间用有界队列连接：
+
+    抓取协程 --(parse 队列)--> 解析进程池 --(index 队列)--> 批量索引协程 --> Elasticsearch
+
+队列满时上游的 put 阻塞，形成反压：Elasticsearch 变慢时解析随之等待，解析跟不上时
+抓取也随之放缓，内存中积压的页面数不超过两个队列的容量之和。批量索引攒够
+--batch-size 篇或距本批第一篇超过 --flush-interval 秒即提交，文章在抓取后几秒内
+即可被搜索到（再加上索引的 refresh_interval，默认 1 秒）。页面仍按爬虫的设置写入
+pages/ 或页面存储，但索引不必再从磁盘读一遍。
+
+解析与文档构建复用 构建索引.py 的 build_document，与离线构建得到的文档完全相同。
+
+    python pipeline.py                                # 抓取全部栏目并同时建立索引
+    python pipeline.py --incremental --watch 60       # 每 60 秒增量抓取一次，新文章随即入索引
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# 构建索引.py 位于上一级目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import 构建索引 as indexer  # noqa: E402
+
+from crawler import SECTIONS, build_parser, close_crawler, make_crawler  # noqa: E402
+from metrics import Histogram  # noqa: E402
+
+QUEUE_SIZE = 256                              # 每个队列最多积压的页面数
+PARSE_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+BATCH_SIZE = 200                              # 每个 bulk 请求最多包含的文档数
+FLUSH_INTERVAL = 1.0                          # 本批第一篇入队后最多等待多少秒即提交
+LAG_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)   # 抓取到写入索引的延迟（秒）
+
+
+class IndexPipeline:
+    """爬虫的 sink：把新抓取的文章解析后批量写入索引
+
+    Attributes
+    ----------
+    build(callable): (title, url, html) -> 文档字典，在子进程中执行，需可被 pickle
+    bulk(callable): 文档列表 -> (成功数, 失败条目列表)，在线程中执行
+    parse_workers(int): 解析进程数
+    queue_size(int): 每个队列的容量
+    batch_size(int): 每批最多文档数
+    flush_interval(float): 一批最多等待的秒数
+    lag(Histogram): 每篇文章从抓取到写入索引的秒数
+    """
+    def __init__(self, build=indexer.build_document, bulk=indexer.bulk_index,
+                 parse_workers=PARSE_WORKERS, queue_size=QUEUE_SIZE, batch_size=BATCH_SIZE,
+                 flush_interval=FLUSH_INTERVAL):
+        self.build = build
+        self.bulk = bulk
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lag = Histogram(LAG_BUCKETS)
+        self.stats = {'queued': 0, 'parsed': 0, 'indexed': 0, 'failed': 0, 'batches': 0}
+        self.parse_queue = None
+        self.index_queue = None
+        self.pool = None
+        self.tasks = []
+
+    async def start(self):
+        self.parse_queue = asyncio.Queue(self.queue_size)
+        self.index_queue = asyncio.Queue(self.queue_size)
+        self.pool = ProcessPoolExecutor(self.parse_workers)
+        # 解析协程比进程多一倍，进程在等待结果回传时也有下一篇可做
+        self.tasks = [asyncio.create_task(self._parser()) for _ in range(self.parse_workers * 2)]
+        self.tasks.append(asyncio.create_task(self._indexer()))
+
+    async def put(self, url, title, filename, html, fetched_at):
+        """由爬虫调用；parse 队列满时阻塞"""
+        self.stats['queued'] += 1
+        await self.parse_queue.put((url, title, html, fetched_at))
+
+    async def _parser(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            url, title, html, fetched_at = await self.parse_queue.get()
+            try:
+                document = await loop.run_in_executor(self.pool, self.build, title, url, html)
+                self.stats['parsed'] += 1
+                await self.index_queue.put((document, fetched_at))
+            except Exception as e:
+                self.stats['failed'] += 1
+                print(f"  ⚠️ 解析失败 {url}: {e!r}")
+            finally:
+                self.parse_queue.task_done()
+
+    async def _next_batch(self):
+        """等到第一篇文档后，继续收集到 batch_size 篇或 flush_interval 秒为止"""
+        batch = [await self.index_queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.index_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _indexer(self):
+        while True:
+            batch = await self._next_batch()
+            documents = [document for document, _ in batch]
+            try:
+                success, errors = await asyncio.to_thread(self.bulk, documents)
+            except Exception as e:
+                # 整个请求失败（如连接中断），本批全部记为失败
+                success, errors = 0, [e] * len(documents)
+            self.stats['batches'] += 1
+            self.stats['indexed'] += success
+            self.stats['failed'] += len(errors)
+            for error in errors[:3]:
+                print(f"  ⚠️ 索引失败: {error!r}")
+            now = time.time()
+            for _, fetched_at in batch:
+                self.lag.observe(now - fetched_at)
+            for _ in batch:
+                self.index_queue.task_done()
+
+    async def close(self):
+        """等两个队列处理完，再停止各阶段"""
+        await self.parse_queue.join()
+        await self.index_queue.join()
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.pool.shutdown()
+
+    def summary(self):
+        p50, p99 = self.lag.quantile(0.5), self.lag.quantile(0.99)
+        mean = self.lag.sum / self.lag.count if self.lag.count else 0
+        return (f"入队 {self.stats['queued']}，索引 {self.stats['indexed']}，失败 {self.stats['failed']}，"
+                f"{self.stats['batches']} 批；抓取到入索引平均 {mean:.2f}s，p50 ≤ {p50}s，p99 ≤ {p99}s")
+
+
+async def run(crawler, pipeline, sections, resume=False, watch=None):
+    """运行一轮抓取（watch 不为 None 时每隔 watch 秒再增量抓取一轮），同时建立索引"""
+    await pipeline.start()
+
+    async def report():
+        while True:
+            await asyncio.sleep(5)
+            print(f"🔎 流水线: parse 队列 {pipeline.parse_queue.qsize()}，"
+                  f"index 队列 {pipeline.index_queue.qsize()}，{pipeline.summary()}")
+
+    reporter = asyncio.create_task(report())
+    try:
+        while True:
+            elapsed = await crawler.run(sections, resume=resume)
+            print(f"✅ 本轮抓取 {elapsed:.1f}s，累计: {crawler.stats}")
+            if watch is None:
+                break
+            resume = False
+            crawler.incremental = True   # 之后各轮只抓新文章
+            await asyncio.sleep(watch)
+        await pipeline.close()
+    finally:
+        reporter.cancel()
+
+
+def main():
+    parser = build_parser(list(SECTIONS), description='抓取并同时建立索引的流水线')
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help='抓完后每隔若干秒增量抓取一轮，持续运行')
+    parser.add_argument('--parse-workers', type=int, default=PARSE_WORKERS)
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL)
+    args = parser.parse_args()
+
+    indexer.create_index()
+    pipeline = IndexPipeline(parse_workers=args.parse_workers, queue_size=args.queue_size,
+                             batch_size=args.batch_size, flush_interval=args.flush_interval)
+    crawler = make_crawler(parser, args, sink=pipeline)
+    sections = [SECTIONS[name] for name in args.sections]
+    print(f"🚀 流水线抓取 {', '.join(s.name for s in sections)}，索引到 {indexer.ES_HOST}/{indexer.INDEX_NAME}")
+    try:
+        asyncio.run(run(crawler, pipeline, sections, resume=args.resume, watch=args.watch))
+        print(f"✅ {pipeline.summary()}")
+    except KeyboardInterrupt:
+        print(f"\n🛑 已中断: {pipeline.summary()}")
+    finally:
+        close_crawler(crawler)
+
+
+if __name__ == '__main__':
+    main()
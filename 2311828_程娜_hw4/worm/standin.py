@@ -0,0 +1,193 @@
+"""本地替身服务器：模拟南开新闻网与南开办公网的列表页和文章页
+
+按请求路径确定性地生成页面，不访问外网，用于测试与压测 crawler.py。页面带 ETag，
+支持 If-None-Match 条件请求：
+
+    python standin.py --port 8765 --latency 0.05
+    python crawler.py --origin https://news.nankai.edu.cn=http://127.0.0.1:8765 \
+                      --origin https://xb.nankai.edu.cn=http://127.0.0.1:8765
+
+每个页面都带有相同的导航栏与页脚。编号为 DUPLICATE_EVERY 倍数的新闻网文章在各栏目下正文相同（只有来源一行不同），
+用于测试近重复检测。
+
+各栏目的列表页数与 crawler.py 中配置的后备页码范围有意不同，列表页带有“下一页、
+尾页”等分页链接，用于测试页码范围的发现；范围之外的列表页返回 404。
+
+GET /_stats 返回已处理的请求数（其中 304 的个数）；GET /_publish?n=5 模拟每个栏目
+新发布 n 篇文章，出现在最新的列表页上。
+"""
+import math
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+
+from aiohttp import web
+
+LINKS_PER_PAGE = 20
+NEWEST_BASE = 1000000    # 新闻网栏目首页上文章编号的起点，之后发布的文章依次递增
+XB_BASE = 100000         # 办公网最新文章的编号（未发布新文章时）
+XB_COUNT = 1880          # 办公网未发布新文章时的文章总数
+# 新闻网栏目代号 -> (频道号, 编号列表页数)
+NEWS_SECTIONS = {'ywsd': ('0003000', 660), 'zhxw': ('0004000', 846), 'dcxy': ('0005000', 533),
+                 'mtnk': ('0006000', 980), 'nkrw': ('0008000', 70), 'nkdxb': ('0011000', 75)}
+LAST_MODIFIED = 'Mon, 01 Jan 2024 00:00:00 GMT'
+DUPLICATE_EVERY = 10
+COMMON_HANZI = [chr(c) for c in range(0x4e00, 0x4e00 + 3000)]
+
+# 新闻网列表页：/ywsd/system/count//0003000/.../c0003000000000000000_000000100.shtml 或 /ywsd/index.shtml
+NEWS_LISTING = re.compile(r'^/(\w+)/(?:system/count/.*_(\d{9})|index)\.shtml$')
+# 新闻网文章页：/ywsd/system/2024/05/00010003.shtml
+NEWS_ARTICLE = re.compile(r'^/(\w+)/system/\d{4}/\d{2}/(\d+)\.shtml$')
+# 办公网列表页与文章页
+XB_LISTING = re.compile(r'^/category/16/(\d+)$')
+XB_ARTICLE = re.compile(r'^/article/(\d+)$')
+
+
+# 每个页面都有的站点导航与页脚，用于测试正文抽取
+SITE_NAV = ''.join(f'<li><a href="/{code}/index.shtml">{code}</a></li>' for code in NEWS_SECTIONS)
+SITE_FOOTER = ('<p>版权所有 南开大学新闻中心 地址：天津市南开区卫津路94号 邮编：300071</p>'
+               '<p>投稿信箱：news@nankai.edu.cn 津ICP备12003308号-1</p>')
+
+
+def page_html(title, body):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title></head>'
+            f'<body><nav><ul>{SITE_NAV}</ul></nav>{body}<footer>{SITE_FOOTER}</footer></body></html>')
+
+
+def listing_html(title, links, pagination=()):
+    items = ''.join(f'<li><a href="{href}" target="_blank">{text}</a></li>' for href, text in links)
+    pager = ''.join(f'<a href="{href}">{text}</a>' for href, text in pagination)
+    return page_html(title, f'<a href="/">首页</a><ul>{items}</ul>'
+                            f'<a href="index.shtml">更多</a><div class="pager">{pager}</div>')
+
+
+def news_listing_path(code, page):
+    channel = NEWS_SECTIONS.get(code, ('0000000',))[0]
+    return (f'/{code}/system/count//{channel}/000000000000/000/000/'
+            f'c{channel}000000000000_{page:09d}.shtml')
+
+
+def pager(current, newest, oldest, path):
+    """分页链接：上一页（更新）、下一页（更旧）与尾页；current 为 None 表示首页"""
+    links = []
+    step = 1 if oldest > newest else -1
+    if current is None:
+        links.append((path(newest), '下一页'))
+    else:
+        if current != newest:
+            links.append((path(current - step), '上一页'))
+        if current != oldest:
+            links.append((path(current + step), '下一页'))
+    links.append((path(oldest), '尾页'))
+    return links
+
+
+def article_html(section, article_id, shared=False, related=()):
+    """正文由以编号为种子的随机汉字序列构成；shared 为真时正文与栏目无关
+
+    related 为正文后“相关新闻”的 [(href, 标题)]，供链接分析使用。
+    """
+    title = f'南开新闻{article_id}' if shared else f'{section}新闻{article_id}'
+    rng = random.Random(article_id if shared else f'{section}-{article_id}')
+    paragraphs = ''.join('<p>' + '，'.join(''.join(rng.choices(COMMON_HANZI, k=12)) for _ in range(6))
+                         + '。</p>' for _ in range(5))
+    links = ''.join(f'<li><a href="{href}">{text}</a></li>' for href, text in related)
+    return page_html(title, f'<a href="/">首页</a><h1>{title}</h1><div class="content">{paragraphs}'
+                            f'<p>来源：{section}</p></div><ul class="related">{links}</ul>')
+
+
+def render(path, links_per_page, published=0):
+    """按路径生成页面，无法识别的路径返回 None
+
+    新闻网编号列表页的内容固定不变，新发布的文章只出现在栏目首页；办公网按从新到旧
+    分页，发布新文章后所有页依次后移。
+    """
+    match = NEWS_LISTING.match(path)
+    if match:
+        code, page = match.group(1), match.group(2)
+        pages = NEWS_SECTIONS.get(code, (None, 100))[1]
+        if page is None:
+            ids = [NEWEST_BASE + published - 1 - k for k in range(links_per_page)]
+        else:
+            page = int(page)
+            if not 1 <= page <= pages:
+                return None
+            ids = [page * 100 + k for k in range(links_per_page)]
+        links = [(f'/{code}/system/2024/05/{i:08d}.shtml', f'{code}新闻{i}') for i in ids]
+        # 编号从旧到新，首页之后是编号最大的一页
+        return listing_html(f'{code} 第{page or 0}页', links,
+                            pager(page, pages, 1, lambda p: news_listing_path(code, p)))
+    match = NEWS_ARTICLE.match(path)
+    if match:
+        code, article_id = match.group(1), int(match.group(2))
+        # 相关新闻：前后两篇与所在列表页的第一篇，后者因此被大量引用
+        related = [(f'{i:08d}.shtml', f'{code}新闻{i}')
+                   for i in sorted({article_id - 1, article_id + 1, article_id - article_id % 100})
+                   if i != article_id]
+        return article_html(code, article_id, shared=article_id % DUPLICATE_EVERY == 0,
+                            related=related)
+    match = XB_LISTING.match(path)
+    if match:
+        page = int(match.group(1))
+        pages = math.ceil((XB_COUNT + published) / links_per_page)
+        if not 1 <= page <= pages:
+            return None
+        first = XB_BASE + published - (page - 1) * links_per_page
+        links = [(f'/article/{first - k}', f'办公网通知{first - k}') for k in range(links_per_page)
+                 if first - k > XB_BASE - XB_COUNT]
+        return listing_html(f'办公网 第{page}页', links,
+                            pager(page, 1, pages, lambda p: f'/category/16/{p}'))
+    match = XB_ARTICLE.match(path)
+    if match:
+        return article_html('办公网', int(match.group(1)))
+    return None
+
+
+def make_app(latency=0.0, links_per_page=LINKS_PER_PAGE, error_rate=0.0):
+    stats = {'requests': 0, 'not_modified': 0, 'published': 0, 'errors': 0}
+    rng = random.Random(0)
+
+    async def handle(request):
+        if request.path == '/_stats':
+            return web.json_response(stats)
+        if request.path == '/_publish':
+            stats['published'] += int(request.query.get('n', 1))
+            return web.json_response(stats)
+        stats['requests'] += 1
+        if latency:
+            await asyncio.sleep(latency)  # 模拟网络往返与服务器处理时间
+        if error_rate and rng.random() < error_rate:
+            stats['errors'] += 1
+            raise web.HTTPServiceUnavailable()  # 模拟限流
+        html = render(request.path, links_per_page, stats['published'])
+        if html is None:
+            raise web.HTTPNotFound()
+        etag = '"' + hashlib.md5(html.encode()).hexdigest()[:16] + '"'
+        headers = {'ETag': etag, 'Last-Modified': LAST_MODIFIED}
+        if request.headers.get('If-None-Match') == etag:
+            stats['not_modified'] += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(text=html, content_type='text/html', charset='utf-8', headers=headers)
+
+    app = web.Application()
+    app['stats'] = stats
+    app.router.add_get('/{tail:.*}', handle)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫测试用的本地替身服务器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求的模拟延迟（秒）')
+    parser.add_argument('--links-per-page', type=int, default=LINKS_PER_PAGE)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='随机返回 503 的比例')
+    args = parser.parse_args()
+    web.run_app(make_app(args.latency, args.links_per_page, args.error_rate),
+                host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
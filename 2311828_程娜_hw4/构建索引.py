@@ -1,11 +1,34 @@
+import argparse
 import csv
+import hashlib
+import json
 import os
+import re
+import sys
+import threading
+import time
 import warnings
-from bs4 import BeautifulSoup
-from elasticsearch import Elasticsearch
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+from bs4.element import CData, Comment, Declaration, Doctype, ProcessingInstruction
+from elasticsearch import Elasticsearch, helpers
 from elasticsearch.exceptions import ElasticsearchWarning
+from elastic_transport import JsonSerializer
+from html import unescape
+from html.entities import html5
 from urllib.parse import quote, urljoin
 
+import boilerplate
+from worm.metrics import Histogram
+
+try:
+    from selectolax.lexbor import LexborHTMLParser  # 可选依赖，PARSER = "lexbor" 时使用
+except ImportError:
+    LexborHTMLParser = None
+
 # 忽略安全警告
 warnings.filterwarnings("ignore", category=ElasticsearchWarning)
 
@@ -13,10 +36,158 @@ warnings.filterwarnings("ignore", category=ElasticsearchWarning)
 CSV_FILE = "D:/Projects/PycharmProjects/1/title2url.csv"  # CSV文件路径
 HTML_DIR = "D:/Projects/PycharmProjects/pages"  # HTML文件目录
 ES_HOST = "http://localhost:9200"  # Elasticsearch主机
-INDEX_NAME = "web_pages"  # 索引名称
+INDEX_NAME = "web_pages"  # 索引别名，web.py 通过它查询；实际索引为 web_pages-<时间戳> 的各个版本
+KEEP_VERSIONS = 1  # 别名切换后保留多少个旧版本，用于 --rollback 回滚
+MIN_DOC_RATIO = 0.9  # 重建得到的文档数低于当前版本的该比例时不切换别名（--force 强制切换）
+SEARCH_REPLICAS = 0  # 切换为查询设置时的副本数（单节点为 0）
+PREFIX_MAX = 20  # title.prefix 子字段索引的最长标题前缀（字符数）
+# 导入期间的设置：不刷新、无副本、异步写事务日志
+BULK_SETTINGS = {"refresh_interval": "-1", "number_of_replicas": 0, "translog.durability": "async"}
+# 导入完成后的查询设置
+SEARCH_SETTINGS = {"refresh_interval": "1s", "number_of_replicas": SEARCH_REPLICAS, "translog.durability": "request"}
+PAGE_STORE = None  # 爬虫 --store 输出的页面存储目录，设置后直接从中顺序读取页面，不再读 CSV 与 HTML 文件
+BULK_DOCS = 500  # 每个 bulk 请求最多包含的文档数
+BULK_BYTES = 10 * 1024 * 1024  # 每个 bulk 请求的最大字节数
+BULK_IN_FLIGHT = 4  # 同时在途的 bulk 请求数
+ERROR_FILE = "index_errors.txt"  # 批量导入失败的文档，每行一个 JSON
+PARSER = "html.parser"  # HTML 解析后端："html.parser"（BeautifulSoup）或 "lexbor"（selectolax，快约 3 倍，结果与 html.parser 相同）
+PARSE_WORKERS = os.cpu_count() or 1  # 批量导入时并行解析的进程数，1 表示在主进程中解析
+PARSE_CHUNK = 64  # 每次交给解析进程的页面数
+DOCUMENT_VERSION = 2  # 文档构建逻辑（解析、字段）改变时加一，使所有页面的指纹失效、重新索引
+DERIVED_FIELDS = ("pagerank", "incoming_anchors")  # 由 pagerank.py 与 anchor_text.py 写入的字段，重新导入页面时保留
+BENCH_INDEX = "bench-" + INDEX_NAME  # 基准测试写入的临时索引，测完删除
+BENCH_DOCS = 5000  # 基准测试语料的文档数
+BENCH_FILE = "ingest_benchmark.jsonl"  # 每次基准测试的参数与结果追加一行，便于比较
+# 导入各阶段的名称
+STAGES = {"records": "读取清单", "read": "读取页面", "fingerprint": "计算指纹", "parse": "解析HTML",
+          "verify": "切块校验", "fallback": "回退解析", "anchors": "提取锚文本", "extract": "正文抽取",
+          "serialize": "序列化", "bulk": "bulk 往返"}
+DOC_BYTES_BUCKETS = (1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144, 1048576)
+ANCHOR_BUCKETS = (0, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+class IngestStats:
+    """批量导入各阶段的耗时与文档分布
+
+    Attributes
+    ----------
+    seconds(Counter): 阶段 -> 累计秒数；解析类阶段为各解析进程之和，bulk 往返为各在途请求之和
+        lexbor 校验不一致而回退解析的页面，重新解析的时间同时计入解析HTML与提取锚文本
+    calls(Counter): 阶段 -> 次数
+    batches(List[float]): 每个 bulk 请求的往返秒数
+    doc_bytes(Histogram): 序列化后的文档字节数
+    anchors(Histogram): 每个文档的锚文本数
+    docs(int): 导入的文档数
+    elapsed(float): 导入用时（秒）
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.seconds = Counter()
+        self.calls = Counter()
+        self.batches = []
+        self.doc_bytes = Histogram(DOC_BYTES_BUCKETS)
+        self.anchors = Histogram(ANCHOR_BUCKETS)
+        self.docs = 0
+        self.elapsed = 0.0
+
+    def add(self, stage, seconds):
+        with self.lock:
+            self.seconds[stage] += seconds
+            self.calls[stage] += 1
+
+    def take(self):
+        """取出并清空阶段计时，解析进程把它随结果一起交回主进程"""
+        taken = (dict(self.seconds), dict(self.calls))
+        self.seconds.clear()
+        self.calls.clear()
+        return taken
+
+    def merge(self, taken):
+        seconds, calls = taken
+        self.seconds.update(seconds)
+        self.calls.update(calls)
+
+    def batch_quantile(self, q):
+        """bulk 往返时间的分位数（秒），没有请求时为 None"""
+        if not self.batches:
+            return None
+        ordered = sorted(self.batches)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def to_dict(self):
+        p50, p99 = self.batch_quantile(0.5), self.batch_quantile(0.99)
+        return {
+            "docs": self.docs,
+            "seconds": round(self.elapsed, 3),
+            "docs_per_second": round(self.docs / self.elapsed, 1) if self.elapsed else None,
+            "batches": len(self.batches),
+            "batch_p50_ms": None if p50 is None else round(p50 * 1000, 1),
+            "batch_p99_ms": None if p99 is None else round(p99 * 1000, 1),
+            "stage_seconds": {stage: round(self.seconds[stage], 3) for stage in STAGES if stage in self.seconds},
+            "doc_bytes": self.doc_bytes.to_dict(),
+            "anchors": self.anchors.to_dict(),
+        }
+
+    def report(self):
+        print("各阶段耗时（解析类阶段为各解析进程之和，bulk 往返为各在途请求之和）:")
+        for stage, name in STAGES.items():
+            if self.calls[stage]:
+                mean = self.seconds[stage] / self.calls[stage] * 1000
+                print(f"  {name:<8} {self.seconds[stage]:8.2f}s  {self.calls[stage]:7d} 次  平均 {mean:.3f}ms")
+        if self.doc_bytes.count:
+            print(f"文档大小 p50 ≤ {self.doc_bytes.quantile(0.5)}B，p99 ≤ {self.doc_bytes.quantile(0.99)}B；"
+                  f"锚文本数 p50 ≤ {self.anchors.quantile(0.5)}，p99 ≤ {self.anchors.quantile(0.99)}")
+        if self.batches:
+            print(f"bulk 请求 {len(self.batches)} 个，往返 p50 {self.batch_quantile(0.5) * 1000:.0f}ms，"
+                  f"p99 {self.batch_quantile(0.99) * 1000:.0f}ms")
+
+
+ingest = IngestStats()
+
+
+# 导入时文档在 bulk_load 的 actions 中自行序列化（计时并统计大小）
+serializer = JsonSerializer()
+
+
+class TimedElasticsearch(Elasticsearch):
+    """记录每个 bulk 请求往返时间的客户端，只在 bulk_load 中使用
+
+    由 TimedElasticsearch(_transport=es.transport) 得到，与 es 共用连接；helpers 内部
+    options() 得到的副本类型不变，同样计时。其他请求（滚动读取、设置、计数以及
+    worm/pipeline.py 的 bulk_index）经由 es，不计入导入统计。
+    """
+    def bulk(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().bulk(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            ingest.add("bulk", seconds)
+            ingest.batches.append(seconds)
+
+
+def connect(host):
+    return Elasticsearch(hosts=[host])
+
 
 # 连接到Elasticsearch
-es = Elasticsearch(hosts=[ES_HOST])
+es = connect(ES_HOST)
+
+
+# 逐个产出 iterable 的元素，取每个元素的耗时计入 stage
+def timed_iter(iterable, stage):
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        ingest.add(stage, time.perf_counter() - start)
+        yield item
 
 
 # 从URL中提取域名
@@ -29,8 +200,28 @@ def extract_domain(url):
         return ""
 
 
-# 检查索引是否存在，如果不存在则创建
-if not es.indices.exists(index=INDEX_NAME):
+# 检查索引是否存在，如果不存在则创建第一个版本并把别名指向它
+def create_index():
+    if es.indices.exists(index=INDEX_NAME):
+        # 旧索引补上内容指纹与入链锚文本字段的映射；已被动态映射为其他类型时保持原样
+        for field, mapping in {"content_hash": {"type": "keyword"},
+                               "incoming_anchors": {"type": "text", "analyzer": "ik_max_word"}}.items():
+            try:
+                es.indices.put_mapping(index=INDEX_NAME, properties={field: mapping})
+            except Exception as e:
+                print(f"补充 {field} 映射失败: {e}")
+        mapping = es.indices.get_mapping(index=INDEX_NAME)
+        if not any("ngram" in m["mappings"].get("properties", {}).get("content", {}).get("fields", {})
+                   for m in mapping.values()):
+            print(f"索引 {INDEX_NAME} 缺少通配查询用的 ngram 子字段，请运行 --rebuild 重建")
+        return
+    name = create_version(SEARCH_SETTINGS)
+    swap_alias(name)
+
+
+# 创建一个带时间戳的新版本索引（或名为 name 的索引），settings 覆盖默认设置
+def create_version(settings, name=None):
+    name = name or f"{INDEX_NAME}-{time.strftime('%Y%m%d-%H%M%S')}"
     index_settings = {
         "settings": {
             "number_of_shards": 1,
@@ -44,30 +235,144 @@ if not es.indices.exists(index=INDEX_NAME):
                     "ik_smart": {
                         "type": "custom",
                         "tokenizer": "ik_smart"
+                    },
+                    # 中文按相邻两字切分，位置连续，片段的短语查询即子串匹配
+                    "cjk_bigram": {
+                        "type": "custom",
+                        "tokenizer": "standard",
+                        "filter": ["cjk_width", "lowercase", "cjk_bigram"]
+                    },
+                    # 整个标题的各个前缀，前缀查询变为一次词项查找
+                    "title_prefix": {
+                        "type": "custom",
+                        "tokenizer": "keyword",
+                        "filter": ["lowercase", "title_edge_ngram"]
+                    },
+                    "title_keyword": {
+                        "type": "custom",
+                        "tokenizer": "keyword",
+                        "filter": ["lowercase"]
                     }
+                },
+                "filter": {
+                    "title_edge_ngram": {"type": "edge_ngram", "min_gram": 1, "max_gram": PREFIX_MAX}
                 }
             }
         },
         "mappings": {
             "properties": {
                 "url": {"type": "keyword"},
-                "title": {"type": "text", "analyzer": "ik_max_word"},
-                "content": {"type": "text", "analyzer": "ik_max_word"},
+                "title": {
+                    "type": "text", "analyzer": "ik_max_word",
+                    "fields": {  # 通配查询改写到这两个子字段上，见 web.py 的 wildcard_search
+                        "prefix": {"type": "text", "analyzer": "title_prefix", "search_analyzer": "title_keyword",
+                                   "index_options": "docs", "norms": False},
+                        "ngram": {"type": "text", "analyzer": "cjk_bigram", "norms": False}
+                    }
+                },
+                "content": {
+                    "type": "text", "analyzer": "ik_max_word",
+                    "fields": {"ngram": {"type": "text", "analyzer": "cjk_bigram", "norms": False}}
+                },
                 "pagerank": {"type": "float"},
+                "content_hash": {"type": "keyword"},  # 内容指纹，增量导入时判断页面是否变化
                 "domain": {"type": "keyword"},
                 "date": {"type": "date"},
-                "anchor_texts": {  # 新增锚文本字段映射
-                    "type": "nested",
-                    "properties": {
-                        "text": {"type": "text", "analyzer": "ik_max_word"},
-                        "url": {"type": "keyword"}
-                    }
-                }
+                # 页面的出链，只保存在 _source 中供 anchor_text.py 与 pagerank.py 读取，不建索引
+                "anchor_texts": {"type": "object", "enabled": False},
+                # 指向本页面的锚文本，由 anchor_text.py 汇总写入
+                "incoming_anchors": {"type": "text", "analyzer": "ik_max_word"}
             }
         }
     }
-    es.indices.create(index=INDEX_NAME, body=index_settings)
-    print(f"已创建新索引: {INDEX_NAME}")
+    index_settings["settings"].update(settings)
+    es.indices.create(index=name, body=index_settings)
+    print(f"已创建新索引: {name}")
+    return name
+
+
+# 全部版本的索引名，按时间从旧到新
+def list_versions():
+    return sorted(es.indices.get(index=f"{INDEX_NAME}-*").keys())
+
+
+# 别名当前指向的索引；INDEX_NAME 仍是旧式的普通索引时返回空列表
+def alias_targets():
+    if not es.indices.exists_alias(name=INDEX_NAME):
+        return []
+    return list(es.indices.get_alias(name=INDEX_NAME).keys())
+
+
+# 在一个请求中把别名从当前版本移到 name，查询不会看到中间状态
+def swap_alias(name):
+    actions = [{"remove": {"index": old, "alias": INDEX_NAME}} for old in alias_targets() if old != name]
+    if es.indices.exists(index=INDEX_NAME) and not es.indices.exists_alias(name=INDEX_NAME):
+        # 旧式的同名普通索引与别名冲突，与添加别名在同一请求中删除
+        actions.append({"remove_index": {"index": INDEX_NAME}})
+        print(f"将删除旧式索引 {INDEX_NAME}，之后由同名别名代替")
+    actions.append({"add": {"index": name, "alias": INDEX_NAME}})
+    es.indices.update_aliases(actions=actions)
+    print(f"别名 {INDEX_NAME} 已指向 {name}")
+
+
+# 删除别名未指向的版本，只保留 keep 个：优先保留 previous（切换前别名指向的版本），其次是较新的
+def prune_versions(keep=KEEP_VERSIONS, previous=()):
+    current = alias_targets()
+    others = [name for name in list_versions() if name not in current]
+    kept = [name for name in others if name in previous]
+    kept += [name for name in reversed(others) if name not in kept][:max(0, keep - len(kept))]
+    for name in others:
+        if name not in kept:
+            es.indices.delete(index=name)
+            print(f"已删除旧版本: {name}")
+
+
+# 重建：导入到新版本（导入设置）-> 切换为查询设置并合并段 -> 原子切换别名 -> 清理旧版本
+def rebuild(batch_docs=BULK_DOCS, batch_bytes=BULK_BYTES, in_flight=BULK_IN_FLIGHT, workers=PARSE_WORKERS,
+            force=False):
+    name = create_version(BULK_SETTINGS)
+    bulk_load(batch_docs, batch_bytes, in_flight, workers, full=True, index=name)
+    fill_derived(name)
+
+    es.indices.put_settings(index=name, settings={"index": SEARCH_SETTINGS})
+    es.indices.forcemerge(index=name, max_num_segments=1, request_timeout=3600)
+    es.indices.refresh(index=name)
+
+    new_count = es.count(index=name)["count"]
+    current = alias_targets()
+    old_count = es.count(index=INDEX_NAME)["count"] if es.indices.exists(index=INDEX_NAME) else 0
+    if not force and new_count < old_count * MIN_DOC_RATIO:
+        print(f"新版本 {name} 只有 {new_count} 个文档（当前 {old_count} 个），未切换别名；"
+              f"检查后可用 --force 重建或手动删除该版本")
+        return name
+    swap_alias(name)
+    if current:
+        print(f"上一版本 {current[0]} 保留用于回滚（--rollback）")
+    prune_versions(previous=current)
+    return name
+
+
+# 在新版本上计算派生字段（pagerank、incoming_anchors），切换别名后排序立即完整
+def fill_derived(name):
+    # 以脚本运行时本模块名为 __main__；登记为 构建索引，pagerank.py 与 anchor_text.py
+    # 导入的就是本模块，使用同一个（--es-host 指定的）客户端
+    sys.modules.setdefault("构建索引", sys.modules[__name__])
+    import anchor_text
+    import pagerank  # 两者导入本模块，在这里导入以免循环
+    print(f"\n计算新版本 {name} 的 PageRank")
+    pagerank.run(index=name, top=0)
+    print(f"\n汇总新版本 {name} 的入链锚文本")
+    anchor_text.run(index=name, top=0)
+
+
+# 回滚：把别名切回当前版本之前的最近一个版本
+def rollback():
+    current = alias_targets()
+    previous = [name for name in list_versions() if current and name < min(current)]
+    if not previous:
+        print("没有可以回滚到的旧版本")
+        return
+    swap_alias(previous[-1])
 
 
 # 解析HTML文件内容并提取锚文本
@@ -75,19 +380,60 @@ def parse_html(html_file, current_url):
     try:
         with open(html_file, 'r', encoding='utf-8') as f:
             content = f.read()
+    except Exception as e:
+        print(f"解析HTML文件 {html_file} 时出错: {e}")
+        return "", []
+    return parse_html_content(content, current_url, html_file)
+
+
+# 解析HTML文本并提取正文与锚文本；正文只保留 boilerplate.py 判定的正文块
+def parse_html_content(content, current_url, source=None):
+    blocks, anchor_texts = parse_blocks(content, current_url, source)
+    start = time.perf_counter()
+    text = boilerplate.main_text(blocks, extract_domain(current_url))
+    ingest.add("extract", time.perf_counter() - start)
+    return text, anchor_texts
+
+
+# 清理文本：去掉每行首尾的空白，以空格连接各行与以双空格分隔的短语
+def clean_text(text):
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return ' '.join(chunk for chunk in chunks if chunk)
+
+
+# 解析HTML文本，返回 (文本块 [(文本, 链接文字数)], 锚文本)
+def parse_blocks(content, current_url, source=None):
+    if active_parser() == "lexbor":
+        return parse_blocks_lexbor(content, current_url, source)
+    return parse_blocks_soup(content, current_url, source)
+
+
+# 用 BeautifulSoup (html.parser) 解析
+def parse_blocks_soup(content, current_url, source=None):
+    start = time.perf_counter()
+    try:
         soup = BeautifulSoup(content, 'html.parser')
 
         # 移除脚本和样式标签
         for script in soup(["script", "style"]):
             script.extract()
 
-        # 获取文本内容
-        text = soup.get_text(separator=' ')
-
-        # 清理文本
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        text = ' '.join(chunk for chunk in chunks if chunk)
+        # 按块级标签切分文本块，统计每块中链接文字的字数
+        blocks, parts, link_chars = [], [], 0
+        for node in soup.descendants:
+            if isinstance(node, Tag):
+                if node.name in boilerplate.BLOCK_TAGS:
+                    _flush_block(blocks, parts, link_chars)
+                    parts, link_chars = [], 0
+            elif isinstance(node, NavigableString) and not isinstance(
+                    node, (Comment, CData, Declaration, Doctype, ProcessingInstruction)):
+                parts.append(str(node))
+                if node.find_parent('a') is not None:
+                    link_chars += len(''.join(node.split()))
+        _flush_block(blocks, parts, link_chars)
+        parsed = time.perf_counter()
+        ingest.add("parse", parsed - start)
 
         # 提取所有锚文本及其链接
         anchor_texts = []
@@ -105,90 +451,711 @@ def parse_html(html_file, current_url):
                     'text': anchor_text,
                     'url': full_url
                 })
+        ingest.add("anchors", time.perf_counter() - parsed)
 
-        return text, anchor_texts  # 返回文本和锚文本
+        return blocks, anchor_texts  # 返回文本块和锚文本
     except Exception as e:
-        print(f"解析HTML文件 {html_file} 时出错: {e}")
-        return "", []
+        print(f"解析HTML文件 {source or current_url} 时出错: {e}")
+        return [], []
+
+
+# 结束一个文本块：清理后非空时加入 blocks
+def _flush_block(blocks, parts, link_chars):
+    text = clean_text(' '.join(parts))
+    if text:
+        blocks.append((text, link_chars))
+
+
+# 节点下的全部文本节点，与 BeautifulSoup 的 strings 相同（不含注释）
+def _text_nodes(node):
+    return [child.text_content for child in node.traverse(include_text=True) if child.tag == '-text']
+
+
+def _in_link(node):
+    node = node.parent
+    while node is not None:
+        if node.tag == 'a':
+            return True
+        node = node.parent
+    return False
+
+
+# html.parser 下 BeautifulSoup 立即闭合的空元素，它们的结束标签不起作用
+_VOID_TAGS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+# 扫描不支持的标签：html.parser（不同版本之间）与 HTML5 的处理不同，或 BeautifulSoup 对其中的文字另作处理
+_SCAN_UNSUPPORTED = frozenset({"plaintext", "template", "svg", "math", "rt", "rp", "frameset",
+                               "command", "nextid", "spacer", "image", "isindex", "menuitem"})
+# 内容在 HTML5（及较新的 html.parser）中按原始文本处理的标签：要求内容中没有 '<'，
+# 后一组在 HTML5 中也不解码字符引用，还要求没有 '&'；script、style 的内容直接跳过
+_RCDATA_TAGS = frozenset({"title", "textarea"})
+_RAWTEXT_TAGS = frozenset({"xmp", "iframe", "noembed", "noframes", "noscript"})
+# 只接受各解析器理解一致的标签写法：属性之间以 ASCII 空白分隔，属性名与不加引号的值不含引号、'<'、'=' 等
+_SCAN_START = re.compile(r'<([a-zA-Z][-.:_a-zA-Z0-9]*)((?:[ \t\n\r\f]+[^\s"\'/=<>`]+'
+                         r'(?:[ \t\n\r\f]*=[ \t\n\r\f]*(?:"[^"]*"|\'[^\']*\'|[^\s"\'=<>`]+))?)*)'
+                         r'[ \t\n\r\f]*(/?)>')
+_SCAN_ATTR = re.compile(r'([^\s"\'/=<>`]+)(?:[ \t\n\r\f]*=[ \t\n\r\f]*("[^"]*"|\'[^\']*\'|[^\s"\'=<>`]+))?')
+_SCAN_END = re.compile(r'</([a-zA-Z][-.:_a-zA-Z0-9]*)[ \t\n\r\f]*>')
+_SCAN_COMMENT_END = re.compile(r'--\s*>')  # 与 html.parser 相同
+_SCAN_RAW_END = {name: (re.compile(f'</{name}', re.I), re.compile(f'</{name}[ \\t\\n\\r\\f]*>', re.I),
+                        re.compile(fr'</\s*{name}\s*>', re.I)) for name in ("script", "style")}
+_SCAN_ENTITY = re.compile(r'&(?:([a-zA-Z][a-zA-Z0-9]*);|#([0-9]{1,7});|#[xX]([0-9a-fA-F]{1,6});|(?![a-zA-Z#]))')
+# 两种解析器解码结果相同的命名字符引用（只接受带分号的写法）
+_SAFE_ENTITIES = {name: char for name, char in EntitySubstitution.HTML_ENTITY_TO_CHARACTER.items()
+                  if html5.get(name + ';') == char}
+
+
+# 两种解析器都原样解码的数字字符引用（排除控制字符、代理区与非字符）
+def _safe_codepoint(code):
+    return (code in (9, 10) or 0x20 <= code < 0x7f or 0xa0 <= code < 0xd800
+            or (0xe000 <= code <= 0x10ffff and not 0xfdd0 <= code <= 0xfdef and code & 0xfffe != 0xfffe))
+
+
+# 解码文本中的字符引用；含有两种解析器解码结果可能不同的写法（如缺分号、未知名称）时返回 None
+def _decode_text(raw):
+    pieces, last = [], 0
+    pos = raw.find('&')
+    while pos >= 0:
+        match = _SCAN_ENTITY.match(raw, pos)
+        if match is None:
+            return None
+        name, decimal, hexadecimal = match.groups()
+        if name is not None:
+            char = _SAFE_ENTITIES.get(name)
+            if char is None:
+                return None
+        elif decimal is not None or hexadecimal is not None:
+            code = int(decimal) if decimal is not None else int(hexadecimal, 16)
+            if not _safe_codepoint(code):
+                return None
+            char = chr(code)
+        else:
+            pos = raw.find('&', pos + 1)  # 后面不是字母或 '#' 的 '&' 是普通文字
+            continue
+        pieces.append(raw[last:pos])
+        pieces.append(char)
+        last = match.end()
+        pos = raw.find('&', last)
+    pieces.append(raw[last:])
+    return ''.join(pieces)
+
+
+# 按 html.parser 的标签事件与 BeautifulSoup 的建树规则扫描HTML，返回与 parse_blocks_soup 相同的
+# (文本块, 锚点 [(href, 文字)])，供 parse_blocks_lexbor 校验；页面含有扫描不支持的写法时返回 None。
+# BeautifulSoup 不补出、不隐式闭合任何元素：开始标签入栈（空元素随即出栈），结束标签弹出到最近的
+# 同名元素，没有同名元素时忽略；每个标签、注释与声明都结束当前文本节点
+def _scan_blocks(content):
+    if '\x00' in content:
+        return None
+    blocks, parts, link_chars = [], [], 0
+    anchors, links = [], []  # 锚点 [href, 文字片段]；栈中打开的 <a> 对应的锚点下标
+    stack, opened, closed_voids = [], Counter(), []
+    pending = []  # 当前文本节点已解码的片段
+    i = text_start = 0
+
+    def end_text():
+        nonlocal link_chars
+        if not pending:
+            return
+        text = ''.join(pending)
+        pending.clear()
+        parts.append(text)
+        if links:
+            link_chars += len(''.join(text.split()))
+            stripped = text.strip()
+            if stripped:
+                for index in links:
+                    anchors[index][1].append(stripped)
 
+    while True:
+        j = content.find('<', i)
+        if j < 0:
+            break
+        following = content[j + 1:j + 2]
+        if following == '/' or following == '!' or (following.isascii() and following.isalpha()):
+            # 标签、注释或声明之前的文字
+            if text_start < j:
+                raw = content[text_start:j]
+                text = _decode_text(raw) if '&' in raw else raw
+                if text is None:
+                    return None
+                pending.append(text)
+            text_start = j
+        else:
+            i = j + 1  # '<' 后不是字母、'/' 或 '!'：普通文字（'<?' 不支持）
+            if following == '?':
+                return None
+            continue
 
-# 处理单个文档的导入
-def index_document(title, url, filename):
+        if following == '/':
+            match = _SCAN_END.match(content, j)
+            if match is None:
+                return None
+            i = text_start = match.end()
+            name = match.group(1).lower()
+            if name in closed_voids:
+                closed_voids.remove(name)  # 已闭合空元素的结束标签：直接忽略，前后文字仍是同一节点
+                continue
+            end_text()
+            if opened[name]:
+                while True:
+                    top = stack.pop()
+                    opened[top] -= 1
+                    if top == 'a':
+                        links.pop()
+                    if top == name:
+                        break
+        elif following == '!':
+            if content.startswith('<!--', j):
+                match = _SCAN_COMMENT_END.search(content, j + 4)
+                if match is None or match.group() != '-->':
+                    return None
+                body = content[j + 4:match.start()]
+                if body.startswith(('>', '->')) or '--!>' in body:
+                    return None
+                end = match.end()
+            elif content[j:j + 9].lower() == '<!doctype':
+                end = content.find('>', j + 9) + 1
+                if end == 0:
+                    return None
+            else:
+                return None
+            end_text()
+            i = text_start = end
+        else:
+            match = _SCAN_START.match(content, j)
+            if match is None:
+                return None
+            name, self_closing = match.group(1).lower(), match.group(3)
+            if name in _SCAN_UNSUPPORTED:
+                return None
+            end_text()
+            i = text_start = end = match.end()
+            if name in boilerplate.BLOCK_TAGS:
+                _flush_block(blocks, parts, link_chars)
+                parts, link_chars = [], 0
+            if name in _SCAN_RAW_END:
+                # script、style 随后会被移除；内容的结束位置须在各解析器中相同
+                first, strict, loose = _SCAN_RAW_END[name]
+                close = first.search(content, end)
+                if self_closing or close is None or loose.search(content, end, close.start()) is not None:
+                    return None
+                close = strict.match(content, close.start())
+                if close is None or (name == 'script' and '<!--' in content[end:close.start()]):
+                    return None
+                i = text_start = close.end()
+                continue
+            if name in _RCDATA_TAGS or name in _RAWTEXT_TAGS:
+                close = content.find('<', end)
+                close_match = _SCAN_END.match(content, close) if close >= 0 else None
+                if (self_closing or close_match is None or close_match.group(1).lower() != name
+                        or (name in _RAWTEXT_TAGS and '&' in content[end:close])):
+                    return None
+            if name == 'a':
+                href = ''
+                for attr in _SCAN_ATTR.finditer(match.group(2)):
+                    if attr.group(1).lower() == 'href':
+                        value = attr.group(2) or ''  # 重复的属性以最后一个为准
+                        if value[:1] in ('"', "'"):
+                            value = value[1:-1]
+                        href = unescape(value)
+                links.append(len(anchors))
+                anchors.append((href, []))
+            if name in _VOID_TAGS or self_closing:
+                if name == 'a':
+                    links.pop()
+                if name in _VOID_TAGS and not self_closing:
+                    closed_voids.append(name)
+            else:
+                stack.append(name)
+                opened[name] += 1
+
+    if text_start < len(content):
+        raw = content[text_start:]
+        text = _decode_text(raw) if '&' in raw else raw
+        if text is None:
+            return None
+        pending.append(text)
+    end_text()
+    _flush_block(blocks, parts, link_chars)
+    return blocks, [(href, ''.join(texts)) for href, texts in anchors if href and ''.join(texts)]
+
+
+# 用 selectolax (lexbor) 解析，文本块与锚文本的提取规则与 parse_blocks_soup 相同。
+# lexbor 按 HTML5 规则建树，会隐式闭合元素、为多余的结束标签补出空元素、把表格中的文字移到
+# 表格前，不规范的页面上得到的树与 html.parser 不同，如 <p>a <div>b</p> c 在 html.parser
+# 下切为 "a"、"b c"。因此同时用 _scan_blocks 按 html.parser 的标签事件切块，两者一致时
+# 采用 lexbor 的结果，不一致或扫描不支持该页面时回退 parse_blocks_soup，结果总与 html.parser 相同
+def parse_blocks_lexbor(content, current_url, source=None):
+    start = time.perf_counter()
+    try:
+        tree = LexborHTMLParser(content)
+
+        # 移除脚本和样式标签
+        for node in tree.css('script, style'):
+            node.decompose()
+
+        # 按块级标签切分文本块
+        blocks, parts, link_chars = [], [], 0
+        for node in tree.root.traverse(include_text=True):
+            if node.tag == '-text':
+                text = node.text_content
+                parts.append(text)
+                if _in_link(node):
+                    link_chars += len(''.join(text.split()))
+            elif node.tag in boilerplate.BLOCK_TAGS:
+                _flush_block(blocks, parts, link_chars)
+                parts, link_chars = [], 0
+        _flush_block(blocks, parts, link_chars)
+
+        # 锚点的 (href, 文字)（文字等价于 a_tag.get_text(strip=True)）
+        links = []
+        for a_tag in tree.css('a'):
+            href = a_tag.attributes.get('href') or ''
+            anchor_text = ''.join(part.strip() for part in _text_nodes(a_tag) if part.strip())
+            if href and anchor_text:
+                links.append((href, anchor_text))
+        parsed = time.perf_counter()
+        ingest.add("parse", parsed - start)
+
+        same = _scan_blocks(content) == (blocks, links)
+        verified = time.perf_counter()
+        ingest.add("verify", verified - parsed)
+        if not same:
+            result = parse_blocks_soup(content, current_url, source)
+            ingest.add("fallback", time.perf_counter() - verified)
+            return result
+
+        anchor_texts = []
+        for href, anchor_text in links:
+            if href.startswith(('http://', 'https://')):
+                full_url = href
+            else:
+                full_url = urljoin(current_url, href)
+            anchor_texts.append({
+                'text': anchor_text,
+                'url': full_url
+            })
+        ingest.add("anchors", time.perf_counter() - verified)
+
+        return blocks, anchor_texts
+    except Exception as e:
+        print(f"解析HTML文件 {source or current_url} 时出错: {e}")
+        return [], []
+
+
+# 从URL中提取日期，提取不到时返回 None
+def extract_date(url):
+    date_pattern = r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'
+    match = re.search(date_pattern, url)
+    if match:
+        year, month, day = match.groups()
+        return f"{year}-{month.zfill(2)}-{day.zfill(2)}"
+    return None
+
+
+# 内容指纹：标题、原始HTML、文档构建逻辑版本与站点模板的哈希，都不变时文档不必重建
+def fingerprint(title, html, url):
+    template = boilerplate.template_digest(extract_domain(url))
+    data = f"{DOCUMENT_VERSION}\0{template}\0{title}\0{html}".encode('utf-8', errors='replace')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+# 由页面内容构建待索引的文档（不访问 Elasticsearch，可在子进程中执行）
+def build_document(title, url, html):
+    content, anchor_texts = parse_html_content(html, url)
+    return {
+        "url": url,
+        "title": title,
+        "content": content,
+        "domain": extract_domain(url),
+        "date": extract_date(url),
+        "pagerank": 1.0,
+        "anchor_texts": anchor_texts,  # 新增锚文本字段
+        "content_hash": fingerprint(title, html, url)
+    }
+
+
+# 已有页面重新导入时 update 动作的内容：只更新页面本身的字段，保留 pagerank.py 与
+# anchor_text.py 写入的派生字段；文档不存在时按这些字段插入（派生字段缺失，
+# 下次运行两个脚本时补上）
+def update_body(document):
+    doc = {field: value for field, value in document.items() if field not in DERIVED_FIELDS}
+    return {"doc": doc, "doc_as_upsert": True}
+
+
+# 批量索引文档，返回 (成功数, 失败条目列表)；单条失败不影响同批的其他文档
+def bulk_index(documents):
+    actions = (dict(update_body(document), _op_type="update", _index=INDEX_NAME, _id=document["url"])
+               for document in documents)
+    success, errors = helpers.bulk(es, actions, raise_on_error=False, raise_on_exception=False)
+    return success, errors
+
+
+# 读取 HTML_DIR 下的页面文件，文件不存在或读取失败时返回 None
+def read_html(filename):
     # 构建HTML文件路径
     html_file = os.path.join(HTML_DIR, filename)
 
     # 检查HTML文件是否存在
     if not os.path.exists(html_file):
         print(f"HTML文件不存在: {html_file}")
-        return False
+        return None
 
-    # 读取HTML内容并提取锚文本
+    # 读取HTML内容
     try:
-        content, anchor_texts = parse_html(html_file, url)  # 传入当前URL处理相对路径
+        with open(html_file, 'r', encoding='utf-8') as f:
+            return f.read()
     except Exception as e:
         print(f"读取HTML文件失败: {e}")
-        return False
+        return None
 
-    # 提取域名
-    domain = extract_domain(url)
 
-    # 从URL中提取日期
-    date = None
-    try:
-        import re
-        date_pattern = r'(\d{4})[-/](\d{1,2})[-/](\d{1,2})'
-        match = re.search(date_pattern, url)
-        if match:
-            year, month, day = match.groups()
-            date = f"{year}-{month.zfill(2)}-{day.zfill(2)}"
-    except:
-        pass
+# 处理单个文档的导入；html 不为空时直接解析（来自页面存储），否则读取 HTML_DIR 下的文件
+def index_document(title, url, filename, html=None):
+    if html is None:
+        html = read_html(filename)
+        if html is None:
+            return False
 
-    # 索引文档（包含锚文本）
+    # 解析正文与锚文本（传入当前URL处理相对路径）
+    document = build_document(title, url, html)
+
+    # 索引文档（包含锚文本）；与 bulk_index 相同用 update，保留已有文档的派生字段
     try:
-        response = es.index(
-            index=INDEX_NAME,
-            id=url,
-            document={
-                "url": url,
-                "title": title,
-                "content": content,
-                "domain": domain,
-                "date": date,
-                "pagerank": 1.0,
-                "anchor_texts": anchor_texts  # 新增锚文本字段
-            }
-        )
-        print(f"成功索引文档: {url}，提取到 {len(anchor_texts)} 个锚文本")
+        response = es.update(index=INDEX_NAME, id=url, **update_body(document))
+        print(f"成功索引文档: {url}，提取到 {len(document['anchor_texts'])} 个锚文本")
         return True
     except Exception as e:
         print(f"索引文档时出错 {url}: {e}")
         return False
 
 
-# 主程序：处理CSV文件中的所有记录
-def main():
-    success_count = 0
-    failure_count = 0
+# 逐条产出待索引的记录 (title, url, filename, html)；从CSV读取时 html 为 None
+def iter_records():
+    if PAGE_STORE:
+        from worm.page_store import PageStore
+        store = PageStore(PAGE_STORE, readonly=True)
+        try:
+            for record in store.scan():
+                yield record.title, record.url, None, record.body.decode('utf-8', errors='replace')
+        finally:
+            store.close()
+        return
 
     with open(CSV_FILE, 'r', encoding='utf-8') as f:
         reader = csv.reader(f)
         next(reader)  # 跳过标题行
-
-        for i, row in enumerate(reader):
+        for row in reader:
             if len(row) >= 3:
                 title, url, filename = row
-                print(f"处理第 {i + 1} 条记录: {title}")
+                yield title, url, filename, None
 
-                if index_document(title, url, filename):
-                    success_count += 1
-                else:
-                    failure_count += 1
 
-                # 每10条记录刷新一次索引
-                if (i + 1) % 10 == 0:
-                    es.indices.refresh(index=INDEX_NAME)
-                    print(f"已处理 {i + 1} 条记录，成功 {success_count} 条，失败 {failure_count} 条")
+# 设置解析后端（解析进程启动时调用）
+def set_parser(parser):
+    global PARSER
+    PARSER = parser
+
+
+# 实际使用的解析后端：未安装 selectolax 时 lexbor 退回 html.parser
+def active_parser():
+    return "lexbor" if PARSER == "lexbor" and LexborHTMLParser is not None else "html.parser"
+
+
+# 解析进程的初始化：设置解析后端，清空从主进程继承来的计时
+def _init_worker(parser):
+    set_parser(parser)
+    ingest.reset()
+
+
+# 解析一组记录，返回 ([(title, url, filename, document)], 阶段计时)；页面不可读时 document 为 None
+def build_chunk(records):
+    results = []
+    for title, url, filename, html in records:
+        if html is None:
+            html = read_html(filename)
+        results.append((title, url, filename, None if html is None else build_document(title, url, html)))
+    return results, ingest.take()
+
+
+# 把 build_chunk 交回的阶段计时并入主进程，返回其中的结果
+def _merged(chunk_result):
+    results, taken = chunk_result
+    ingest.merge(taken)
+    return results
+
+
+# 用 workers 个进程并行解析，按 records 的原顺序产出 build_chunk 的结果；
+# 在途的块数不超过 2 * workers，内存占用与记录总数无关
+def parse_records(records, workers=PARSE_WORKERS):
+    if workers <= 1:
+        for record in records:
+            yield from _merged(build_chunk([record]))
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(PARSER,)) as pool:
+        pending, chunk = deque(), []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) == PARSE_CHUNK:
+                pending.append(pool.submit(build_chunk, chunk))
+                chunk = []
+                if len(pending) >= 2 * workers:
+                    yield from _merged(pending.popleft().result())
+        if chunk:
+            pending.append(pool.submit(build_chunk, chunk))
+        while pending:
+            yield from _merged(pending.popleft().result())
+
+
+# 一次取回索引中全部文档的内容指纹 {url: content_hash}
+def existing_fingerprints(index=INDEX_NAME):
+    fingerprints = {}
+    for hit in helpers.scan(es, index=index, size=5000, query={"query": {"match_all": {}}},
+                            _source=["content_hash"]):
+        fingerprints[hit["_id"]] = hit["_source"].get("content_hash")
+    return fingerprints
+
+
+# 批量导入：流式生成 bulk 动作，按文档数与字节数切分批次，多个批次同时在途；
+# 导入期间关闭自动刷新，结束后恢复原设置并只刷新一次。返回失败条目列表
+# 默认增量：指纹与索引中相同的页面不解析也不发送，清单中已不存在的页面从索引中删除；
+# full 为真时重建全部页面；index 为写入的索引（默认经由别名写入当前版本）；
+# records 为 iter_records 格式的记录，默认读取配置的清单。各阶段的计时见 ingest
+def bulk_load(batch_docs=BULK_DOCS, batch_bytes=BULK_BYTES, in_flight=BULK_IN_FLIGHT, workers=PARSE_WORKERS,
+              full=False, index=INDEX_NAME, records=None):
+    failures = []
+    existing = existing_fingerprints(index)
+    ingest.reset()
+    seen = set()
+    counts = {"new": 0, "changed": 0, "unchanged": 0, "deleted": 0}
+    print(f"索引中已有 {len(existing)} 个文档")
+
+    # 读取页面并与已有指纹比较，只把新增或变化的页面交给解析进程
+    def changed_records():
+        for title, url, filename, html in timed_iter(iter_records() if records is None else records, "records"):
+            seen.add(url)
+            if html is None:
+                start = time.perf_counter()
+                html = read_html(filename)
+                ingest.add("read", time.perf_counter() - start)
+                if html is None:
+                    failures.append({"url": url, "error": f"HTML文件不可读: {filename}"})
+                    continue
+            if url not in existing:
+                counts["new"] += 1
+            elif not full:
+                start = time.perf_counter()
+                unchanged = existing[url] == fingerprint(title, html, url)
+                ingest.add("fingerprint", time.perf_counter() - start)
+                if unchanged:
+                    counts["unchanged"] += 1
+                    continue
+                counts["changed"] += 1
+            else:
+                counts["changed"] += 1
+            yield title, url, filename, html
+
+    # 产出 (动作行, 序列化后的内容)，helpers 原样发送（见 expand_action_callback）。
+    # 新页面整篇写入（派生字段取默认值），已有页面局部更新，保留派生字段
+    def actions():
+        for title, url, filename, document in parse_records(changed_records(), workers):
+            ingest.anchors.observe(len(document["anchor_texts"]))
+            op, body = ("update", update_body(document)) if url in existing else ("index", document)
+            start = time.perf_counter()
+            source = serializer.dumps(body)
+            ingest.add("serialize", time.perf_counter() - start)
+            ingest.doc_bytes.observe(len(source))
+            yield {op: {"_index": index, "_id": url}}, source
+        # 清单中已不存在的页面；清单为空时多半是配置错误，不删除
+        if seen:
+            for url in existing.keys() - seen:
+                counts["deleted"] += 1
+                yield {"delete": {"_index": index, "_id": url}}, None
+
+    settings = es.indices.get_settings(index=index, name="index.refresh_interval")
+    # 未显式设置时为 None，恢复时写回 None 即回到默认值
+    refresh_interval = next(iter(settings.values()))["settings"].get("index", {}).get("refresh_interval")
+    es.indices.put_settings(index=index, settings={"index": {"refresh_interval": "-1"}})
+    print(f"已关闭自动刷新（原设置: {refresh_interval or '默认'}），开始批量导入")
+
+    success_count = 0
+    start = time.perf_counter()
+    try:
+        timed = TimedElasticsearch(_transport=es.transport)
+        for ok, item in helpers.parallel_bulk(timed, actions(), thread_count=in_flight, queue_size=in_flight,
+                                              chunk_size=batch_docs, max_chunk_bytes=batch_bytes,
+                                              expand_action_callback=lambda action: action,
+                                              raise_on_error=False, raise_on_exception=False):
+            if ok:
+                success_count += 1
+            else:
+                # 单条失败：记录 URL、状态码与错误原因，不中断导入
+                result = next(iter(item.values()))
+                failures.append({"url": result.get("_id"), "status": result.get("status"),
+                                 "error": result.get("error")})
+            done = success_count + len(failures)
+            if done % 1000 == 0:
+                print(f"已处理 {done} 条记录，成功 {success_count} 条，失败 {len(failures)} 条，"
+                      f"{done / (time.perf_counter() - start):.0f} 篇/秒")
+    finally:
+        es.indices.put_settings(index=index, settings={"index": {"refresh_interval": refresh_interval}})
+        es.indices.refresh(index=index)
+    elapsed = time.perf_counter() - start
+    ingest.docs, ingest.elapsed = success_count + len(failures), elapsed
+
+    if failures:
+        with open(ERROR_FILE, 'w', encoding='utf-8') as f:
+            for failure in failures:
+                f.write(json.dumps(failure, ensure_ascii=False, default=str) + "\n")
+    count = es.count(index=index)
+    print(f"\n导入完成! 用时 {elapsed:.1f}s，{success_count / elapsed:.0f} 篇/秒")
+    print(f"新增: {counts['new']}，变化: {counts['changed']}，未变化（跳过）: {counts['unchanged']}，"
+          f"删除: {counts['deleted']}")
+    print(f"成功: {success_count}")
+    print(f"失败: {len(failures)}" + (f"（详见 {ERROR_FILE}）" if failures else ""))
+    print(f"索引中当前文档数: {count['count']}")
+    ingest.report()
+    return failures
+
+
+# 基准测试用的固定语料：由替身服务器的页面生成器确定性地生成 count 篇新闻网文章，
+# 与 iter_records 的格式相同
+def fixture_records(count=BENCH_DOCS):
+    from worm.standin import LINKS_PER_PAGE, NEWS_SECTIONS, render
+    codes = list(NEWS_SECTIONS)
+    for i in range(count):
+        code, article_id = codes[i % len(codes)], 100 + i // len(codes)
+        path = f"/{code}/system/2024/05/{article_id:08d}.shtml"
+        yield f"{code}新闻{article_id}", "http://news.nankai.edu.cn" + path, None, render(path, LINKS_PER_PAGE)
+
+
+# 基准测试：把固定语料导入临时索引（导入设置），报告吞吐与 bulk 往返时间并追加到 BENCH_FILE
+def benchmark(docs=BENCH_DOCS, batch_docs=BULK_DOCS, batch_bytes=BULK_BYTES, in_flight=BULK_IN_FLIGHT,
+              workers=PARSE_WORKERS, output=BENCH_FILE):
+    records = list(fixture_records(docs))  # 预先生成，不计入导入时间
+    if es.indices.exists(index=BENCH_INDEX):
+        es.indices.delete(index=BENCH_INDEX)
+    create_version(BULK_SETTINGS, name=BENCH_INDEX)
+    try:
+        failures = bulk_load(batch_docs, batch_bytes, in_flight, workers, full=True, index=BENCH_INDEX,
+                             records=records)
+    finally:
+        es.indices.delete(index=BENCH_INDEX)
+    result = {"time": time.strftime('%Y-%m-%dT%H:%M:%S'), "host": ES_HOST, "parser": PARSER, "workers": workers,
+              "batch_docs": batch_docs, "batch_bytes": batch_bytes, "in_flight": in_flight,
+              "document_version": DOCUMENT_VERSION, "failures": len(failures), **ingest.to_dict()}
+    with open(output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    print(f"\n📊 基准测试: {result['docs']} 篇，{result['docs_per_second']} 篇/秒，"
+          f"bulk 往返 p50 {result['batch_p50_ms']}ms，p99 {result['batch_p99_ms']}ms（已追加到 {output}）")
+    return result
+
+
+# 解析一致性检查用的不规范片段：html.parser 与 HTML5 建树不同的写法
+PARSER_SAMPLES = (
+    '<p>南开大学新闻 <div>化学学院举办学术报告会</p> 更多内容请见附件</div>',
+    '<div>正文</p>尾注</div><p>第二段',
+    '<a href="/a">外层<a href="/b">内层</a>尾</a>',
+    '<table>表格前<tr><td>单元格</td></tr>表格后</table>',
+    '<p>换行<br></br>之后</p><li>列表<li>项',
+    '<a href="/x?a=1&amp;b=2">&lt;标题&gt; &copy; &#20013;&#x6587; &nbsp;&foo;</a>',
+    '<ul>\r\n<li><a href="/c">\r\n 链接 \r\n</a></li>\r\n</ul>',
+    '<h1>标题<h2>副标题</h1>正文</h2><script>var s = "<p>";</script><style>p{}</style>结尾',
+    '<b><i>交叉</b>嵌套</i><a>无链接</a><a href="">空链接</a>',
+)
+
+
+# 解析一致性检查：固定语料与 PARSER_SAMPLES 分别用 html.parser 与 lexbor 解析，文本块或锚文本
+# 有任何不同即报告并返回 False；_scan_blocks 支持的页面同时检查扫描结果
+def check_parser(docs=BENCH_DOCS):
+    records = [(url, html) for _, url, _, html in fixture_records(docs)]
+    records += [(f"http://news.nankai.edu.cn/sample/{i}.shtml", html) for i, html in enumerate(PARSER_SAMPLES)]
+    fallbacks, scanned, differences = ingest.calls["fallback"], 0, 0
+    for url, html in records:
+        expected = parse_blocks_soup(html, url)
+        result = {"lexbor": parse_blocks_lexbor(html, url)}
+        scan = _scan_blocks(html)
+        if scan is not None:
+            scanned += 1
+            blocks, links = scan
+            result["扫描"] = (blocks, [{'text': text, 'url': href if href.startswith(('http://', 'https://'))
+                                        else urljoin(url, href)} for href, text in links])
+        for name, actual in result.items():
+            if actual != expected:
+                differences += 1
+                print(f"❌ {url}: {name} 与 html.parser 的结果不同")
+                print(f"  html.parser: {expected}")
+                print(f"  {name}: {actual}")
+    fallbacks = ingest.calls["fallback"] - fallbacks
+    print(f"检查 {len(records)} 个页面：扫描支持 {scanned} 个，lexbor 回退 {fallbacks} 个，不一致 {differences} 处")
+    return differences == 0
+
+
+# 主程序：处理CSV文件（或页面存储）中的所有记录
+def main():
+    global es, ES_HOST
+    parser = argparse.ArgumentParser(description='将爬取的页面导入 Elasticsearch')
+    parser.add_argument('--single', action='store_true', help='逐条索引（旧模式），默认批量导入')
+    parser.add_argument('--full', action='store_true', help='忽略内容指纹，重建全部页面')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='导入到新版本索引，完成后原子切换别名（映射或设置改变后使用）')
+    parser.add_argument('--force', action='store_true', help='重建得到的文档数偏少时仍切换别名')
+    parser.add_argument('--rollback', action='store_true', help='把别名切回上一个版本')
+    parser.add_argument('--batch-docs', type=int, default=BULK_DOCS, help='每个 bulk 请求最多包含的文档数')
+    parser.add_argument('--batch-bytes', type=int, default=BULK_BYTES, help='每个 bulk 请求的最大字节数')
+    parser.add_argument('--in-flight', type=int, default=BULK_IN_FLIGHT, help='同时在途的 bulk 请求数')
+    parser.add_argument('--workers', type=int, default=PARSE_WORKERS, help='并行解析的进程数')
+    parser.add_argument('--parser', choices=['html.parser', 'lexbor'], default=PARSER,
+                        help='HTML 解析后端，lexbor 需要安装 selectolax')
+    parser.add_argument('--es-host', default=ES_HOST, help='Elasticsearch 地址，也可以是 es_standin.py 替身')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='把固定语料导入临时索引，报告各阶段耗时、吞吐与 bulk 往返分位数')
+    parser.add_argument('--bench-docs', type=int, default=BENCH_DOCS, help='基准测试语料的文档数')
+    parser.add_argument('--check-parser', action='store_true',
+                        help='在固定语料与不规范片段上比较 lexbor 与 html.parser 的解析结果，不一致时以非零状态退出')
+    args = parser.parse_args()
+
+    if args.parser == "lexbor" and LexborHTMLParser is None:
+        print("未安装 selectolax，改用 html.parser")
+        args.parser = "html.parser"
+    set_parser(args.parser)
+    if args.es_host != ES_HOST:
+        ES_HOST, es = args.es_host, connect(args.es_host)
+
+    if args.check_parser:
+        if LexborHTMLParser is None:
+            sys.exit("未安装 selectolax，无法检查 lexbor")
+        sys.exit(0 if check_parser(args.bench_docs) else 1)
+    if args.benchmark:
+        benchmark(args.bench_docs, args.batch_docs, args.batch_bytes, args.in_flight, args.workers)
+        return
+    if args.rollback:
+        rollback()
+        return
+    if args.rebuild:
+        rebuild(args.batch_docs, args.batch_bytes, args.in_flight, args.workers, args.force)
+        return
+
+    create_index()
+    if not args.single:
+        bulk_load(args.batch_docs, args.batch_bytes, args.in_flight, args.workers, args.full)
+        return
+
+    success_count = 0
+    failure_count = 0
+
+    for i, (title, url, filename, html) in enumerate(iter_records()):
+        print(f"处理第 {i + 1} 条记录: {title}")
+
+        if index_document(title, url, filename, html):
+            success_count += 1
+        else:
+            failure_count += 1
+
+        # 每10条记录刷新一次索引
+        if (i + 1) % 10 == 0:
+            es.indices.refresh(index=INDEX_NAME)
+            print(f"已处理 {i + 1} 条记录，成功 {success_count} 条，失败 {failure_count} 条")
 
     # 最终刷新索引
     es.indices.refresh(index=INDEX_NAME)
@@ -0,0 +1,931 @@
+"""HW1 BSBI 布尔检索引擎的独立模块版本
+
+与 2311828_程娜_hw1.ipynb 中逐步实现的类保持一致，供 notebook 之外的脚本
+（查询服务、批量查询等）直接 import 使用。
+"""
+import array
+import contextlib
+import heapq
+import os
+import pickle as pkl
+import re
+
+import postings_ops
+
+
+class IdMap:
+    """Helper class to store a mapping from strings to ids."""
+    def __init__(self):
+        self.str_to_id = {}
+        self.id_to_str = []
+
+    def __len__(self):
+        """Return number of terms stored in the IdMap"""
+        return len(self.id_to_str)
+
+    def _get_str(self, i):
+        """Returns the string corresponding to a given id (`i`)."""
+        # 防止负数索引和越界访问
+        if i < 0 or i >= len(self.id_to_str):
+            raise IndexError(f"ID {i} is out of range")
+        # 直接通过列表索引实现O(1)查找
+        return self.id_to_str[i]
+
+    def _get_id(self, s):
+        """Returns the id corresponding to a string (`s`).
+        If `s` is not in the IdMap yet, then assigns a new id and returns the new id.
+        """
+        # 处理新字符串的自动注册
+        if s not in self.str_to_id:
+            # 使用当前长度作为新ID，保证严格递增
+            new_index = len(self.id_to_str)
+            self.str_to_id[s] = new_index
+            self.id_to_str.append(s)
+        return self.str_to_id[s]
+
+    def __getitem__(self, key):
+        """If `key` is a integer, use _get_str;
+           If `key` is a string, use _get_id;"""
+        if type(key) is int:
+            return self._get_str(key)
+        elif type(key) is str:
+            return self._get_id(key)
+        else:
+            raise TypeError
+
+
+class _NotebookUnpickler(pkl.Unpickler):
+    """notebook 中保存的 terms.dict / docs.dict 引用的是 `__main__.IdMap`，
+    在独立脚本中加载时将其映射到本模块的同名类"""
+    def find_class(self, module, name):
+        if module == '__main__' and name in globals():
+            return globals()[name]
+        return super().find_class(module, name)
+
+
+def load_pickle(f):
+    """读取 notebook 或本模块生成的 pickle 文件"""
+    return _NotebookUnpickler(f).load()
+
+
+class UncompressedPostings:
+
+    @staticmethod
+    def encode(postings_list):
+        """Encodes postings_list into a stream of bytes
+
+        Parameters
+        ----------
+        postings_list: List[int]
+            List of docIDs (postings)
+
+        Returns
+        -------
+        bytes
+            bytearray representing integers in the postings_list
+        """
+        return array.array('L', postings_list).tobytes()
+
+    @staticmethod
+    def decode(encoded_postings_list):
+        """Decodes postings_list from a stream of bytes
+
+        Parameters
+        ----------
+        encoded_postings_list: bytes
+            bytearray representing encoded postings list as output by encode
+            function
+
+        Returns
+        -------
+        List[int]
+            Decoded list of docIDs from encoded_postings_list
+        """
+
+        decoded_postings_list = array.array('L')
+        decoded_postings_list.frombytes(encoded_postings_list)
+        return decoded_postings_list.tolist()
+
+    @staticmethod
+    def decode_array(encoded_postings_list):
+        """与 decode 相同，但直接返回 postings_ops 使用的数组表示"""
+        return postings_ops.frombuffer_uint(encoded_postings_list, array.array('L').itemsize)
+
+
+class CompressedPostings:
+
+    @staticmethod
+    def vb_encode_number(n):
+        """Encodes a single number using variable-byte encoding.
+
+        Parameters
+        ----------
+        n : int
+            The number to be encoded.
+
+        Returns
+        -------
+        List[int]
+            A list of bytes representing the encoded number.
+        """
+        bytes_list = []
+        while True:
+            bytes_list.insert(0, n % 128)  # 取低7位并插入到列表开头
+            if n < 128:
+                break
+            n //= 128  # 右移7位，相当于n //= 128
+        bytes_list[-1] += 128  # 设置最后一个字节的结束位
+        return bytes_list
+
+    @staticmethod
+    def vb_encode_number_list(numbers):
+        """Encodes a list of numbers using variable-byte encoding.
+
+        Parameters
+        ----------
+        numbers : List[int]
+            The list of numbers to be encoded.
+
+        Returns
+        -------
+        bytes
+            A bytes object representing the encoded numbers.
+        """
+        bytestream = []
+        for number in numbers:
+            bytestream.extend(CompressedPostings.vb_encode_number(number))  # 编码每个数字并添加到字节流中
+        return array.array('B', bytestream).tobytes()  # 转换为字节对象
+
+    @staticmethod
+    def vb_decode(stream):
+        """Decodes a stream of bytes into a list of numbers using variable-byte encoding.
+
+        Parameters
+        ----------
+        stream : bytes
+            The byte stream to be decoded.
+
+        Returns
+        -------
+        List[int]
+            The list of decoded numbers.
+        """
+        numbers = []
+        n = 0
+        for byte in stream:
+            if byte < 128:  # 如果当前字节不是结束字节
+                n = 128 * n + byte  # 累加当前字节的值
+            else:
+                n = 128 * n + (byte - 128)  # 处理结束字节
+                numbers.append(n)  # 添加解码后的数到结果列表中
+                n = 0  # 重置 n 值
+        return numbers
+
+    @staticmethod
+    def encode(postings_list):
+        """Encodes `postings_list` using gap encoding with variable byte
+        encoding for each gap
+
+        Parameters
+        ----------
+        postings_list: List[int]
+            The postings list to be encoded
+
+        Returns
+        -------
+        bytes:
+            Bytes reprsentation of the compressed postings list
+            (as produced by `array.tobytes` function)
+        """
+        if not postings_list:
+            return b''
+
+        # 计算差值列表（gap encoding）
+        gaps = [postings_list[0]]  # 第一个文档ID作为初始差值
+        for i in range(1, len(postings_list)):
+            gaps.append(postings_list[i] - postings_list[i - 1])  # 计算差值并添加到列表中
+
+        return CompressedPostings.vb_encode_number_list(gaps)  # 使用VB编码对差值列表进行编码
+
+    @staticmethod
+    def decode(encoded_postings_list):
+        """Decodes a byte representation of compressed postings list
+
+        Parameters
+        ----------
+        encoded_postings_list: bytes
+            Bytes representation as produced by `CompressedPostings.encode`
+
+        Returns
+        -------
+        List[int]
+            Decoded postings list (each posting is a docIds)
+        """
+        if not encoded_postings_list:
+            return []
+
+        # 解码差值列表
+        gaps = CompressedPostings.vb_decode(encoded_postings_list)
+
+        # 通过累加差值恢复原始的文档ID列表
+        postings_list = []
+        current_doc_id = 0
+        for gap in gaps:
+            current_doc_id += gap  # 累加每个差值得到文档ID
+            postings_list.append(current_doc_id)  # 添加到结果列表中
+
+        return postings_list
+
+    @staticmethod
+    def decode_array(encoded_postings_list):
+        """与 decode 相同，但向量化解码并返回 postings_ops 使用的数组表示"""
+        return postings_ops.vb_decode_gaps(encoded_postings_list)
+
+
+class ECCompressedPostings:
+
+    @staticmethod
+    def varbyte_encode_number(n):
+        """使用可变字节编码 (VarByte) 对单个整数进行编码
+
+        Parameters
+        ----------
+        n : int
+            需要编码的整数
+
+        Returns
+        -------
+        List[int]
+            编码后的字节列表
+        """
+        bytes_list = []
+        while True:
+            bytes_list.insert(0, n % 128)  # 取低7位
+            if n < 128:
+                break
+            n //= 128
+        bytes_list[-1] += 128  # 设置最后一个字节的最高位为 1，设置结束标记
+        return bytes_list
+
+    @staticmethod
+    def varbyte_encode_list(numbers):
+        """使用可变字节编码对整数列表进行编码
+
+        Parameters
+        ----------
+        numbers : List[int]
+            需要编码的整数列表
+
+        Returns
+        -------
+        bytes
+            编码后的字节流
+        """
+        bytestream = []
+        for number in numbers:
+            bytestream.extend(ECCompressedPostings.varbyte_encode_number(number))
+        return array.array('B', bytestream).tobytes()
+
+    @staticmethod
+    def varbyte_decode(encoded_bytes):
+        """使用可变字节编码对字节流进行解码
+
+        Parameters
+        ----------
+        encoded_bytes : bytes
+            编码后的字节流
+
+        Returns
+        -------
+        List[int]
+            解码后的整数列表
+        """
+        numbers = []
+        n = 0
+        for byte in encoded_bytes:
+            if byte < 128:
+                n = 128 * n + byte  # 高位为 0，继续累加
+            else:
+                n = 128 * n + (byte - 128)  # 高位为 1，表示数字结束
+                numbers.append(n)
+                n = 0   # 必须重置累加器
+        return numbers
+
+    @staticmethod
+    def encode(postings_list):
+        """Encodes `postings_list`
+
+        Parameters
+        ----------
+        postings_list: List[int]
+            The postings list to be encoded
+
+        Returns
+        -------
+        bytes:
+            Bytes reprsentation of the compressed postings list
+        """
+        if not postings_list:
+            return b''
+
+        # 计算差值（Delta 编码）
+        gaps = [postings_list[0]]  # 第一个文档ID直接存储（后续处理相对差值）
+        for i in range(1, len(postings_list)):
+            # 计算差值，严格依赖输入列表的升序特性
+            gaps.append(postings_list[i] - postings_list[i - 1])
+
+        # 使用 VarByte 编码对差值列表进行压缩
+        return ECCompressedPostings.varbyte_encode_list(gaps)
+
+    @staticmethod
+    def decode(encoded_postings_list):
+        """Decodes a byte representation of compressed postings list
+
+        Parameters
+        ----------
+        encoded_postings_list: bytes
+            Bytes representation as produced by `CompressedPostings.encode`
+
+        Returns
+        -------
+        List[int]
+            Decoded postings list (each posting is a docId)
+        """
+        if not encoded_postings_list:
+            return []
+
+        # 使用 VarByte 解码差值列表
+        gaps = ECCompressedPostings.varbyte_decode(encoded_postings_list)
+
+        # 通过累加差值恢复原始的文档 ID 列表，通过累加差值逆向delta编码
+        postings_list = []
+        current_doc_id = 0
+        for gap in gaps:
+            current_doc_id += gap
+            postings_list.append(current_doc_id)
+
+        return postings_list
+
+    @staticmethod
+    def decode_array(encoded_postings_list):
+        """与 decode 相同，但向量化解码并返回 postings_ops 使用的数组表示"""
+        return postings_ops.vb_decode_gaps(encoded_postings_list)
+
+
+# 按名称查找编码方式，便于命令行参数指定
+POSTINGS_ENCODINGS = {
+    'uncompressed': UncompressedPostings,
+    'compressed': CompressedPostings,
+    'eccompressed': ECCompressedPostings,
+}
+
+
+# 中日韩统一表意文字（含扩展 A 区与兼容区）连续片段，或小写化后的 ASCII 字母数字串
+_CJK_OR_WORD = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+
+
+def whitespace_tokenize(text):
+    """pa1-data 已经分好词，直接按空白切分"""
+    return text.split()
+
+
+def cjk_tokenize(text):
+    """中英混排文本的分词：汉字片段切成重叠二元组，ASCII 部分按字母数字串切分
+
+    例如 "南开大学AI研究院" -> ['南开', '开大', '大学', 'ai', '研究', '究院']。
+    单个汉字的片段保留为一元词。查询与文档使用同一分词器，
+    多个二元组的布尔与查询近似于短语匹配。
+    """
+    tokens = []
+    for piece in _CJK_OR_WORD.findall(text.lower()):
+        if piece[0] < '\u3400' or len(piece) == 1:
+            tokens.append(piece)
+        else:
+            tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+    return tokens
+
+
+# 按名称查找分词器，便于命令行参数指定
+TOKENIZERS = {
+    'whitespace': whitespace_tokenize,
+    'cjk': cjk_tokenize,
+}
+
+
+class InvertedIndex:
+    """A class that implements efficient reads and writes of an inverted index
+    to disk
+
+    Attributes
+    ----------
+    postings_dict: Dictionary mapping: termID->(start_position_in_index_file,
+                                                number_of_postings_in_list,
+                                               length_in_bytes_of_postings_list)
+        This is a dictionary that maps from termIDs to a 3-tuple of metadata
+        that is helpful in reading and writing the postings in the index file
+        to/from disk. This mapping is supposed to be kept in memory.
+        start_position_in_index_file is the position (in bytes) of the postings
+        list in the index file
+        number_of_postings_in_list is the number of postings (docIDs) in the
+        postings list
+        length_in_bytes_of_postings_list is the length of the byte
+        encoding of the postings list
+
+    terms: List[int]
+        A list of termIDs to remember the order in which terms and their
+        postings lists were added to index.
+    """
+    def __init__(self, index_name, postings_encoding=None, directory=''):
+        """
+        Parameters
+        ----------
+        index_name (str): Name used to store files related to the index
+        postings_encoding: A class implementing static methods for encoding and
+            decoding lists of integers. Default is None, which gets replaced
+            with UncompressedPostings
+        directory (str): Directory where the index files will be stored
+        """
+
+        self.index_file_path = os.path.join(directory, index_name+'.index')
+        self.metadata_file_path = os.path.join(directory, index_name+'.dict')
+
+        if postings_encoding is None:
+            self.postings_encoding = UncompressedPostings
+        else:
+            self.postings_encoding = postings_encoding
+        self.directory = directory
+
+        self.postings_dict = {}
+        self.terms = []         #Need to keep track of the order in which the
+                                #terms were inserted. Would be unnecessary
+                                #from Python 3.7 onwards
+
+    def __enter__(self):
+        """Opens the index_file and loads metadata upon entering the context"""
+        # Open the index file
+        self.index_file = open(self.index_file_path, 'rb+')
+
+        # Load the postings dict and terms from the metadata file
+        with open(self.metadata_file_path, 'rb') as f:
+            self.postings_dict, self.terms = load_pickle(f)
+            self.term_iter = self.terms.__iter__()
+
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Closes the index_file and saves metadata upon exiting the context"""
+        # Close the index file
+        self.index_file.close()
+
+        # Write the postings dict and terms to the metadata file
+        with open(self.metadata_file_path, 'wb') as f:
+            pkl.dump([self.postings_dict, self.terms], f)
+
+
+class InvertedIndexWriter(InvertedIndex):
+    """"""
+    def __enter__(self):
+        self.index_file = open(self.index_file_path, 'wb+')
+        return self
+
+    def append(self, term, postings_list):
+        """Appends the term and postings_list to end of the index file.
+
+        This function does three things,
+        1. Encodes the postings_list using self.postings_encoding
+        2. Stores metadata in the form of self.terms and self.postings_dict
+           Note that self.postings_dict maps termID to a 3 tuple of
+           (start_position_in_index_file,
+           number_of_postings_in_list,
+           length_in_bytes_of_postings_list)
+        3. Appends the bytestream to the index file on disk
+
+        Parameters
+        ----------
+        term:
+            term or termID is the unique identifier for the term
+        postings_list: List[Int]
+            List of docIDs where the term appears
+        """
+        self.terms.append(term)  # 将当前 term 加入到 terms 列表中
+        encoded_postings = self.postings_encoding.encode(postings_list)  # 对 postings_list 进行编码
+        start_position = self.index_file.tell()  # 获取当前文件指针位置，作为起始位置
+        self.postings_dict[term] = (
+            start_position,  # term 在索引文件中的起始位置
+            len(postings_list),  # 该 term 出现的文档数量
+            len(encoded_postings)  # 编码后的 postings_list 长度（字节）
+        )
+        self.index_file.write(encoded_postings)  # 将编码后的 postings_list 写入到索引文件中
+        self.index_file.flush()  # 确保数据及时写入磁盘
+
+
+class InvertedIndexIterator(InvertedIndex):
+    """"""
+    def __enter__(self):
+        """Adds an initialization_hook to the __enter__ function of super class
+        """
+        super().__enter__()
+        self._initialization_hook()
+        return self
+
+    def _initialization_hook(self):
+        """Use this function to initialize the iterator
+        """
+        self.curr_pos = 0  # 初始化当前位置指针为 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        """Returns the next (term, postings_list) pair in the index.
+
+        Note: This function should only read a small amount of data from the
+        index file. In particular, you should not try to maintain the full
+        index file in memory.
+        """
+        if self.curr_pos < len(self.terms):
+            # 获取当前 term，依赖terms预排序特性
+            term = self.terms[self.curr_pos]
+            # 获取 term 对应的元数据
+            start, num, length = self.postings_dict[term]
+            # 定位文件指针到起始位置
+            self.index_file.seek(start)
+            # 读取编码后的倒排列表，读取指定字节长度的编码数据
+            encoded_postings_list = self.index_file.read(length)
+            # 解码倒排列表，解码过程需与编码器严格匹配
+            postings_list = self.postings_encoding.decode(encoded_postings_list)
+            # 移动当前位置指针，指针移动必须在成功解码之后
+            self.curr_pos += 1
+            # 返回 term 和对应的 postings_list
+            return term, postings_list
+        else:
+            raise StopIteration  # 如果所有条目已遍历完，抛出 StopIteration 异常
+
+    def delete_from_disk(self):
+        """Marks the index for deletion upon exit. Useful for temporary indices
+        """
+        self.delete_upon_exit = True
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        """Delete the index file upon exiting the context along with the
+        functions of the super class __exit__ function"""
+        self.index_file.close()
+        if hasattr(self, 'delete_upon_exit') and self.delete_upon_exit:
+            os.remove(self.index_file_path)
+            os.remove(self.metadata_file_path)
+        else:
+            with open(self.metadata_file_path, 'wb') as f:
+                pkl.dump([self.postings_dict, self.terms], f)
+
+
+class InvertedIndexMapper(InvertedIndex):
+    def __enter__(self):
+        """Opens the index read-only: lookups never modify the index, so the
+        mapper must not hold it writable or write metadata back on exit
+        (which would clobber an index rebuilt in the meantime)"""
+        self.index_file = open(self.index_file_path, 'rb')
+        with open(self.metadata_file_path, 'rb') as f:
+            self.postings_dict, self.terms = load_pickle(f)
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.index_file.close()
+
+    def __getitem__(self, key):
+        return self._get_postings_list(key)
+
+    def _get_postings_list(self, term):
+        """Gets a postings list (of docIds) for `term`.
+
+        This function should not iterate through the index file.
+        I.e., it should only have to read the bytes from the index file
+        corresponding to the postings list for the requested term.
+        """
+        if term in self.postings_dict:
+            start_pos, doc_count, byte_length = self.postings_dict[term]
+            # 定位到倒排列表的起始位置
+            self.index_file.seek(start_pos)
+            # 读取倒排列表
+            encoded_postings = self.index_file.read(byte_length)
+            # 解码过程必须与写入时的编码器严格匹配
+            decoded_postings = self.postings_encoding.decode(encoded_postings)  # 解码倒排列表
+            return decoded_postings
+        else:
+            raise KeyError(f"Term {term} not found in the index.")  # term 不存在时抛出 KeyError
+
+    def postings_array(self, term):
+        """与 __getitem__ 相同，但返回 postings_ops 使用的数组表示，供集合运算使用
+
+        编码类提供 decode_array 时直接向量化解码，否则解码为列表后再转换。
+        """
+        if term not in self.postings_dict:
+            raise KeyError(f"Term {term} not found in the index.")
+        start_pos, doc_count, byte_length = self.postings_dict[term]
+        self.index_file.seek(start_pos)
+        encoded_postings = self.index_file.read(byte_length)
+        decode_array = getattr(self.postings_encoding, 'decode_array', None)
+        if decode_array is not None:
+            return decode_array(encoded_postings)
+        return postings_ops.as_postings(self.postings_encoding.decode(encoded_postings))
+
+
+def sorted_intersect(list1, list2):
+    """Intersects two (ascending) sorted lists and returns the sorted result
+
+    Parameters
+    ----------
+    list1: List[Comparable]
+    list2: List[Comparable]
+        Sorted lists to be intersected
+
+    Returns
+    -------
+    List[Comparable]
+        Sorted intersection
+    """
+    # 双指针法（two-pointer）实现高效线性遍历
+    iter1, iter2 = iter(list1), iter(list2)  # 创建两个列表的迭代器
+    result = []  # 存放交集的结果列表
+
+    try:
+        val1 = next(iter1)
+        val2 = next(iter2)
+        while True:
+            if val1 < val2:
+                # 移动较小值的指针以寻找匹配项
+                val1 = next(iter1)   # list1指针前进
+            elif val1 > val2:
+                val2 = next(iter2)   # list2指针前进
+            else:
+                result.append(val1)
+                # 同时移动两个指针以寻找下一个匹配
+                val1 = next(iter1)
+                val2 = next(iter2)
+    except StopIteration:
+        pass  # 捕获迭代完成信号（任一列表遍历完毕）
+    return result  # 返回交集结果列表
+
+
+def conjunctive_postings(index_mapper, term_ids):
+    """Intersects the postings lists of all `term_ids` in `index_mapper`
+
+    Lists are intersected from the lowest document frequency upwards (read
+    from postings_dict, without decoding) so the intermediate result shrinks
+    as early as possible; stops as soon as it becomes empty. Decoding and
+    intersection run on typed arrays via postings_ops.
+
+    Returns
+    -------
+    List[int]
+        Sorted docIDs containing every term; empty if any term is missing
+    """
+    postings_dict = index_mapper.postings_dict
+    if not term_ids or any(term_id not in postings_dict for term_id in term_ids):
+        return []
+    term_ids = sorted(set(term_ids), key=lambda term_id: postings_dict[term_id][1])
+    result = index_mapper.postings_array(term_ids[0])
+    for term_id in term_ids[1:]:
+        if not len(result):
+            break
+        result = postings_ops.intersect(result, index_mapper.postings_array(term_id))
+    return postings_ops.to_list(result)
+
+
+class BSBIIndex:
+    """
+    Attributes
+    ----------
+    term_id_map(IdMap): For mapping terms to termIDs
+    doc_id_map(IdMap): For mapping relative paths of documents (eg
+        0/3dradiology.stanford.edu_) to docIDs
+    data_dir(str): Path to data
+    output_dir(str): Path to output index files
+    index_name(str): Name assigned to index
+    postings_encoding: Encoding used for storing the postings.
+        The default (None) implies UncompressedPostings
+    tokenizer: Function splitting document and query text into terms.
+        The default (None) implies whitespace_tokenize
+    """
+    def __init__(self, data_dir, output_dir, index_name = "BSBI",
+                 postings_encoding = None, tokenizer = None):
+        self.term_id_map = IdMap()
+        self.doc_id_map = IdMap()
+        self.data_dir = data_dir
+        self.output_dir = output_dir
+        self.index_name = index_name
+        self.postings_encoding = postings_encoding
+        self.tokenizer = whitespace_tokenize if tokenizer is None else tokenizer
+
+        # Stores names of intermediate indices
+        self.intermediate_indices = []
+
+    def save(self):
+        """Dumps doc_id_map and term_id_map into output directory"""
+
+        with open(os.path.join(self.output_dir, 'terms.dict'), 'wb') as f:
+            pkl.dump(self.term_id_map, f)
+        with open(os.path.join(self.output_dir, 'docs.dict'), 'wb') as f:
+            pkl.dump(self.doc_id_map, f)
+
+    def load(self):
+        """Loads doc_id_map and term_id_map from output directory"""
+
+        with open(os.path.join(self.output_dir, 'terms.dict'), 'rb') as f:
+            self.term_id_map = load_pickle(f)
+        with open(os.path.join(self.output_dir, 'docs.dict'), 'rb') as f:
+            self.doc_id_map = load_pickle(f)
+
+    def query_term_ids(self, query):
+        """Maps query tokens to termIDs without registering unseen terms
+
+        `self.term_id_map[term]` would assign a new termID to an unseen term,
+        which makes long-running query processes grow the map without bound.
+
+        Returns
+        -------
+        List[int] or None
+            termIDs of the query tokens, or None if any token is not indexed
+        """
+        str_to_id = self.term_id_map.str_to_id
+        term_ids = []
+        for term in self.tokenizer(query):
+            term_id = str_to_id.get(term)
+            if term_id is None:
+                return None
+            term_ids.append(term_id)
+        return term_ids
+
+    def index(self):
+        """Base indexing code
+
+        This function loops through the data directories,
+        calls parse_block to parse the documents
+        calls invert_write, which inverts each block and writes to a new index
+        then saves the id maps and calls merge on the intermediate indices
+        """
+        for block_dir_relative in sorted(next(os.walk(self.data_dir))[1]):
+            td_pairs = self.parse_block(block_dir_relative)
+            self.write_block('index_'+block_dir_relative, td_pairs)
+            td_pairs = None
+        self.save()
+        self.merge_blocks()
+
+    def write_block(self, index_id, td_pairs):
+        """Inverts one block of td_pairs into the intermediate index `index_id`"""
+        self.intermediate_indices.append(index_id)
+        with InvertedIndexWriter(index_id, directory=self.output_dir,
+                                 postings_encoding=
+                                 self.postings_encoding) as index:
+            self.invert_write(td_pairs, index)
+
+    def merge_blocks(self):
+        """Merges all intermediate indices into the final index"""
+        with InvertedIndexWriter(self.index_name, directory=self.output_dir,
+                                 postings_encoding=
+                                 self.postings_encoding) as merged_index:
+            with contextlib.ExitStack() as stack:
+                indices = [stack.enter_context(
+                    InvertedIndexIterator(index_id,
+                                          directory=self.output_dir,
+                                          postings_encoding=
+                                          self.postings_encoding))
+                 for index_id in self.intermediate_indices]
+                self.merge(indices, merged_index)
+
+    def parse_block(self, block_dir_relative):
+        """Parses a tokenized text file into termID-docID pairs
+
+        Parameters
+        ----------
+        block_dir_relative : str
+            Relative Path to the directory that contains the files for the block
+
+        Returns
+        -------
+        List[Tuple[Int, Int]]
+            Returns all the td_pairs extracted from the block
+
+        Should use self.term_id_map and self.doc_id_map to get termIDs and docIDs.
+        These persist across calls to parse_block
+        """
+        # 保持相对路径结构确保跨平台兼容性
+        curr_dir = os.path.join(self.data_dir, block_dir_relative)
+
+        # 获取当前目录下的所有文件并排序
+        file_list = sorted(os.listdir(curr_dir))
+
+        td_pairs = []
+        for file_name in file_list:
+            # 保留目录结构信息作为文档标识
+            doc_id = self.doc_id_map[os.path.join(block_dir_relative, file_name)]  # 获取doc_id
+            with open(os.path.join(curr_dir, file_name), 'r') as f:
+                content = f.read()
+            file_words = self.tokenizer(content)
+            # 先收集当前文件的pair再整体extend
+            temp_list = []
+            for word in file_words:
+                temp = (self.term_id_map[word], doc_id)
+                temp_list.append(temp)
+            td_pairs.extend(temp_list)  # 将该文件的td_pairs加入到最终列表中
+        return td_pairs
+
+    def invert_write(self, td_pairs, index):
+        """Inverts td_pairs into postings_lists and writes them to the given index
+
+        Parameters
+        ----------
+        td_pairs: List[Tuple[Int, Int]]
+            List of termID-docID pairs
+        index: InvertedIndexWriter
+            Inverted index on disk corresponding to the block
+        """
+        # 将原始td_pairs转换为term->doclist的倒排结构
+        term_dict = {}
+
+        # 聚合处理
+        for term_id, doc_id in td_pairs:
+            # 使用集合实现自动去重
+            if term_id not in term_dict:
+                term_dict[term_id] = {doc_id}
+            else:
+                term_dict[term_id].add(doc_id)
+
+        # 排序写入
+        for term_id in sorted(term_dict.keys()):
+            # 对文档ID列表排序，有利于压缩算法的效率
+            sorted_postings = sorted(term_dict[term_id])
+            index.append(term_id, sorted_postings)
+
+    def merge(self, indices, merged_index):
+        """Merges multiple inverted indices into a single index
+
+        Parameters
+        ----------
+        indices: List[InvertedIndexIterator]
+            A list of InvertedIndexIterator objects, each representing an
+            iterable inverted index for a block
+        merged_index: InvertedIndexWriter
+            An instance of InvertedIndexWriter object into which each merged
+            postings list is written out one at a time
+        """
+        previous_term = None  # 用于存储上一个 term
+        postings_list = []  # 用于存储当前 term 的倒排列表
+
+        # 遍历合并的项目，每个项目是 (term, postings_list)
+        for term, doc_ids in heapq.merge(*indices, key=lambda x: x[0]):
+            if term == previous_term:
+                # 将当前文档 ID 列表扩展到当前的 postings_list 中，后续需要重新排序
+                postings_list.extend(doc_ids)
+            else:
+                # 如果遇到新的 term，先将之前的 term 和合并的 postings_list 写入索引
+                if previous_term is not None:
+                    merged_index.append(previous_term, sorted(postings_list))
+                previous_term = term  # 更新为新的 term
+                postings_list = list(doc_ids)  # 更新当前倒排列表
+
+        # 处理最后一个 term 的 postings_list
+        if previous_term is not None:
+            merged_index.append(previous_term, sorted(postings_list))
+
+    def retrieve(self, query):
+        """Retrieves the documents corresponding to the conjunctive query
+
+        Parameters
+        ----------
+        query: str
+            Space separated list of query tokens
+
+        Result
+        ------
+        List[str]
+            Sorted list of documents which contains each of the query tokens.
+            Should be empty if no documents are found.
+
+        Should NOT throw errors for terms not in corpus
+        """
+        if len(self.term_id_map) == 0 or len(self.doc_id_map) == 0:
+            self.load()
+
+        # 将查询字符串拆分为单个 token（与建索引时使用同一分词器）
+        query_terms = self.tokenizer(query)
+
+        # 使用 InvertedIndexMapper 加载索引
+        with InvertedIndexMapper(self.index_name, directory=self.output_dir,
+                                 postings_encoding=self.postings_encoding) as index_mapper:
+            # 获取所有 query_terms 的倒排列表
+            postings_lists = []
+            for term in query_terms:
+                try:
+                    postings_lists.append(index_mapper.postings_array(self.term_id_map[term]))
+                except KeyError:
+                    # 处理不存在的查询词：严格AND逻辑直接返回空
+                    return []
+
+        # 多列表交集：从最短的列表开始向量化求交，处理边界情况：空查询/零结果
+        result_doc_ids = postings_ops.to_list(postings_ops.intersect_many(postings_lists))
+
+        # 文档ID到路径的映射；docID 可能经过重排（bsbi_reorder.py），按路径排序保证输出稳定
+        result_docs = sorted(self.doc_id_map[doc_id] for doc_id in result_doc_ids)
+
+        # 返回原始文档路径列表
+        return result_docs
@@ -0,0 +1,195 @@
+"""BSBI 布尔检索的并行批量查询工具
+
+流式读取查询文件（每行一条），分块分发到多个工作进程执行；每个进程常驻一份
+打开的索引与 ID 映射。结果按输入顺序逐行写出为 JSONL，结束时汇报吞吐与延迟
+百分位。内存占用只与在途块数及延迟样本数有关，与查询文件大小无关。
+
+    python bsbi_batch.py queries.txt -o results.jsonl --index-dir output_dir_compressed --encoding compressed
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bsbi import POSTINGS_ENCODINGS, TOKENIZERS, BSBIIndex, InvertedIndexMapper, conjunctive_postings
+from bsbi_server import percentile
+from bsbi_store import IndexStore
+
+# 默认配置
+INDEX_DIR = 'output_dir'
+INDEX_NAME = 'BSBI'
+CHUNK_SIZE = 256  # 每个进程任务包含的查询数
+PROGRESS_EVERY = 10000  # 每处理多少条查询输出一次进度
+LATENCY_SAMPLES = 100000  # 计算延迟百分位时最多保留的样本数
+
+# ---------------------------------------------------------------------------
+# 工作进程：各自加载 ID 映射并常驻一个打开的 InvertedIndexMapper
+# ---------------------------------------------------------------------------
+_worker_engine = None
+_worker_mapper = None
+
+
+def _init_worker(index_dir, index_name, postings_encoding, tokenizer):
+    global _worker_engine, _worker_mapper
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_engine = BSBIIndex(data_dir=None, output_dir=index_dir,
+                               index_name=index_name,
+                               postings_encoding=postings_encoding,
+                               tokenizer=tokenizer)
+    _worker_engine.load()
+    _worker_mapper = InvertedIndexMapper(index_name, directory=index_dir,
+                                         postings_encoding=postings_encoding)
+    _worker_mapper.__enter__()
+
+
+def _run_chunk(chunk):
+    """执行一块查询，返回 [(JSONL 行, 耗时秒数)]，文档名映射也在工作进程中完成"""
+    doc_id_map = _worker_engine.doc_id_map
+    results = []
+    for line_no, query in chunk:
+        start = time.perf_counter()
+        term_ids = _worker_engine.query_term_ids(query)
+        doc_ids = conjunctive_postings(_worker_mapper, term_ids) if term_ids else []
+        docs = sorted(doc_id_map[doc_id] for doc_id in doc_ids)
+        elapsed = time.perf_counter() - start
+        results.append((json.dumps({'line': line_no, 'query': query, 'total': len(docs),
+                                    'docs': docs}, ensure_ascii=False), elapsed))
+    return results
+
+
+def read_chunks(f, chunk_size):
+    """逐行读取查询并切块，空行跳过但保留原始行号"""
+    queries = ((line_no, line.strip()) for line_no, line in enumerate(f, 1) if line.strip())
+    while True:
+        chunk = list(itertools.islice(queries, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class LatencyReservoir:
+    """固定容量的蓄水池抽样，查询再多也只保留 size 个延迟样本
+
+    Attributes
+    ----------
+    samples(List[float]): 均匀抽取的样本，总数不超过 size 时即全部延迟
+    count(int): 已记录的延迟总数
+    """
+    def __init__(self, size=LATENCY_SAMPLES, seed=0):
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.random = random.Random(seed)
+
+    def add(self, value):
+        self.count += 1
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            index = self.random.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+
+def run(args):
+    workers = args.workers or os.cpu_count() or 1
+    max_in_flight = workers * args.prefetch
+    latencies = LatencyReservoir()  # 每条查询的处理耗时（抽样）
+    done = 0
+
+    index_dir, encoding, tokenizer = args.index_dir, args.encoding, args.tokenizer
+    pin = None
+    if args.store:
+        # 整个批次固定同一个索引版本，期间发布的新版本不影响本次结果
+        pin = IndexStore(args.store).pin()
+        index_dir = pin.directory
+        encoding = pin.info.get('encoding', encoding)
+        tokenizer = pin.info.get('tokenizer', tokenizer)
+        print(f"使用索引版本 {pin.version}", file=sys.stderr)
+
+    query_file = sys.stdin if args.queries == '-' else open(args.queries, encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(index_dir, args.index_name,
+                                         POSTINGS_ENCODINGS[encoding],
+                                         TOKENIZERS[tokenizer]))
+    start = time.perf_counter()
+    try:
+        chunks = enumerate(read_chunks(query_file, args.chunk_size))
+        in_flight = {}   # future -> 块序号
+        finished = {}    # 块序号 -> 结果，等待前面的块写出；与在途块合计不超过 max_in_flight
+        next_to_write = 0
+        exhausted = False
+        while True:
+            # 在途与待写出的块数合计有上限：某一块很慢时后面的块也只能积压这么多，
+            # 读取速度受限于处理速度，内存不随文件增长
+            while not exhausted and len(in_flight) + len(finished) < max_in_flight:
+                try:
+                    seq, chunk = next(chunks)
+                except StopIteration:
+                    exhausted = True
+                    break
+                in_flight[pool.submit(_run_chunk, chunk)] = seq
+            if not in_flight:
+                break
+
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                finished[in_flight.pop(future)] = future.result()
+            # 按输入顺序写出已连续完成的块
+            while next_to_write in finished:
+                for line, elapsed in finished.pop(next_to_write):
+                    out.write(line + '\n')
+                    latencies.add(elapsed)
+                next_to_write += 1
+                before, done = done, latencies.count
+                if done // PROGRESS_EVERY != before // PROGRESS_EVERY:
+                    rate = done / (time.perf_counter() - start)
+                    print(f"已完成 {done} 条查询，{rate:.1f} 条/秒", file=sys.stderr)
+            out.flush()
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if pin is not None:
+            pin.release()
+        if query_file is not sys.stdin:
+            query_file.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies.samples)
+    print(f"\n查询数: {latencies.count}，工作进程: {workers}，用时 {elapsed:.2f}s", file=sys.stderr)
+    print(f"吞吐: {latencies.count / elapsed if elapsed else 0:.1f} 条/秒", file=sys.stderr)
+    print("单条查询延迟(ms): " + ', '.join(f'p{p}={percentile(ordered, p) * 1000:.3f}'
+                                     for p in (50, 90, 99, 99.9)), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BSBI 布尔检索并行批量查询')
+    parser.add_argument('queries', help="查询文件，每行一条；'-' 表示标准输入")
+    parser.add_argument('-o', '--output', default='-', help="JSONL 结果文件，默认标准输出")
+    parser.add_argument('--index-dir', default=INDEX_DIR, help='索引所在目录')
+    parser.add_argument('--index-name', default=INDEX_NAME)
+    parser.add_argument('--encoding', default='uncompressed', choices=POSTINGS_ENCODINGS,
+                        help='构建索引时使用的倒排列表编码')
+    parser.add_argument('--tokenizer', default='whitespace', choices=TOKENIZERS,
+                        help='构建索引时使用的分词器，南开新闻索引使用 cjk')
+    parser.add_argument('--store', default=None,
+                        help='版本化索引存储目录（bsbi_store.py），给定时忽略 --index-dir')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认为 CPU 核数')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--prefetch', type=int, default=4, help='每个工作进程的在途块数')
+    args = parser.parse_args()
+    try:
+        run(args)
+    except KeyboardInterrupt:
+        print("\n🛑 批量查询被中断，已输出的结果保持有序", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""用 BSBI 引擎索引爬虫抓取的南开新闻页面
+
+读取爬虫输出的 title2url.csv 与 pages/ 下的 HTML 文件，提取标题与正文，
+用中英混排二元组分词器（cjk_tokenize）切词后按固定文档数分块构建 BSBI 索引。
+文档以 URL 作为标识保存在 docs.dict 中。
+
+    python bsbi_nankai.py index --csv title2url.csv --pages pages --output-dir nankai_index
+    python bsbi_nankai.py search --output-dir nankai_index 南开大学 校庆
+    python bsbi_nankai.py index --store nankai_store   # 构建为新版本，查询服务自动切换
+"""
+import argparse
+import csv
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from bsbi import POSTINGS_ENCODINGS, BSBIIndex, CompressedPostings, cjk_tokenize
+from bsbi_store import IndexStore
+
+# 默认配置，与爬虫脚本的输出位置一致
+CSV_FILE = 'title2url.csv'
+HTML_DIR = 'pages'
+OUTPUT_DIR = 'nankai_index'
+BLOCK_SIZE = 5000  # 每个块包含的文档数，决定构建时的内存占用
+
+
+def html_to_text(html):
+    """提取页面可见文本，处理方式与 构建索引.py 的 parse_html 相同"""
+    soup = BeautifulSoup(html, 'html.parser')
+    # 移除脚本和样式标签
+    for script in soup(["script", "style"]):
+        script.extract()
+    return soup.get_text(separator=' ')
+
+
+def read_manifest(csv_file):
+    """读取 title2url.csv，按 URL 去重并排序后返回 [(title, url, filename)]
+
+    按 URL 排序使同栏目、同日期的文档获得相邻的 docID，gap 更小。
+    """
+    rows = {}
+    with open(csv_file, 'r', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader)  # 跳过标题行
+        for row in reader:
+            if len(row) >= 3:
+                title, url, filename = row[:3]
+                rows.setdefault(url, (title, url, filename))
+    return [rows[url] for url in sorted(rows)]
+
+
+class NankaiBSBIIndex(BSBIIndex):
+    """以爬虫清单而非子目录作为文档来源的 BSBIIndex
+
+    Attributes
+    ----------
+    csv_file(str): 爬虫输出的 title2url.csv
+    block_size(int): 每个块包含的文档数
+    (其余属性同 BSBIIndex，data_dir 为 HTML 文件目录)
+    """
+    def __init__(self, csv_file, html_dir, output_dir, index_name="BSBI",
+                 postings_encoding=CompressedPostings, block_size=BLOCK_SIZE):
+        super().__init__(data_dir=html_dir, output_dir=output_dir,
+                         index_name=index_name, postings_encoding=postings_encoding,
+                         tokenizer=cjk_tokenize)
+        self.csv_file = csv_file
+        self.block_size = block_size
+        self.missing = 0
+
+    def index(self):
+        """按清单顺序每 block_size 篇文档为一块，解析、倒排写出后合并"""
+        manifest = read_manifest(self.csv_file)
+        for block_no, start in enumerate(range(0, len(manifest), self.block_size)):
+            td_pairs = self.parse_block(manifest[start:start + self.block_size])
+            self.write_block(f'index_{block_no}', td_pairs)
+            td_pairs = None
+            print(f"已解析 {min(start + self.block_size, len(manifest))}/{len(manifest)} 篇文档")
+        self.save()
+        self.merge_blocks()
+
+    def parse_block(self, rows):
+        """解析一块清单记录为 termID-docID 对
+
+        Parameters
+        ----------
+        rows : List[Tuple[str, str, str]]
+            (title, url, filename) 记录
+
+        Returns
+        -------
+        List[Tuple[Int, Int]]
+            Returns all the td_pairs extracted from the block
+        """
+        td_pairs = []
+        for title, url, filename in rows:
+            html_file = os.path.join(self.data_dir, filename)
+            if not os.path.exists(html_file):
+                self.missing += 1
+                continue
+            with open(html_file, 'r', encoding='utf-8', errors='replace') as f:
+                text = html_to_text(f.read())
+            doc_id = self.doc_id_map[url]
+            # 标题与正文一起参与索引
+            td_pairs.extend((self.term_id_map[term], doc_id)
+                            for term in self.tokenizer(title + ' ' + text))
+        return td_pairs
+
+
+def build(engine):
+    engine.index()
+    # 中间块索引只在合并时使用
+    for index_id in engine.intermediate_indices:
+        os.remove(os.path.join(engine.output_dir, index_id + '.index'))
+        os.remove(os.path.join(engine.output_dir, index_id + '.dict'))
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)
+               if os.path.isfile(os.path.join(path, name)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用 BSBI 引擎索引南开新闻页面')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_index = sub.add_parser('index', help='构建索引')
+    p_index.add_argument('--csv', default=CSV_FILE, help='爬虫输出的 title2url.csv')
+    p_index.add_argument('--pages', default=HTML_DIR, help='爬虫保存的 HTML 目录')
+    p_index.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    p_index.add_argument('--store', default=None,
+                         help='版本化索引存储目录，给定时构建为新版本并发布，忽略 --output-dir')
+
+    p_search = sub.add_parser('search', help='布尔与查询')
+    p_search.add_argument('query', nargs='+')
+    p_search.set_defaults(csv=CSV_FILE, pages=HTML_DIR, block_size=BLOCK_SIZE)
+
+    for p in (p_index, p_search):
+        p.add_argument('--output-dir', default=OUTPUT_DIR, help='索引输出目录')
+        p.add_argument('--encoding', default='compressed', choices=POSTINGS_ENCODINGS)
+    args = parser.parse_args()
+
+    engine = NankaiBSBIIndex(args.csv, args.pages, args.output_dir,
+                             postings_encoding=POSTINGS_ENCODINGS[args.encoding],
+                             block_size=args.block_size)
+    if args.command == 'index':
+        start = time.perf_counter()
+        if args.store:
+            store = IndexStore(args.store)
+            with store.build(encoding=args.encoding, tokenizer='cjk') as output_dir:
+                engine.output_dir = output_dir
+                build(engine)
+            print(f"已发布版本 {store.current()}")
+        else:
+            os.makedirs(args.output_dir, exist_ok=True)
+            build(engine)
+        print(f"\n✅ 索引构建完成，用时 {time.perf_counter() - start:.1f}s")
+        print(f"文档数: {len(engine.doc_id_map)}，词项数: {len(engine.term_id_map)}，"
+              f"缺失 HTML 文件: {engine.missing}")
+        print(f"索引目录大小: {directory_size(engine.output_dir) / 1024 / 1024:.1f} MB")
+    else:
+        results = engine.retrieve(' '.join(args.query))
+        print(f"查询到 {len(results)} 条结果")
+        for url in results[:50]:
+            print(url)
+
+
+if __name__ == '__main__':
+    main()
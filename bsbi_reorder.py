@@ -0,0 +1,197 @@
+"""BSBI 索引构建完成后的 docID 重分配
+
+docID 默认按 parse_block 遍历文件的顺序分配。本工具按 URL（反转主机名 + 路径）
+或按内容相似度（MinHash 签名排序）重新排列文档，使相似文档获得相邻的 docID，
+然后重写合并后的倒排索引与 docs.dict。相邻 docID 带来更小的 gap，
+CompressedPostings 的 VB 编码字节数随之减少，求交时连续命中的区间也更长。
+
+只重写最终索引（index_name），各块的中间索引 index_* 不做修改，重建索引前应删除。
+使用版本化存储（bsbi_store.py）时，重排结果写入新版本目录并整体发布，查询服务看到的
+始终是一致的倒排列表与 docs.dict。
+
+    python bsbi_reorder.py --index-dir output_dir_compressed --encoding compressed --strategy url
+    python bsbi_reorder.py --store index_store --strategy minhash
+"""
+import argparse
+import array
+import os
+import pickle
+import re
+import shutil
+from urllib.parse import urlsplit
+
+from bsbi import (POSTINGS_ENCODINGS, BSBIIndex, IdMap, InvertedIndexMapper,
+                  InvertedIndexWriter)
+from bsbi_store import IndexStore
+
+# MinHash 参数
+MINHASH_PRIME = (1 << 31) - 1
+MINHASH_SEEDS = [(0x5bd1e995, 0x1b873593), (0x27d4eb2f, 0x165667b1),
+                 (0x61c88647, 0x7f4a7c15), (0x2545f491, 0x4f6cdd1d)]
+MIN_DF = 2            # 只出现在一篇文档中的词不提供相似度信息
+MAX_DF_RATIO = 0.1    # 过于常见的词（停用词）同样跳过
+
+
+def url_sort_key(doc_name):
+    """按 (反转主机名, 路径) 排序，同站点、同目录的文档相邻
+
+    pa1-data 的文档名形如 `0/3dradiology.stanford.edu_`（URL 中的 '/' 被替换为 '_'），
+    爬虫得到的南开文档名则直接是 URL。
+    """
+    if '://' in doc_name:
+        parts = urlsplit(doc_name)
+        host, path = parts.hostname or '', parts.path + '?' + parts.query
+    else:
+        # 去掉块目录前缀，兼容 Windows 下构建时保存的反斜杠路径
+        name = re.split(r'[\\/]', doc_name)[-1]
+        host, _, path = name.partition('_')
+    return '.'.join(reversed(host.split('.'))), path
+
+
+def order_by_url(doc_id_map):
+    """返回按 URL 排序后的旧 docID 列表"""
+    return sorted(range(len(doc_id_map)), key=lambda doc_id: url_sort_key(doc_id_map[doc_id]))
+
+
+def read_postings(engine):
+    """按写入顺序逐个产出 (termID, 倒排列表)
+
+    用只读的 InvertedIndexMapper 读取：InvertedIndexIterator 退出时会重写 .dict，
+    而源索引可能是其他读者正在使用的已发布版本，不能修改。
+    """
+    with InvertedIndexMapper(engine.index_name, directory=engine.output_dir,
+                             postings_encoding=engine.postings_encoding) as mapper:
+        for term in mapper.terms:
+            yield term, mapper[term]
+
+
+def postings_bytes(engine):
+    """源索引倒排列表的总字节数"""
+    with InvertedIndexMapper(engine.index_name, directory=engine.output_dir,
+                             postings_encoding=engine.postings_encoding) as mapper:
+        return sum(length for _, _, length in mapper.postings_dict.values())
+
+
+def order_by_minhash(engine):
+    """按 MinHash 签名排序，签名相同（词集合相近）的文档聚在一起
+
+    签名直接从倒排索引流式计算，不需要重新读取原始文档：对每个词的每个哈希函数，
+    把其哈希值与倒排列表中每篇文档当前的最小值比较。
+    """
+    num_docs = len(engine.doc_id_map)
+    no_hash = MINHASH_PRIME
+    signatures = [array.array('L', [no_hash]) * num_docs for _ in MINHASH_SEEDS]
+    max_df = max(MIN_DF, int(num_docs * MAX_DF_RATIO))
+
+    for term, postings_list in read_postings(engine):
+        if not MIN_DF <= len(postings_list) <= max_df:
+            continue
+        for signature, (a, b) in zip(signatures, MINHASH_SEEDS):
+            h = (a * term + b) % MINHASH_PRIME
+            for doc_id in postings_list:
+                if h < signature[doc_id]:
+                    signature[doc_id] = h
+
+    # 签名相同时再按 URL 排序，保持同站点文档相邻
+    return sorted(range(num_docs),
+                  key=lambda doc_id: (tuple(signature[doc_id] for signature in signatures),
+                                      url_sort_key(engine.doc_id_map[doc_id])))
+
+
+def reorder_index(engine, new_order, output_dir=None):
+    """按 new_order（新 docID -> 旧 docID）重写倒排索引与 doc_id_map
+
+    output_dir 非空时把完整的新索引（倒排索引、terms.dict、docs.dict）写入该目录，
+    原索引不变，由调用方整体发布（见 bsbi_store）。为空时原地替换：新文件先以临时名
+    写在原目录中，全部写完后再依次改名，docs.dict 最后替换。几次改名之间仍有很短的
+    窗口，此时打开索引的读者可能看到新的倒排列表与旧的 docs.dict；需要原子切换时使用
+    版本化存储。
+
+    Parameters
+    ----------
+    engine: BSBIIndex
+        已 load() 的索引
+    new_order: List[int]
+        旧 docID 的排列，new_order[i] 是新 docID i 对应的旧 docID
+    output_dir: str
+        新索引的目录，为空时原地替换
+
+    Returns
+    -------
+    Tuple[int, int]
+        重写前后倒排列表的总字节数
+    """
+    num_docs = len(engine.doc_id_map)
+    if sorted(new_order) != list(range(num_docs)):
+        raise ValueError("new_order must be a permutation of all docIDs")
+    old_to_new = array.array('L', [0]) * num_docs
+    for new_id, old_id in enumerate(new_order):
+        old_to_new[old_id] = new_id
+
+    in_place = output_dir is None
+    target_dir = engine.output_dir if in_place else output_dir
+    new_name = engine.index_name + '.reorder' if in_place else engine.index_name
+    bytes_before = postings_bytes(engine)
+    with InvertedIndexWriter(new_name, directory=target_dir,
+                             postings_encoding=engine.postings_encoding) as writer:
+        for term, postings_list in read_postings(engine):
+            writer.append(term, sorted(old_to_new[doc_id] for doc_id in postings_list))
+        bytes_after = sum(length for _, _, length in writer.postings_dict.values())
+
+    new_doc_id_map = IdMap()
+    new_doc_id_map.id_to_str = [engine.doc_id_map[old_id] for old_id in new_order]
+    new_doc_id_map.str_to_id = {doc: doc_id for doc_id, doc in enumerate(new_doc_id_map.id_to_str)}
+    docs_path = os.path.join(target_dir, 'docs.dict.reorder' if in_place else 'docs.dict')
+    with open(docs_path, 'wb') as f:
+        pickle.dump(new_doc_id_map, f)
+        f.flush()
+        os.fsync(f.fileno())
+
+    if in_place:
+        # termID 不变，terms.dict 无需重写；docs.dict 最后替换
+        for ext in ('.index', '.dict'):
+            os.replace(os.path.join(target_dir, new_name + ext),
+                       os.path.join(target_dir, engine.index_name + ext))
+        os.replace(docs_path, os.path.join(target_dir, 'docs.dict'))
+        engine.doc_id_map = new_doc_id_map
+    else:
+        shutil.copy2(os.path.join(engine.output_dir, 'terms.dict'), os.path.join(target_dir, 'terms.dict'))
+    return bytes_before, bytes_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BSBI 索引 docID 重分配')
+    parser.add_argument('--index-dir', default='output_dir', help='索引所在目录')
+    parser.add_argument('--index-name', default='BSBI')
+    parser.add_argument('--encoding', default='uncompressed', choices=POSTINGS_ENCODINGS,
+                        help='构建索引时使用的倒排列表编码')
+    parser.add_argument('--strategy', default='url', choices=('url', 'minhash'),
+                        help='url：按主机名与路径排序；minhash：按内容相似度聚类')
+    parser.add_argument('--store', default=None,
+                        help='版本化存储根目录：重排当前版本并作为新版本发布（忽略 --index-dir 与 --encoding）')
+    args = parser.parse_args()
+
+    def load(directory, encoding):
+        engine = BSBIIndex(data_dir=None, output_dir=directory, index_name=args.index_name,
+                           postings_encoding=POSTINGS_ENCODINGS[encoding])
+        engine.load()
+        if args.strategy == 'url':
+            return engine, order_by_url(engine.doc_id_map)
+        return engine, order_by_minhash(engine)
+
+    if args.store:
+        store = IndexStore(args.store)
+        with store.pin() as pin:
+            engine, new_order = load(pin.directory, pin.info.get('encoding', args.encoding))
+            with store.build(**dict(pin.info, reorder=args.strategy)) as output_dir:
+                before, after = reorder_index(engine, new_order, output_dir)
+        print(f"已发布版本 {store.current()}（基于 {pin.version}）")
+    else:
+        engine, new_order = load(args.index_dir, args.encoding)
+        before, after = reorder_index(engine, new_order)
+    print(f"✅ 已按 {args.strategy} 重排 {len(new_order)} 篇文档")
+    print(f"倒排列表字节数: {before} -> {after} ({(after - before) / before * 100 if before else 0:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,480 @@
+"""BSBI 布尔检索的本地 HTTP 查询服务
+
+启动后常驻已打开的倒排索引、term/doc ID 映射与解码器，基于 asyncio 并发处理
+请求，倒排列表的读取、解码与求交放到进程池中执行。
+
+    python bsbi_server.py serve --index-dir output_dir --encoding compressed
+    python bsbi_server.py serve --store index_store   # 跟随 bsbi_store.py 发布的新版本
+    python bsbi_server.py bench --queries dev_queries --concurrency 32
+
+接口：
+    GET  /ready               索引加载完成且进程池预热后返回 200，否则 503
+    GET  /search?q=...&limit= 布尔联合查询
+    POST /batch               {"queries": [...], "limit": n} 批量查询
+    GET  /stats               服务端计数
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from bsbi import POSTINGS_ENCODINGS, TOKENIZERS, BSBIIndex, InvertedIndexMapper, conjunctive_postings
+from bsbi_store import IndexStore
+
+# 默认配置
+HOST = '127.0.0.1'
+PORT = 8765
+INDEX_DIR = 'output_dir'
+INDEX_NAME = 'BSBI'
+MAX_BODY_BYTES = 16 * 1024 * 1024  # 单个请求体上限
+BATCH_CHUNK_SIZE = 64  # 批量查询时每个进程任务包含的查询数
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+                405: 'Method Not Allowed', 413: 'Payload Too Large',
+                500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+# ---------------------------------------------------------------------------
+# 进程池中的工作函数：每个工作进程各自常驻一个打开的 InvertedIndexMapper
+# ---------------------------------------------------------------------------
+_worker_mapper = None
+
+
+def _init_worker(index_name, directory, postings_encoding):
+    """进程池初始化：打开索引文件并载入 postings_dict，进程退出前一直保持打开"""
+    global _worker_mapper
+    # 忽略 Ctrl+C，由主进程统一负责关闭进程池
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_mapper = InvertedIndexMapper(index_name, directory=directory,
+                                         postings_encoding=postings_encoding)
+    _worker_mapper.__enter__()
+
+
+def _worker_ping(_):
+    return os.getpid()
+
+
+def _worker_conjunctive_batch(batch):
+    """批量执行布尔与查询，减少进程间通信次数"""
+    return [conjunctive_postings(_worker_mapper, term_ids) for term_ids in batch]
+
+
+# ---------------------------------------------------------------------------
+# 服务端
+# ---------------------------------------------------------------------------
+class QueryService:
+    """常驻索引的查询服务
+
+    Attributes
+    ----------
+    engine(BSBIIndex): 持有 term_id_map 与 doc_id_map
+    pool(ProcessPoolExecutor): 执行解码与求交的进程池
+    store(IndexStore): 版本化索引存储；给定时固定其当前版本，并在新版本发布后切换
+    pin(Pin): 当前使用的版本
+    ready(bool): 索引是否已加载完毕、可以对外服务
+    users(Counter): 进程池 -> 正在使用它的请求数
+    retiring(Dict[ProcessPoolExecutor, Pin]): 已被新版本替换、等在途请求结束后关闭的进程池
+    """
+    def __init__(self, index_dir, index_name=INDEX_NAME, postings_encoding=None,
+                 workers=None, tokenizer=None, store=None):
+        self.engine = BSBIIndex(data_dir=None, output_dir=index_dir,
+                                index_name=index_name,
+                                postings_encoding=postings_encoding,
+                                tokenizer=tokenizer)
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+        self.store = store
+        self.pin = None
+        self.ready = False
+        # reload 在后台线程中替换版本，与请求对进程池的获取、归还用同一把锁
+        self.lock = threading.Lock()
+        self.users = Counter()
+        self.retiring = {}
+        self.started_at = time.time()
+        self.stats = {'requests': 0, 'queries': 0, 'errors': 0, 'in_flight': 0,
+                      'reloads': 0}
+
+    def _open(self, engine):
+        """加载 ID 映射并启动、预热进程池（阻塞，在线程中调用）"""
+        engine.load()
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(engine.index_name, engine.output_dir,
+                      engine.postings_encoding))
+        # 预先拉起工作进程并完成初始化，避免首批请求承担打开索引的开销
+        list(pool.map(_worker_ping, [None] * self.workers))
+        return pool
+
+    def _engine_for(self, pin):
+        """按版本发布时记录的参数创建 BSBIIndex"""
+        return BSBIIndex(data_dir=None, output_dir=pin.directory,
+                         index_name=self.engine.index_name,
+                         postings_encoding=POSTINGS_ENCODINGS.get(
+                             pin.info.get('encoding'), self.engine.postings_encoding),
+                         tokenizer=TOKENIZERS.get(pin.info.get('tokenizer'),
+                                                  self.engine.tokenizer))
+
+    def load(self):
+        if self.store is not None:
+            self.pin = self.store.pin()
+            self.engine = self._engine_for(self.pin)
+        self.pool = self._open(self.engine)
+
+    def reload(self):
+        """切换到存储中新发布的版本：新进程池就绪后再替换；旧进程池等使用它的请求
+        全部结束后才关闭，这些请求照常完成"""
+        pin = self.store.pin()
+        if pin.version == self.pin.version:
+            pin.release()
+            return False
+        engine = self._engine_for(pin)
+        try:
+            pool = self._open(engine)
+        except BaseException:
+            pin.release()
+            raise
+        with self.lock:
+            old_pool, old_pin = self.pool, self.pin
+            self.engine, self.pool, self.pin = engine, pool, pin
+            self.stats['reloads'] += 1
+            idle = not self.users[old_pool]
+            if idle:
+                del self.users[old_pool]
+            else:
+                self.retiring[old_pool] = old_pin
+        if idle:
+            self._retire(old_pool, old_pin)
+        return True
+
+    def _retire(self, pool, pin):
+        """关闭已无请求使用的旧进程池，释放其版本并清理存储（阻塞，在线程中调用）"""
+        try:
+            pool.shutdown(wait=True)
+            pin.release()
+            self.store.gc()
+        except Exception as e:
+            print(f"⚠️ 关闭旧版本 {pin.version} 失败: {e}")
+
+    def acquire(self):
+        """取得当前版本的映射与进程池，用完后须以 release(pool) 归还"""
+        with self.lock:
+            self.users[self.pool] += 1
+            return self.engine, self.pool
+
+    def release(self, pool):
+        """归还进程池；它已被替换且不再有请求使用时，在后台线程中关闭"""
+        with self.lock:
+            self.users[pool] -= 1
+            if self.users[pool] or pool not in self.retiring:
+                return
+            del self.users[pool]
+            pin = self.retiring.pop(pool)
+        asyncio.get_running_loop().run_in_executor(None, self._retire, pool, pin)
+
+    def close(self):
+        with self.lock:
+            retiring, self.retiring = self.retiring, {}
+        for pool, pin in retiring.items():
+            pool.shutdown(cancel_futures=True)
+            pin.release()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        if self.pin is not None:
+            self.pin.release()
+
+    @staticmethod
+    def format_result(engine, query, doc_ids, limit):
+        # 与 BSBIIndex.retrieve 一致按文档路径排序，不受 docID 重排影响
+        docs = sorted(engine.doc_id_map[doc_id] for doc_id in doc_ids)
+        return {'query': query, 'total': len(docs),
+                'docs': docs if limit is None else docs[:limit]}
+
+    async def search_many(self, queries, limit=None):
+        """并发执行多个查询：按块分发到进程池，结果保持输入顺序"""
+        loop = asyncio.get_running_loop()
+        # 整个请求使用同一版本的映射与进程池，期间发生切换也不会混用；
+        # 请求结束前该进程池不会被关闭
+        engine, pool = self.acquire()
+        try:
+            parsed = [engine.query_term_ids(query) for query in queries]
+            # 含未登录词的查询直接判空，不占用进程池
+            pending = [ids for ids in parsed if ids]
+            chunks = [pending[i:i + BATCH_CHUNK_SIZE]
+                      for i in range(0, len(pending), BATCH_CHUNK_SIZE)]
+            chunk_results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _worker_conjunctive_batch, chunk)
+                for chunk in chunks))
+        finally:
+            self.release(pool)
+        answers = iter(doc_ids for chunk in chunk_results for doc_ids in chunk)
+        self.stats['queries'] += len(queries)
+        return [self.format_result(engine, query, next(answers) if ids else [], limit)
+                for query, ids in zip(queries, parsed)]
+
+    async def dispatch(self, method, target, body):
+        """路由请求，返回 (状态码, JSON 对象)"""
+        url = urlsplit(target)
+        params = parse_qs(url.query)
+
+        if url.path == '/ready':
+            if self.ready:
+                return 200, {'ready': True, 'terms': len(self.engine.term_id_map),
+                             'docs': len(self.engine.doc_id_map),
+                             'workers': self.workers,
+                             'version': self.pin.version if self.pin else None}
+            return 503, {'ready': False}
+
+        if url.path == '/stats':
+            return 200, dict(self.stats, uptime=round(time.time() - self.started_at, 3))
+
+        if url.path not in ('/search', '/batch'):
+            return 404, {'error': f'unknown path {url.path}'}
+        if not self.ready:
+            return 503, {'error': 'index is loading'}
+
+        start = time.perf_counter()
+        if url.path == '/search':
+            if method != 'GET':
+                return 405, {'error': 'use GET /search?q=...'}
+            query = params.get('q', [''])[0]
+            try:
+                limit = int(params['limit'][0]) if 'limit' in params else None
+            except ValueError:
+                limit = -1
+            if limit is not None and limit < 0:
+                return 400, {'error': '"limit" must be a non-negative integer'}
+            [result] = await self.search_many([query], limit)
+        else:
+            if method != 'POST':
+                return 405, {'error': 'use POST /batch'}
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError as e:
+                return 400, {'error': f'invalid JSON body: {e}'}
+            if not isinstance(payload, dict):
+                return 400, {'error': 'body must be a JSON object'}
+            queries = payload.get('queries')
+            if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+                return 400, {'error': '"queries" must be a list of strings'}
+            limit = payload.get('limit')
+            # bool 是 int 的子类，true/false 不算合法的 limit
+            if limit is not None and (not isinstance(limit, int) or isinstance(limit, bool) or limit < 0):
+                return 400, {'error': '"limit" must be a non-negative integer'}
+            results = await self.search_many(queries, limit)
+            result = {'results': results}
+        result['took_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return 200, result
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 连接处理，支持 keep-alive 以便压测时复用连接"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self.respond(writer, 400, {'error': 'malformed request line'}, False)
+                    break
+                method, target, version = parts
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = headers.get('content-length', '0')
+                if not length.isascii() or not length.isdigit():
+                    await self.respond(writer, 400, {'error': 'invalid Content-Length'}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_BYTES:
+                    await self.respond(writer, 413, {'error': 'request body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = (connection != 'close' if version == 'HTTP/1.1'
+                              else connection == 'keep-alive')
+
+                self.stats['requests'] += 1
+                self.stats['in_flight'] += 1
+                try:
+                    status, payload = await self.dispatch(method, target, body)
+                except Exception as e:
+                    # dispatch 自行校验参数并返回 400，到这里的都是服务端错误
+                    self.stats['errors'] += 1
+                    status, payload = 500, {'error': repr(e)}
+                finally:
+                    self.stats['in_flight'] -= 1
+
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def respond(writer, status, payload, keep_alive):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        head = (f'HTTP/1.1 {status} {HTTP_REASONS.get(status, "")}\r\n'
+                f'Content-Type: application/json; charset=utf-8\r\n'
+                f'Content-Length: {len(data)}\r\n'
+                f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+
+async def watch_store(service, interval):
+    """定期检查存储清单，发现新发布的版本后在后台线程中切换"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        if service.store.current() == service.pin.version:
+            continue
+        try:
+            if await loop.run_in_executor(None, service.reload):
+                print(f"🔄 已切换到索引版本 {service.pin.version}")
+        except Exception as e:
+            print(f"⚠️ 切换索引版本失败，继续使用 {service.pin.version}: {e}")
+
+
+async def serve(args):
+    store = IndexStore(args.store) if args.store else None
+    service = QueryService(args.index_dir, args.index_name,
+                           POSTINGS_ENCODINGS[args.encoding], args.workers,
+                           TOKENIZERS[args.tokenizer], store)
+    server = await asyncio.start_server(service.handle_connection,
+                                        args.host, args.port, backlog=1024)
+    print(f"🚀 查询服务已监听 http://{args.host}:{args.port}，"
+          f"正在加载索引 {args.store or args.index_dir}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # 监听先于加载启动，加载期间 /ready 返回 503
+    start = time.perf_counter()
+    await loop.run_in_executor(None, service.load)
+    service.ready = True
+    print(f"✅ 索引加载完成，用时 {time.perf_counter() - start:.2f}s，"
+          f"{len(service.engine.term_id_map)} 个词项，{len(service.engine.doc_id_map)} 篇文档，"
+          f"{service.workers} 个工作进程" + (f"，版本 {service.pin.version}" if service.pin else ""))
+
+    watcher = asyncio.create_task(watch_store(service, args.reload_interval)) if store else None
+    async with server:
+        await stop.wait()
+    if watcher is not None:
+        watcher.cancel()
+    service.close()
+    print("🛑 查询服务已停止")
+
+
+# ---------------------------------------------------------------------------
+# 压测客户端：多条 keep-alive 连接并发发送 /search 请求
+# ---------------------------------------------------------------------------
+def read_queries(path):
+    """读取查询：目录（如 dev_queries）中每个文件一条，或文本文件中每行一条"""
+    if os.path.isdir(path):
+        queries = []
+        for name in sorted(os.listdir(path)):
+            with open(os.path.join(path, name)) as f:
+                queries.append(f.read().strip())
+        return queries
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def percentile(sorted_values, p):
+    """最近秩法百分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values), max(1, math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+async def _bench_connection(host, port, targets, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while targets:
+            target = targets.pop()
+            start = time.perf_counter()
+            writer.write(f'GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode('latin-1'))
+            await writer.drain()
+            await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+
+async def bench(args):
+    from urllib.parse import quote
+    queries = read_queries(args.queries)
+    limit = f'&limit={args.limit}' if args.limit is not None else ''
+    targets = [f'/search?q={quote(q)}{limit}' for q in queries] * args.repeat
+    total = len(targets)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_bench_connection(args.host, args.port, targets, latencies)
+                           for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"请求数: {total}，并发连接: {args.concurrency}，用时 {elapsed:.2f}s")
+    print(f"吞吐: {total / elapsed:.1f} req/s")
+    print("延迟(ms): " + ', '.join(f'p{p}={percentile(latencies, p) * 1000:.2f}'
+                                   for p in (50, 90, 99, 99.9)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BSBI 布尔检索 HTTP 查询服务')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help='启动查询服务')
+    p_serve.add_argument('--host', default=HOST)
+    p_serve.add_argument('--port', type=int, default=PORT)
+    p_serve.add_argument('--index-dir', default=INDEX_DIR, help='索引所在目录')
+    p_serve.add_argument('--index-name', default=INDEX_NAME)
+    p_serve.add_argument('--encoding', default='uncompressed', choices=POSTINGS_ENCODINGS,
+                         help='构建索引时使用的倒排列表编码')
+    p_serve.add_argument('--tokenizer', default='whitespace', choices=TOKENIZERS,
+                         help='构建索引时使用的分词器，南开新闻索引使用 cjk')
+    p_serve.add_argument('--workers', type=int, default=None, help='解码进程数，默认为 CPU 核数')
+    p_serve.add_argument('--store', default=None,
+                         help='版本化索引存储目录（bsbi_store.py），给定时忽略 --index-dir 并自动切换新版本')
+    p_serve.add_argument('--reload-interval', type=float, default=2.0, help='检查新版本的间隔秒数')
+
+    p_bench = sub.add_parser('bench', help='对运行中的服务压测')
+    p_bench.add_argument('--host', default=HOST)
+    p_bench.add_argument('--port', type=int, default=PORT)
+    p_bench.add_argument('--queries', default='dev_queries', help='查询目录或每行一条查询的文件')
+    p_bench.add_argument('--concurrency', type=int, default=16)
+    p_bench.add_argument('--repeat', type=int, default=100, help='查询集重复次数')
+    p_bench.add_argument('--limit', type=int, default=None, help='每个查询返回的文档数上限')
+
+    args = parser.parse_args()
+    asyncio.run(serve(args) if args.command == 'serve' else bench(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""BSBI 索引的版本化存储：重建与查询互不干扰
+
+每次构建写入新的版本目录，完成后原子替换清单文件 MANIFEST.json 发布：
+
+    index_store/
+        MANIFEST.json          {"current": "v000003", ...}
+        versions/v000002/      BSBI.index BSBI.dict terms.dict docs.dict .pins/
+        versions/v000003/
+
+读者通过 pin() 固定一个版本，在 .pins/ 下登记，用完释放；被替换且无人固定的旧版本
+由 gc() 删除。这样正在合并的新索引不会被读者看到，读者打开的旧文件也不会被覆盖。
+
+    python bsbi_store.py build --store index_store --data-dir pa1-data --encoding compressed
+    python bsbi_store.py status --store index_store
+    python bsbi_store.py gc --store index_store
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from bsbi import POSTINGS_ENCODINGS, TOKENIZERS, BSBIIndex
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+MANIFEST = 'MANIFEST.json'
+VERSIONS_DIR = 'versions'
+PINS_DIR = '.pins'
+BUILDING_MARKER = '.building'
+
+
+def _pid_alive(pid):
+    """判断登记 pin 的进程是否仍在运行；Windows 下无法安全探测，保守地视为存活"""
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Pin:
+    """一次对某个索引版本的固定，作为上下文管理器使用时退出即释放
+
+    Attributes
+    ----------
+    version(str): 版本名，如 v000003
+    directory(str): 版本目录，可直接作为 BSBIIndex 的 output_dir
+    info(dict): 发布时记录的构建参数（encoding、tokenizer 等）
+    """
+    def __init__(self, version, directory, pin_path, info):
+        self.version = version
+        self.directory = directory
+        self.pin_path = pin_path
+        self.info = info
+
+    def release(self):
+        if self.pin_path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.pin_path)
+            self.pin_path = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_value, traceback):
+        self.release()
+
+
+class IndexStore:
+    """版本化的索引目录
+
+    Attributes
+    ----------
+    root(str): 存储根目录
+    retain(int): gc 时除当前版本外额外保留的最近版本数（便于回滚）
+    """
+    def __init__(self, root, retain=0):
+        self.root = root
+        self.retain = retain
+        self.versions_root = os.path.join(root, VERSIONS_DIR)
+        os.makedirs(self.versions_root, exist_ok=True)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """跨进程互斥：保护“读清单 + 登记 pin”与“检查 pin + 删除版本”两组操作"""
+        with open(os.path.join(self.root, '.lock'), 'a+b') as f:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if os.name == 'nt':
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+                else:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def manifest(self):
+        try:
+            with open(os.path.join(self.root, MANIFEST), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def current(self):
+        """当前发布的版本名，尚未发布过则为 None"""
+        return self.manifest().get('current')
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_root, version)
+
+    def versions(self):
+        return sorted(name for name in os.listdir(self.versions_root) if name.startswith('v'))
+
+    def create_version(self):
+        """分配一个新的空版本目录，返回 (版本名, 目录)"""
+        existing = self.versions()
+        number = int(existing[-1][1:]) + 1 if existing else 1
+        while True:
+            version = f'v{number:06d}'
+            directory = self.version_dir(version)
+            try:
+                os.makedirs(directory)
+                break
+            except FileExistsError:
+                number += 1  # 另一个构建进程抢先占用了这个编号
+        os.makedirs(os.path.join(directory, PINS_DIR))
+        with open(os.path.join(directory, BUILDING_MARKER), 'w') as f:
+            f.write(str(os.getpid()))
+        return version, directory
+
+    def publish(self, version, **info):
+        """原子地将 version 设为当前版本，随后回收旧版本
+
+        读清单、比较与替换在同一把锁内完成；两个构建进程同时发布时，较早分配的版本
+        晚于较新的版本发布会被拒绝（ValueError），当前版本始终是最新的。
+        """
+        directory = self.version_dir(version)
+        with open(os.path.join(directory, 'version.json'), 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(directory, BUILDING_MARKER))
+        with self._lock():
+            current = self.current()
+            if current is not None and version < current:
+                raise ValueError(f"{version} is older than the current version {current}")
+            manifest = dict(info, current=version, previous=current,
+                            published_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+            tmp_path = os.path.join(self.root, MANIFEST + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.root, MANIFEST))
+        self.gc()  # gc 自己加锁，须在释放后调用
+
+    @contextlib.contextmanager
+    def build(self, **info):
+        """在新版本目录中构建索引，正常结束则发布，出错则丢弃
+
+        with store.build() as output_dir:
+            BSBIIndex(data_dir, output_dir).index()
+        """
+        version, directory = self.create_version()
+        try:
+            yield directory
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        try:
+            self.publish(version, **info)
+        except ValueError:
+            shutil.rmtree(directory, ignore_errors=True)  # 已有更新的版本发布
+            raise
+
+    def pin(self, version=None):
+        """固定当前版本（或指定版本），返回 Pin；释放前该版本不会被 gc 删除"""
+        with self._lock():
+            version = version or self.current()
+            if version is None:
+                raise FileNotFoundError(f"no published index in {self.root}")
+            directory = self.version_dir(version)
+            pin_path = os.path.join(directory, PINS_DIR, f'{os.getpid()}-{uuid.uuid4().hex}')
+            # 版本已被回收时这里会抛出 FileNotFoundError
+            with open(pin_path, 'x'):
+                pass
+        with open(os.path.join(directory, 'version.json'), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        return Pin(version, directory, pin_path, info)
+
+    def _live_pins(self, directory):
+        """返回仍有效的 pin 数，顺带清理已退出进程遗留的 pin"""
+        pins_dir = os.path.join(directory, PINS_DIR)
+        live = 0
+        for name in os.listdir(pins_dir) if os.path.isdir(pins_dir) else []:
+            pid = int(name.split('-', 1)[0])
+            if _pid_alive(pid):
+                live += 1
+            else:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(os.path.join(pins_dir, name))
+        return live
+
+    def gc(self):
+        """删除既非当前、也不在保留范围内、且无人固定的旧版本，返回删除的版本名"""
+        removed = []
+        with self._lock():
+            manifest = self.manifest()
+            current = manifest.get('current')
+            older = [v for v in self.versions() if current is None or v < current]
+            keep = set(older[len(older) - self.retain:]) if self.retain else set()
+            for version in older:
+                directory = self.version_dir(version)
+                if version in keep or self._live_pins(directory):
+                    continue
+                marker = os.path.join(directory, BUILDING_MARKER)
+                if os.path.exists(marker):
+                    with open(marker) as f:
+                        if _pid_alive(int(f.read() or 0)):
+                            continue  # 仍在构建中的版本
+                # 先在锁内改名，使其对 pin() 立即不可见，再在锁外删除
+                trash = os.path.join(self.root, f'.trash-{version}-{uuid.uuid4().hex}')
+                os.replace(directory, trash)
+                removed.append((version, trash))
+        for version, trash in removed:
+            shutil.rmtree(trash, ignore_errors=True)
+        return [version for version, _ in removed]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='BSBI 版本化索引存储')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='构建新版本并发布')
+    p_build.add_argument('--data-dir', default='pa1-data')
+    p_build.add_argument('--encoding', default='uncompressed', choices=POSTINGS_ENCODINGS)
+    p_build.add_argument('--tokenizer', default='whitespace', choices=TOKENIZERS)
+    sub.add_parser('status', help='查看版本与 pin')
+    sub.add_parser('gc', help='回收无人使用的旧版本')
+    for p in sub.choices.values():
+        p.add_argument('--store', default='index_store', help='存储根目录')
+        p.add_argument('--retain', type=int, default=0, help='额外保留的旧版本数')
+    args = parser.parse_args()
+
+    store = IndexStore(args.store, retain=args.retain)
+    if args.command == 'build':
+        start = time.perf_counter()
+        with store.build(encoding=args.encoding, tokenizer=args.tokenizer) as output_dir:
+            engine = BSBIIndex(args.data_dir, output_dir,
+                               postings_encoding=POSTINGS_ENCODINGS[args.encoding],
+                               tokenizer=TOKENIZERS[args.tokenizer])
+            engine.index()
+            # 中间块索引只在合并时使用
+            for index_id in engine.intermediate_indices:
+                os.remove(os.path.join(output_dir, index_id + '.index'))
+                os.remove(os.path.join(output_dir, index_id + '.dict'))
+        print(f"✅ 已发布版本 {store.current()}，用时 {time.perf_counter() - start:.1f}s")
+    elif args.command == 'status':
+        current = store.current()
+        for version in store.versions():
+            pins = store._live_pins(store.version_dir(version))
+            print(f"{'*' if version == current else ' '} {version}  pins={pins}")
+    else:
+        removed = store.gc()
+        print(f"已回收 {len(removed)} 个旧版本: {', '.join(removed) or '无'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""倒排列表的集合运算：交、并、差与多路求交
+
+倒排列表都是升序且无重复的 docID 序列。安装了 numpy 时用 ndarray 表示并做向量化
+运算（以 searchsorted 在较长列表中批量定位较短列表的元素）；否则退化为纯 Python
+实现，接口与返回值的含义不变。
+
+    from postings_ops import as_postings, intersect_many, union, difference, to_list
+"""
+import array
+import bisect
+import heapq
+
+try:
+    import numpy as np
+except ImportError:  # 纯 Python 回退
+    np = None
+
+HAVE_NUMPY = np is not None
+
+# 两个列表长度相差超过该倍数时，纯 Python 实现改用二分查找跳跃前进
+GALLOP_RATIO = 16
+
+
+def as_postings(seq):
+    """将 docID 序列转换为本模块使用的表示（ndarray 或 list）"""
+    if HAVE_NUMPY:
+        return np.asarray(seq, dtype=np.int64)
+    return seq if isinstance(seq, list) else list(seq)
+
+
+def to_list(postings):
+    """转换回 Python 列表，用于输出或与旧代码交互"""
+    if HAVE_NUMPY and isinstance(postings, np.ndarray):
+        return postings.tolist()
+    return list(postings)
+
+
+def empty():
+    return np.empty(0, dtype=np.int64) if HAVE_NUMPY else []
+
+
+# ---------------------------------------------------------------------------
+# 解码内核：供编码类的 decode_array 使用，直接得到 ndarray
+# ---------------------------------------------------------------------------
+def frombuffer_uint(encoded, itemsize):
+    """按定长无符号整数解析字节流（UncompressedPostings 的格式）"""
+    if not HAVE_NUMPY:
+        decoded = array.array('L')
+        decoded.frombytes(encoded)
+        return decoded.tolist()
+    return np.frombuffer(encoded, dtype=f'<u{itemsize}').astype(np.int64)
+
+
+def vb_decode_gaps(encoded):
+    """解码“gap + 可变字节”编码的倒排列表（CompressedPostings 的格式）
+
+    每个数字按 7 位一组大端存放，最后一个字节最高位为 1。向量化做法：找出所有结束
+    字节，按每个字节到所在数字末尾的距离左移后分组求和，再对 gap 求前缀和。
+    """
+    if not HAVE_NUMPY:
+        n, current, postings = 0, 0, []
+        for byte in encoded:
+            if byte < 128:
+                n = 128 * n + byte
+            else:
+                current += 128 * n + (byte - 128)
+                postings.append(current)
+                n = 0
+        return postings
+    data = np.frombuffer(encoded, dtype=np.uint8)
+    ends = np.flatnonzero(data >= 128)
+    if len(ends) == 0:
+        return empty()
+    data = data[:ends[-1] + 1].astype(np.int64) & 127
+    if len(ends) == len(data):
+        gaps = data  # 所有 gap 都小于 128，每个数字恰好一个字节
+    else:
+        starts = np.empty_like(ends)
+        starts[0] = 0
+        starts[1:] = ends[:-1] + 1
+        owner_end = np.repeat(ends, ends - starts + 1)
+        shifted = data << (7 * (owner_end - np.arange(len(data))))
+        gaps = np.add.reduceat(shifted, starts)
+    return np.cumsum(gaps)
+
+
+# ---------------------------------------------------------------------------
+# 集合运算
+# ---------------------------------------------------------------------------
+def _contains_sorted(haystack, needles):
+    """needles 中每个元素是否出现在有序数组 haystack 中（布尔掩码）"""
+    idx = np.searchsorted(haystack, needles)
+    idx[idx == len(haystack)] = 0
+    return haystack[idx] == needles if len(haystack) else np.zeros(len(needles), dtype=bool)
+
+
+def intersect(a, b):
+    """两个有序列表的交集"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return empty()
+    if HAVE_NUMPY:
+        a, b = as_postings(a), as_postings(b)
+        return a[_contains_sorted(b, a)]
+
+    result = []
+    if len(b) > GALLOP_RATIO * len(a):
+        # 长度悬殊：短列表每个元素在长列表剩余部分中二分定位
+        lo = 0
+        for x in a:
+            lo = bisect.bisect_left(b, x, lo)
+            if lo == len(b):
+                break
+            if b[lo] == x:
+                result.append(x)
+        return result
+    i = j = 0
+    len_a, len_b = len(a), len(b)
+    while i < len_a and j < len_b:
+        x, y = a[i], b[j]
+        if x < y:
+            i += 1
+        elif x > y:
+            j += 1
+        else:
+            result.append(x)
+            i += 1
+            j += 1
+    return result
+
+
+def union(a, b):
+    """两个有序列表的并集"""
+    if HAVE_NUMPY:
+        return np.union1d(as_postings(a), as_postings(b))
+    result = []
+    for x in heapq.merge(a, b):
+        if not result or result[-1] != x:
+            result.append(x)
+    return result
+
+
+def difference(a, b):
+    """在 a 中但不在 b 中的元素"""
+    if not len(a) or not len(b):
+        return as_postings(a)
+    if HAVE_NUMPY:
+        a, b = as_postings(a), as_postings(b)
+        return a[~_contains_sorted(b, a)]
+    result = []
+    j, len_b = 0, len(b)
+    for x in a:
+        j = bisect.bisect_left(b, x, j)
+        if j == len_b or b[j] != x:
+            result.append(x)
+    return result
+
+
+def intersect_many(lists):
+    """多路求交：从最短的列表开始，中间结果为空时立即停止"""
+    if not lists:
+        return empty()
+    lists = sorted(lists, key=len)
+    result = as_postings(lists[0])
+    for other in lists[1:]:
+        if not len(result):
+            break
+        result = intersect(result, other)
+    return result
+
+
+def union_many(lists):
+    """多路求并"""
+    if not lists:
+        return empty()
+    if HAVE_NUMPY:
+        return np.unique(np.concatenate([as_postings(p) for p in lists]))
+    result = []
+    for x in heapq.merge(*lists):
+        if not result or result[-1] != x:
+            result.append(x)
+    return result